@@ -0,0 +1,192 @@
+"""
+COLUMNAR ARTIFACT STORE
+=======================
+Replaces the full-frame pickles handed between pipeline stages with
+uncompressed Feather v2 (Arrow IPC) files.
+
+- Column projection: a stage reads only the columns it asks for.
+- Memory-mapped reads: numeric columns come back as zero-copy views over the
+  file, so startup is near-instant and several processes reading the same
+  artifact share one copy through the OS page cache.
+
+- Appendable: append_artifact() adds a part file next to the base artifact
+  (<name>.parts/part-00001.feather, ...) so incremental runs never rewrite
+  history; load_artifact() stitches the parts back together.
+
+If pyarrow is not installed, everything falls back to the old .pkl files,
+and artifacts from older runs that only exist as .pkl are still readable.
+"""
+
+import shutil
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+FrameOrSeries = Union[pd.DataFrame, pd.Series]
+
+# Schema metadata key marking an artifact that was saved from a Series
+_SERIES_KEY = b'swift_ai.series'
+
+def artifact_path(name: str) -> Path:
+    """Path an artifact is written to (pipeline artifacts live in the working directory)."""
+    return Path(f"{name}.feather" if pa is not None else f"{name}.pkl")
+
+def _existing_path(name: str) -> Path:
+    feather_path = Path(f"{name}.feather")
+    if pa is not None and feather_path.exists():
+        return feather_path
+    pickle_path = Path(f"{name}.pkl")
+    if pickle_path.exists():
+        return pickle_path
+    raise FileNotFoundError(f"Artifact '{name}' not found (looked for {feather_path} and {pickle_path})")
+
+def _parts_dir(name: str) -> Path:
+    return Path(f"{name}.parts")
+
+def _part_paths(name: str) -> List[Path]:
+    return sorted(_parts_dir(name).glob("part-*.feather"))
+
+def artifact_exists(name: str) -> bool:
+    try:
+        _existing_path(name)
+        return True
+    except FileNotFoundError:
+        return False
+
+def _to_arrow(df: pd.DataFrame) -> "pa.Table":
+    # Numeric columns go through numpy so NaN stays a float value rather than
+    # becoming an Arrow null; that keeps them zero-copy on the way back out.
+    arrays = {}
+    for col in df.columns:
+        values = df[col]
+        if values.dtype.kind in 'biuf':
+            arrays[str(col)] = pa.array(values.to_numpy())
+        else:
+            arrays[str(col)] = pa.array(values, from_pandas=True)
+    return pa.table(arrays)
+
+def save_artifact(obj: FrameOrSeries, name: str) -> Path:
+    """
+    Save a DataFrame or Series as artifact `name`. The index is not stored,
+    matching how every stage already treats its frames positionally.
+    """
+    path = artifact_path(name)
+
+    # A fresh save replaces the whole artifact, including appended parts
+    if _parts_dir(name).exists():
+        shutil.rmtree(_parts_dir(name))
+
+    if pa is None:
+        obj.to_pickle(path)
+        return path
+
+    if isinstance(obj, pd.Series):
+        column = obj.name if obj.name is not None else name
+        table = _to_arrow(obj.to_frame(name=column))
+        table = table.replace_schema_metadata({_SERIES_KEY: str(column).encode()})
+    else:
+        table = _to_arrow(obj)
+
+    feather.write_feather(table, str(path), compression='uncompressed')
+    return path
+
+def load_artifact(name: str, columns: Optional[List[str]] = None) -> FrameOrSeries:
+    """
+    Load artifact `name`, optionally projecting to `columns`.
+    Feather artifacts are memory-mapped and only the requested columns are read.
+    """
+    path = _existing_path(name)
+
+    if path.suffix == '.pkl':
+        obj = pd.read_pickle(path)
+        if columns is not None and isinstance(obj, pd.DataFrame):
+            obj = obj[columns]
+        return obj
+
+    table = feather.read_table(str(path), columns=columns, memory_map=True)
+    metadata = table.schema.metadata or {}
+    parts = _part_paths(name)
+    if parts:
+        tables = [table] + [feather.read_table(str(p), columns=columns, memory_map=True) for p in parts]
+        table = pa.concat_tables(tables)
+    df = table.to_pandas(split_blocks=True)
+
+    if _SERIES_KEY in metadata:
+        return df[metadata[_SERIES_KEY].decode()]
+    return df
+
+def iter_artifact_batches(name: str, batch_rows: int,
+                          columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield artifact `name` as DataFrames of at most `batch_rows` rows, in order.
+    Feather artifacts are memory-mapped, so only the current batch is in memory.
+    """
+    path = _existing_path(name)
+
+    if path.suffix == '.pkl':
+        df = load_artifact(name, columns=columns)
+        for start in range(0, len(df), batch_rows):
+            yield df.iloc[start:start + batch_rows]
+        return
+
+    for file_path in [path] + _part_paths(name):
+        table = feather.read_table(str(file_path), columns=columns, memory_map=True)
+        for start in range(0, table.num_rows, batch_rows):
+            yield table.slice(start, batch_rows).to_pandas(split_blocks=True)
+
+def artifact_columns(name: str, numeric_only: bool = False) -> List[str]:
+    """Column names of an artifact, read from the file schema without loading any data."""
+    path = _existing_path(name)
+
+    if path.suffix == '.pkl':
+        df = pd.read_pickle(path)
+        if numeric_only:
+            df = df.select_dtypes(include=[np.number])
+        return list(df.columns)
+
+    schema = pa.ipc.open_file(pa.memory_map(str(path))).schema
+    if numeric_only:
+        return [f.name for f in schema
+                if pa.types.is_integer(f.type) or pa.types.is_floating(f.type)]
+    return list(schema.names)
+
+def append_artifact(df: pd.DataFrame, name: str) -> Path:
+    """
+    Append rows to artifact `name` as a new part file, creating the artifact if
+    it does not exist yet. Parts must have the same columns and dtypes as the
+    base artifact. Cost is proportional to `df`, not to the existing data.
+    """
+    if not artifact_exists(name):
+        return save_artifact(df, name)
+
+    path = _existing_path(name)
+    if path.suffix == '.pkl':
+        # Pickles can't be appended to; rewrite the whole frame
+        combined = pd.concat([pd.read_pickle(path), df], ignore_index=True)
+        combined.to_pickle(path)
+        return path
+
+    base_schema = pa.ipc.open_file(pa.memory_map(str(path))).schema.remove_metadata()
+    table = _to_arrow(df)
+    if table.schema.names != base_schema.names:
+        raise ValueError(f"Cannot append to '{name}': columns differ from the base artifact")
+    try:
+        # e.g. a categorical whose dictionary indices are int8 here but int16 in the base
+        table = table.cast(base_schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Cannot append to '{name}': dtypes don't match the base artifact ({e})")
+
+    parts_dir = _parts_dir(name)
+    parts_dir.mkdir(exist_ok=True)
+    part_path = parts_dir / f"part-{len(_part_paths(name)) + 1:05d}.feather"
+    feather.write_feather(table, str(part_path), compression='uncompressed')
+    return part_path
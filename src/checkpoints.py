@@ -0,0 +1,136 @@
+"""
+TRAINING CHECKPOINTS
+====================
+Lets an interrupted train_model.py pick up where it stopped.
+
+A checkpointed fit runs as segments of `every` boosting rounds, each one
+lgb.train call continuing from the previous segment's trees (init_model).
+After every segment the trees so far and the early-stopping state are
+written to checkpoints/<fit>.pkl; once the fit has stopped that file marks
+it (a CV fold, or the final model) as done.
+
+Resuming gives the same model as a run that was never interrupted:
+
+- the trees are saved in full precision, and LightGBM rebuilds the scores
+  of the training and validation rows from them (init_model), adding the
+  trees in the order training did
+- a new booster starts fresh random streams, so each segment gets its own
+  bagging and feature-fraction seeds, fixed by (seed, segment) - a resumed
+  segment draws exactly what the uninterrupted one did
+- early stopping is ResumableEarlyStopping, whose best round and score are
+  part of the checkpoint
+- DETERMINISTIC_PARAMS pins LightGBM's histogram layout, which it otherwise
+  picks by timing each new booster
+
+The segment seeds make a checkpointed model differ from one trained in a
+single call, so the segment length belongs to the run: a checkpoint is only
+used by a run with the same artifacts, parameters and segment length (and
+the same thread count, as LightGBM's sums depend on it).
+
+Checkpointing is therefore opt-in (train_model.py --checkpoint-every). It
+also costs time: every segment rebuilds the scores of all training and
+validation rows from the trees so far (for a CV fold, LightGBM predicts
+the parent set's rows and slices them), and force_row_wise gives up the
+column-wise histograms LightGBM may have picked. Longer segments amortize
+both.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import Dict, Optional
+
+import lightgbm as lgb
+
+CHECKPOINT_DIR = "checkpoints"
+CHECKPOINT_EVERY = 500  # boosting rounds per segment
+
+DETERMINISTIC_PARAMS = {"deterministic": True, "force_row_wise": True}
+
+# Bagging draws from one random stream per 1024-row block, seeded
+# bagging_seed + block, so the segments' seeds are spaced far apart to keep
+# their streams from overlapping
+_SEED_STRIDE = 1_000_003
+
+def segment_params(params: Dict, segment: int) -> Dict:
+    """Boosting parameters of one segment: segment 0 runs as configured, later ones reseed."""
+    if segment == 0:
+        return params
+    base = params["seed"] + segment * _SEED_STRIDE
+    return {**params, "bagging_seed": base, "feature_fraction_seed": base + _SEED_STRIDE // 2}
+
+class ResumableEarlyStopping:
+    """
+    lgb.early_stopping for a fit split over several lgb.train calls: the best
+    score and round carry over from call to call (and through checkpoints),
+    and the last round is the fit's, not the current call's.
+    """
+    order = 30
+    before_iteration = False
+
+    def __init__(self, valid_name: str, stopping_rounds: int, num_boost_round: int):
+        self.valid_name = valid_name
+        self.stopping_rounds = stopping_rounds
+        self.num_boost_round = num_boost_round
+        self.best_score: Optional[float] = None
+        self.best_iter = 0
+        self.best_eval = None
+        self.stopped = False
+
+    def state(self) -> Dict:
+        return {"best_score": self.best_score, "best_iter": self.best_iter,
+                "best_eval": self.best_eval, "stopped": self.stopped}
+
+    def set_state(self, state: Dict) -> None:
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def __call__(self, env) -> None:
+        _, _, value, higher_better = next(r for r in env.evaluation_result_list if r[0] == self.valid_name)
+        score = value if higher_better else -value
+        if self.best_score is None or score > self.best_score:
+            self.best_score, self.best_iter, self.best_eval = score, env.iteration, env.evaluation_result_list
+        if env.iteration - self.best_iter >= self.stopping_rounds or env.iteration == self.num_boost_round - 1:
+            self.stopped = True
+            raise lgb.callback.EarlyStopException(self.best_iter, self.best_eval)
+
+class TrainingCheckpoints:
+    """Per-fit checkpoint files of one training run (picklable, for fold processes)."""
+
+    def __init__(self, run_key: str, every: int = CHECKPOINT_EVERY, directory: str = CHECKPOINT_DIR):
+        self.run_key = run_key
+        self.every = every
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.pkl")
+
+    def _key(self, params: Dict) -> str:
+        blob = json.dumps([self.run_key, self.every, params], sort_keys=True).encode()
+        return hashlib.sha256(blob).hexdigest()[:16]
+
+    def load(self, name: str, params: Dict) -> Optional[Dict]:
+        """The saved state of fit `name`, or None if there is none for this run and parameters."""
+        try:
+            with open(self._path(name), 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if state.get("key") != self._key(params):
+            print(f"   [Checkpoint] {name}: saved for other data or parameters, starting over")
+            return None
+        return state
+
+    def save(self, name: str, params: Dict, model: lgb.Booster, early_stopping: ResumableEarlyStopping) -> None:
+        state = {"key": self._key(params), "iteration": model.current_iteration(),
+                 "model": model.model_to_string(), "early_stopping": early_stopping.state()}
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(name)}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(name))
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
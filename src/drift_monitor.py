@@ -0,0 +1,187 @@
+"""
+PRODUCTION DRIFT MONITOR
+========================
+Watches the feature vectors the API scores and compares them with the
+training distribution, window by window.
+
+- Reference profile (drift_profile.pkl): per feature, the inner bin edges
+  at the training deciles and the training share of each bin.
+  Written by preprocessing.py from the filled, unscaled training features.
+- Per scored request: one vectorized comparison against all edges gives
+  every feature's bin, and one fancy-indexed increment updates the
+  counts. Memory is fixed: n_features x (n_bins + 1) counters plus a
+  counter per feature of requests that did not send it (missing values
+  are binned at -999, like the training features they are compared with).
+- Tumbling windows of `window_seconds`: when a window closes, its PSI and
+  Jensen-Shannon divergence against the reference are kept (the last
+  `keep_windows` of them) and the counters reset.
+- Counts are mergeable (merge()), so monitors of several API workers can be
+  combined into one view.
+
+numpy only (no pandas), so the API can import it.
+"""
+
+import pickle
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PROFILE_FILE = "drift_profile.pkl"
+PSI_ALERT = 0.2  # conventional "significant shift" threshold
+N_BINS = 10
+NAN_FILL = -999  # preprocessing's fill value, so the reference profile counts missing values as it
+
+# Keeps empty bins from dividing by zero in PSI / JS
+_EPS = 1e-6
+
+# --- Bins and scores (shared with drift.py) ----------------------------------
+
+def bin_edges(reference: np.ndarray, n_bins: int = N_BINS) -> np.ndarray:
+    """Inner bin edges at the quantiles of a sorted reference sample."""
+    if len(reference) == 0:
+        return np.zeros(0)
+    return np.unique(np.quantile(reference, np.linspace(0, 1, n_bins + 1)[1:-1]))
+
+def bin_proportions(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Share of a sorted sample in (-inf, e1], (e1, e2], ..., (ek, inf)."""
+    positions = np.searchsorted(values, edges, side='right')
+    counts = np.diff(np.concatenate([[0], positions, [len(values)]]))
+    return counts / max(len(values), 1)
+
+def psi(p: np.ndarray, q: np.ndarray):
+    """Population stability index of proportions q against reference p (over the last axis)."""
+    p, q = np.maximum(p, _EPS), np.maximum(q, _EPS)
+    return np.sum((q - p) * np.log(q / p), axis=-1)
+
+def js_divergence(p: np.ndarray, q: np.ndarray):
+    """Jensen-Shannon divergence (natural log, 0..ln 2) over the last axis."""
+    p, q = np.maximum(p, _EPS), np.maximum(q, _EPS)
+    p, q = p / p.sum(axis=-1, keepdims=True), q / q.sum(axis=-1, keepdims=True)
+    mid = (p + q) / 2
+    return 0.5 * np.sum(p * np.log(p / mid), axis=-1) + 0.5 * np.sum(q * np.log(q / mid), axis=-1)
+
+# --- Monitor -----------------------------------------------------------------
+
+class ReferenceProfile:
+    """Training-time bin edges and bin shares per feature, padded to one matrix."""
+
+    def __init__(self, features: List[str], edges: List[np.ndarray], proportions: List[np.ndarray]):
+        self.features = list(features)
+        n_edges = max((len(e) for e in edges), default=0)
+        # +inf padding: no value is above a padded edge, so padded bins stay empty
+        self.edges = np.full((len(features), n_edges), np.inf)
+        self.proportions = np.zeros((len(features), n_edges + 1))
+        for i, (e, p) in enumerate(zip(edges, proportions)):
+            self.edges[i, :len(e)] = e
+            self.proportions[i, :len(p)] = p
+
+    @classmethod
+    def from_frame(cls, df) -> "ReferenceProfile":
+        edges, proportions = [], []
+        for col in df.columns:
+            values = np.sort(df[col].to_numpy(dtype=np.float64))
+            values = values[~np.isnan(values)]
+            edges.append(bin_edges(values))
+            proportions.append(bin_proportions(values, edges[-1]))
+        return cls(list(df.columns), edges, proportions)
+
+    def save(self, path: str = PROFILE_FILE) -> None:
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str = PROFILE_FILE) -> "ReferenceProfile":
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+class DriftMonitor:
+    """Thread-safe tumbling-window histograms of live features against a reference profile."""
+
+    def __init__(self, profile: ReferenceProfile, window_seconds: float = 3600, keep_windows: int = 24):
+        self.profile = profile
+        self.window_seconds = window_seconds
+        self.index = {name: i for i, name in enumerate(profile.features)}
+        self._rows = np.arange(len(profile.features))
+        self.counts = np.zeros(profile.proportions.shape, dtype=np.int64)
+        self.missing = np.zeros(len(profile.features), dtype=np.int64)
+        self.n_observed = 0
+        self.window_start = time.time()
+        self.closed: deque = deque(maxlen=keep_windows)
+        self._lock = threading.Lock()
+
+    def vector(self, features: Dict) -> np.ndarray:
+        """
+        Profile-ordered float64 vector of a feature dict: missing values
+        (None/NaN) become -999 as in the training features, and only features
+        the request did not send are NaN.
+        """
+        out = np.full(len(self.profile.features), np.nan)
+        for name, value in features.items():
+            i = self.index.get(name)
+            if i is not None:
+                out[i] = NAN_FILL if value is None or value != value else value
+        return out
+
+    def observe(self, values: np.ndarray) -> None:
+        """Count one profile-ordered feature vector. NaN counts as an absent feature."""
+        values = np.asarray(values, dtype=np.float64)
+        bins = (values[:, None] > self.profile.edges).sum(axis=1)
+        present = ~np.isnan(values)
+        with self._lock:
+            if time.time() - self.window_start >= self.window_seconds:
+                self._roll()
+            self.counts[self._rows[present], bins[present]] += 1
+            self.missing += ~present
+            self.n_observed += 1
+
+    def merge(self, other: "DriftMonitor") -> None:
+        """Add another monitor's current-window counts (same profile)."""
+        with self._lock:
+            self.counts += other.counts
+            self.missing += other.missing
+            self.n_observed += other.n_observed
+
+    def _roll(self) -> None:
+        # Called under the lock
+        if self.n_observed:
+            self.closed.append(self._summary(self.counts, self.missing, self.n_observed, self.window_start))
+        self.counts = np.zeros_like(self.counts)
+        self.missing = np.zeros_like(self.missing)
+        self.n_observed = 0
+        self.window_start = time.time()
+
+    def _summary(self, counts, missing, n_observed, window_start, top: Optional[int] = 10) -> Dict:
+        totals = counts.sum(axis=1, keepdims=True)
+        shares = counts / np.maximum(totals, 1)
+        observed = totals[:, 0] > 0
+        psi_scores = np.where(observed, psi(self.profile.proportions, shares), np.nan)
+        js_scores = np.where(observed, js_divergence(self.profile.proportions, shares), np.nan)
+        order = np.argsort(-np.nan_to_num(psi_scores, nan=-1.0))[:top]
+        return {
+            "window_start": window_start,
+            "requests": int(n_observed),
+            "features_alerting": int((psi_scores > PSI_ALERT).sum()),
+            "top_drift": [
+                {"feature": self.profile.features[i], "psi": round(float(psi_scores[i]), 4),
+                 "js_divergence": round(float(js_scores[i]), 4),
+                 "missing_rate": round(float(missing[i] / max(n_observed, 1)), 4)}
+                for i in order if observed[i]
+            ],
+        }
+
+    def report(self, top: int = 10) -> Dict:
+        """Scores of the current (partial) window and the closed windows, newest first."""
+        with self._lock:
+            if time.time() - self.window_start >= self.window_seconds:
+                self._roll()
+            counts, missing, n_observed = self.counts.copy(), self.missing.copy(), self.n_observed
+            window_start, closed = self.window_start, list(self.closed)
+        return {
+            "window_seconds": self.window_seconds,
+            "psi_alert": PSI_ALERT,
+            "current": self._summary(counts, missing, n_observed, window_start, top),
+            "closed": closed[::-1],
+        }
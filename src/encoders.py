@@ -0,0 +1,156 @@
+"""
+FREQUENCY ENCODERS & EMAIL PREFIXES
+===================================
+Vectorized replacements for the value_counts().to_dict() + map frequency
+encoding and the per-row str.split email prefix.
+
+- FrequencyEncoder: counts come from one factorize plus np.bincount (for
+  a categorical column, a bincount over its codes). Encoding looks every
+  distinct value up once (Index.get_indexer) and gathers the counts by
+  position. Missing values are counted as one value, like
+  value_counts(dropna=False).
+- Fitted encoders are saved as artifacts (fq_encoder_<col>), with
+  fq_encoders.json recording which ingested partitions they counted, so
+  serving and incremental runs apply the same mapping without recounting;
+  update() adds the counts of new rows to a loaded encoder.
+- email_prefix: splits each distinct domain once (vectorized
+  str.partition over the categories) and gathers the prefixes by code.
+"""
+
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import load_artifact, save_artifact
+
+ENCODER_ARTIFACT = "fq_encoder_{col}"
+ENCODER_INDEX = "fq_encoders.json"  # saved columns and the ingested partitions they counted
+
+def _counts(values) -> Tuple[pd.Index, np.ndarray, int]:
+    """(distinct non-missing values, their counts, number of missing values)."""
+    if isinstance(values, pd.Series):
+        values = values.array
+    if isinstance(values, pd.Categorical):
+        # codes are -1 for missing; shift by one so that slot 0 counts them
+        counts = np.bincount(values.codes + 1, minlength=len(values.categories) + 1)
+        seen = counts[1:] > 0
+        return pd.Index(values.categories.to_numpy()[seen]), counts[1:][seen].astype(np.int64), int(counts[0])
+
+    codes, uniques = pd.factorize(np.asarray(values))
+    counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+    return pd.Index(uniques), counts[1:].astype(np.int64), int(counts[0])
+
+class FrequencyEncoder:
+    """value -> number of rows with that value, fitted on one column."""
+
+    def __init__(self, col: str):
+        self.col = col
+        self.values: pd.Index = pd.Index([])
+        self.counts: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.missing: int = 0
+
+    @classmethod
+    def fit(cls, col: str, values) -> "FrequencyEncoder":
+        encoder = cls(col)
+        encoder.values, encoder.counts, encoder.missing = _counts(values)
+        return encoder
+
+    def update(self, values) -> "FrequencyEncoder":
+        """Add the counts of new rows (e.g. one batch or one daily drop)."""
+        new_values, new_counts, new_missing = _counts(values)
+        merged = (pd.Series(self.counts, index=self.values)
+                  .add(pd.Series(new_counts, index=new_values), fill_value=0))
+        self.values, self.counts = merged.index, merged.to_numpy(dtype=np.int64)
+        self.missing += new_missing
+        return self
+
+    def transform(self, values, unseen: int = 0) -> np.ndarray:
+        """int64 count of each value; values that were never counted get `unseen`."""
+        if isinstance(values, pd.Series):
+            values = values.array
+        if isinstance(values, pd.Categorical):
+            # One lookup per category, then a gather by code (-1 picks the trailing missing slot)
+            table = np.append(self._lookup(values.categories, unseen), self.missing or unseen)
+            return table[values.codes]
+
+        values = np.asarray(values)
+        out = self._lookup(values, unseen)
+        out[pd.isna(values)] = self.missing or unseen
+        return out
+
+    def _lookup(self, values, unseen: int) -> np.ndarray:
+        positions = self.values.get_indexer(values)
+        return np.where(positions >= 0, self.counts[positions], unseen).astype(np.int64)
+
+    def items(self) -> Iterator[Tuple[object, int]]:
+        """(value, count) pairs, with the missing value as NaN."""
+        yield from zip(self.values, self.counts.tolist())
+        if self.missing:
+            yield np.nan, self.missing
+
+    def table(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(values, counts) arrays covering every counted value, including missing."""
+        values = self.values.to_numpy()
+        if self.missing:
+            return np.append(values, np.nan), np.append(self.counts, self.missing)
+        return values, self.counts
+
+    # --- Persistence ---------------------------------------------------------
+
+    def save(self) -> None:
+        values, counts = self.table()
+        save_artifact(pd.DataFrame({'value': values, 'count': counts}), ENCODER_ARTIFACT.format(col=self.col))
+
+    @classmethod
+    def load(cls, col: str) -> "FrequencyEncoder":
+        df = load_artifact(ENCODER_ARTIFACT.format(col=col))
+        missing = df['value'].isna().to_numpy()
+        encoder = cls(col)
+        encoder.values = pd.Index(df['value'].to_numpy()[~missing])
+        encoder.counts = df['count'].to_numpy(dtype=np.int64)[~missing]
+        encoder.missing = int(df['count'].to_numpy()[missing].sum())
+        return encoder
+
+def fit_encoders(df: pd.DataFrame, columns: List[str]) -> Dict[str, FrequencyEncoder]:
+    return {col: FrequencyEncoder.fit(col, df[col]) for col in columns}
+
+def save_encoders(encoders: Dict[str, FrequencyEncoder], partitions: Optional[List] = None) -> None:
+    """Save every encoder; `partitions` identifies the ingested data they counted (None: unknown)."""
+    # The index goes first and comes back last, so a half-written set is never taken as complete
+    if os.path.exists(ENCODER_INDEX):
+        os.remove(ENCODER_INDEX)
+    for encoder in encoders.values():
+        encoder.save()
+    with open(ENCODER_INDEX, 'w') as f:
+        json.dump({'columns': list(encoders), 'partitions': partitions}, f, indent=2)
+
+def load_encoders(columns: List[str]) -> Tuple[Optional[Dict[str, FrequencyEncoder]], Optional[List]]:
+    """(saved encoders for `columns`, the partitions they counted), or (None, None) if not all are saved."""
+    try:
+        with open(ENCODER_INDEX) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+    if not set(columns) <= set(index['columns']):
+        return None, None
+    return {col: FrequencyEncoder.load(col) for col in columns}, index['partitions']
+
+# --- Email prefixes ----------------------------------------------------------
+
+def email_prefix(values) -> pd.Categorical:
+    """
+    'gmail.com' -> 'gmail' (text before the first '.'; missing -> 'nan', as
+    str() gives). Categories derive from the input categories only, so
+    batches of a categorical column get identical prefix categories.
+    """
+    if isinstance(values, pd.Series):
+        values = values.array
+    if not isinstance(values, pd.Categorical):
+        values = pd.Categorical(values)
+    prefixes = pd.Series(values.categories.astype(str)).str.partition('.')[0].to_numpy()
+    table = np.append(prefixes, 'nan').astype(object)  # code -1 (missing) picks the last slot
+    codes, categories = pd.factorize(table)
+    return pd.Categorical.from_codes(codes[values.codes], categories)
@@ -1,90 +1,210 @@
+import argparse
+import os
 import pandas as pd
 import numpy as np
 import gc
+from pandas.api.types import union_categoricals
+
+import encoders
+import group_agg
+import uid_keys
+import velocity
+from artifact_store import load_artifact, save_artifact
+from encoders import ENCODER_ARTIFACT, FrequencyEncoder, email_prefix, fit_encoders, load_encoders, save_encoders
+from uid_keys import uid_key
+from group_agg import GroupIndex, group_transform
+from online_state import STATE_FILE, OnlineUIDState
+from feature_store import STORE_DIR, export_feature_store
+from velocity import VELOCITY_KEYS, WINDOWS, WindowState, feature_names, window_aggregates
+from feature_registry import CACHE_DIR, FeatureSpec, build_features
+from load_data import load_manifest
+
+# Per-UID aggregates and frequency-encoded columns (also used by the online state)
+AGG_COLUMNS = ['TransactionAmt', 'C1', 'C2', 'D1', 'D15']
+ENCODE_COLUMNS = ['card1', 'addr1', 'P_emaildomain', 'R_emaildomain', 'dist1']
+
+def frequency_columns(df, col):
+    # The encoder frequency_encoders() fitted (or updated) and saved for this
+    # run: one lookup per distinct value (see encoders.py)
+    encoder = FrequencyEncoder.load(col)
+    return pd.DataFrame({col + '_fq_enc': encoder.transform(df[col])}, index=df.index)
 
 def frequency_encoding(df, columns):
     for col in columns:
         print(f"   -> Frequency Encoding: {col}")
-        
-        # --- FIX: Pandas crashes on float16 map lookups ---
-        # We temporarily cast to float32 just for this operation
-        if df[col].dtype == 'float16':
-            print(f"      (Converting {col} from float16 to float32 for safety)")
-            df[col] = df[col].astype('float32')
-            
-        freq_encoding = df[col].value_counts(dropna=False).to_dict()
-        df[col + '_fq_enc'] = df[col].map(freq_encoding)
+        df[col + '_fq_enc'] = frequency_columns(df, col)[col + '_fq_enc']
     return df
 
+def _partition_id(partition):
+    files = [partition[key]['sha256'] if partition[key] else None for key in ('transaction_file', 'identity_file')]
+    return [partition['split'], partition['tag'], partition['rows'], *files]
+
+def frequency_encoders(df, len_train):
+    """
+    Frequency encoders for ENCODE_COLUMNS over train+test `df`, saved as the
+    fq_encoder_<col> artifacts. If the saved encoders counted a prefix of
+    the partitions in the ingest manifest (load_data.py --incremental only
+    appends), they are loaded and updated with the rows ingested since;
+    otherwise every column is counted afresh.
+    """
+    manifest = load_manifest()
+    partitions = [_partition_id(p) for p in manifest['partitions']] if manifest else None
+    fitted, counted = load_encoders(ENCODE_COLUMNS)
+    if fitted is not None and partitions and counted and partitions[:len(counted)] == counted:
+        done = {split: max((p['row_end'] for p in manifest['partitions'][:len(counted)] if p['split'] == split),
+                           default=0)
+                for split in ('train', 'test')}
+        if done['train'] <= len_train and done['test'] <= len(df) - len_train:
+            new = np.r_[done['train']:len_train, len_train + done['test']:len(df)]
+            print(f"   -> Updating the saved encoders with {len(new)} new rows")
+            for col in ENCODE_COLUMNS:
+                fitted[col].update(df[col].iloc[new])
+        else:
+            fitted = None
+    else:
+        fitted = None
+    if fitted is None:
+        print("   -> Counting every row")
+        fitted = fit_encoders(df, ENCODE_COLUMNS)
+    save_encoders(fitted, partitions)
+    print(f"   -> {', '.join(ENCODER_ARTIFACT.format(col=col) for col in fitted)}")
+    return fitted
+
 def aggregate_features(df, uid_col, agg_cols, aggs=['mean', 'std']):
-    for col in agg_cols:
-        for agg_type in aggs:
-            new_col_name = f'{uid_col}_{col}_{agg_type}'
-            print(f"   -> Aggregating {col} by {uid_col} ({agg_type})...")
-            
-            # --- FIX: Ensure aggregation column isn't float16 either ---
-            if df[col].dtype == 'float16':
-                 df[col] = df[col].astype('float32')
-
-            temp_df = df.groupby([uid_col])[col].transform(agg_type)
-            df[new_col_name] = temp_df
-            
-            del temp_df
-            gc.collect()
+    # One factorization of the group key and one sorted pass per column,
+    # shared by every statistic (see group_agg.py)
+    print(f"   -> Aggregating {', '.join(agg_cols)} by {uid_col} ({', '.join(aggs)})...")
+    index = GroupIndex(df[uid_col].to_numpy())
+    aggregated = group_transform(index, df, agg_cols, aggs, prefix=uid_col)
+    df[list(aggregated.columns)] = aggregated
     return df
 
-def perform_feature_engineering():
+# --- Feature registry ---
+# Each feature declares the columns it reads and produces; build_features()
+# caches every result by a fingerprint of its inputs, parameters and code,
+# and only recomputes what changed (see feature_registry.py). Features that
+# don't read each other's outputs run in parallel (see parallel_fe.py).
+
+def uid_columns(df):
+    # 1. Convert TransactionDT (seconds) to Days
+    day = df['TransactionDT'] / (24*60*60)
+    
+    # 2. Calculate the "Start Date" (The day this user first appeared)
+    # D1 is "Days since client began". TransactionDay - D1 = StartDay.
+    uid_D1n = day - df['D1']
+    
+    # 3. Construct the UID as a stable 64-bit integer key (see uid_keys.py);
+    #    uid_string() gives the old 'card1_addr1_startday' form when needed
+    uid = uid_key(df['card1'].to_numpy(), df['addr1'].to_numpy(), uid_D1n.to_numpy())
+    return pd.DataFrame({'day': day, 'uid_D1n': uid_D1n, 'uid': uid}, index=df.index)
+
+def uid_aggregate_columns(df):
+    index = GroupIndex(df['uid'].to_numpy())
+    return group_transform(index, df, AGG_COLUMNS, ['mean', 'std'], prefix='uid')
+
+def velocity_columns(df, key):
+    out = window_aggregates(df[key].to_numpy(), df['TransactionDT'].to_numpy(),
+                            df['TransactionAmt'].to_numpy(dtype=np.float64, na_value=np.nan), key)
+    return pd.DataFrame(out, index=df.index, copy=False)
+
+def email_prefix_columns(df):
+    # Each distinct domain is split once; rows just gather by code
+    return pd.DataFrame({col + '_prefix': email_prefix(df[col]) for col in ['P_emaildomain', 'R_emaildomain']},
+                        index=df.index)
+
+def hour_columns(df):
+    return pd.DataFrame({'Transaction_hour': np.floor((df['TransactionDT'] % 86400) / 3600)}, index=df.index)
+
+# In output column order; a feature must come after the features it reads
+FEATURE_SPECS = [
+    FeatureSpec('uid', uid_columns, ['TransactionDT', 'D1', 'card1', 'addr1'],
+                ['day', 'uid_D1n', 'uid'], code=(uid_keys,)),
+    FeatureSpec('uid_aggregates', uid_aggregate_columns, ['uid'] + AGG_COLUMNS,
+                [f'uid_{col}_{agg}' for col in AGG_COLUMNS for agg in ['mean', 'std']], code=(group_agg,)),
+    *[FeatureSpec(f'velocity_{key}', velocity_columns, [key, 'TransactionDT', 'TransactionAmt'],
+                  [name for window in WINDOWS for name in feature_names(key, window)],
+                  params={'key': key}, code=(velocity,))
+      for key in VELOCITY_KEYS],
+    *[FeatureSpec(f'frequency_{col}', frequency_columns, [col], [col + '_fq_enc'], params={'col': col},
+                  code=(encoders,))
+      for col in ENCODE_COLUMNS],
+    FeatureSpec('email_prefix', email_prefix_columns, ['P_emaildomain', 'R_emaildomain'],
+                ['P_emaildomain_prefix', 'R_emaildomain_prefix'], code=(encoders,)),
+    FeatureSpec('transaction_hour', hour_columns, ['TransactionDT'], ['Transaction_hour']),
+]
+
+def uid_string(df):
+    """
+    Materialise the human-readable 'card1_addr1_startday' UID (e.g. for debugging
+    or the dashboard). The pipeline itself groups on the integer 'uid' key.
+    """
+    return (df['card1'].astype(str) + '_' + 
+            df['addr1'].astype(str) + '_' + 
+            df['uid_D1n'].astype(str))
+
+def _align_categories(train, test):
+    # Give shared categorical columns identical categories so the concat keeps
+    # them categorical instead of falling back to object
+    for col in train.select_dtypes(include=['category']).columns:
+        if col in test.columns and isinstance(test[col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([train[col], test[col]]).categories
+            train[col] = train[col].cat.set_categories(categories)
+            test[col] = test[col].cat.set_categories(categories)
+
+def perform_feature_engineering(workers=1, use_cache=True):
     print("STEP 2: FEATURE ENGINEERING (FIXED)")
 
-    print("\nLoading merged data from Pickle files...")
-    train = pd.read_pickle('train_merged.pkl')
-    test = pd.read_pickle('test_merged.pkl')
+    print("\nLoading merged data from the artifact store...")
+    train = load_artifact('train_merged')
+    test = load_artifact('test_merged')
     
     len_train = len(train)
+    _align_categories(train, test)
     df = pd.concat([train, test], axis=0, ignore_index=True)
     
     del train, test
     gc.collect()
+
+    # reduce_mem_usage keeps a float32 floor by default; only a float16 policy
+    # leaves float16 columns, which map/groupby can't handle. Widen those once here.
+    float16_cols = df.select_dtypes(include=['float16']).columns
+    if len(float16_cols):
+        print(f"   (Widening {len(float16_cols)} float16 columns to float32)")
+        df = df.astype({col: 'float32' for col in float16_cols})
+
+    # Fitted once: the frequency features, the online state and the feature store all use these
+    print("\nFrequency encoders...")
+    fitted = frequency_encoders(df, len_train)
     
-    print("\nCreating User IDs (UIDs)...")
-    
-    # 1. Convert TransactionDT (seconds) to Days
-    df['day'] = df['TransactionDT'] / (24*60*60)
-    
-    # 2. Calculate the "Start Date" (The day this user first appeared)
-    # D1 is "Days since client began". TransactionDay - D1 = StartDay.
-    # Check D1 type first
-    if df['D1'].dtype == 'float16':
-        df['D1'] = df['D1'].astype('float32')
-        
-    df['uid_D1n'] = df['day'] - df['D1']
+    print(f"\nBuilding features ({workers} worker{'s' if workers > 1 else ''}, "
+          f"{'cache: ' + CACHE_DIR if use_cache else 'no cache'}):")
+    print("   UIDs, UID aggregates (Mean/Std), velocity windows (UID/card1/addr1),")
+    print("   frequency encoding, email prefixes, hour of day")
     
-    # 3. Construct the UID String
-    df['uid'] = (df['card1'].astype(str) + '_' + 
-                 df['addr1'].astype(str) + '_' + 
-                 df['uid_D1n'].astype(str))
+    results = build_features(df, FEATURE_SPECS, workers=workers, cache_dir=CACHE_DIR if use_cache else None)
+    new_columns = pd.concat(list(results.values()), axis=1, copy=False)
+    df[list(new_columns.columns)] = new_columns
     
     print(f"   -> Created {df['uid'].nunique()} unique User IDs.")
-
-    print("\nCalculating Aggregations (Mean/Std) per UID...")
     
-    agg_columns = ['TransactionAmt', 'C1', 'C2', 'D1', 'D15']
-    
-    df = aggregate_features(df, 'uid', agg_columns, aggs=['mean', 'std'])
+    del results, new_columns
+    gc.collect()
 
-    print("\nPerforming Frequency Encoding...")
-    
-    encode_cols = ['card1', 'addr1', 'P_emaildomain', 'R_emaildomain', 'dist1']
-    
-    df = frequency_encoding(df, encode_cols)
+    print("\nSeeding the online UID state for serving...")
+    online_state = OnlineUIDState.from_frame(df, AGG_COLUMNS, ENCODE_COLUMNS, encoders=fitted)
+    online_state.windows = WindowState.from_frame(df, VELOCITY_KEYS)
+    online_state.snapshot(STATE_FILE)
+    print(f"   -> {len(online_state.uids)} UIDs saved to {STATE_FILE}")
+    del online_state
 
-    print("\nSplitting Email Domains...")
+    print("\nExporting the feature store (UID aggregates + frequency tables)...")
+    written = export_feature_store(df, 'uid', AGG_COLUMNS, ENCODE_COLUMNS, encoders=fitted)
+    for table, n_keys in written.items():
+        print(f"   -> {STORE_DIR}/{table}.idx: {n_keys} keys")
+
+    # The email columns are kept as plain strings (the prefixes were split above)
     for col in ['P_emaildomain', 'R_emaildomain']:
         df[col] = df[col].astype(str)
-        df[col + '_prefix'] = df[col].apply(lambda x: x.split('.')[0] if '.' in x else x)
-
-    print("\nCreating Hour of Day features...")
-    df['Transaction_hour'] = np.floor((df['TransactionDT'] % 86400) / 3600)
 
     print("\nSplitting back to Train/Test and Saving...")
     
@@ -94,10 +214,24 @@ def perform_feature_engineering():
     del df
     gc.collect()
     
-    train_eng.to_pickle('train_engineered.pkl')
-    test_eng.to_pickle('test_engineered.pkl')
+    save_artifact(train_eng, 'train_engineered')
+    save_artifact(test_eng, 'test_engineered')
 
     print("SUCCESS: Feature Engineering Complete!")
 
 if __name__ == "__main__":
-    perform_feature_engineering()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Step 2: UIDs, aggregations, velocity and frequency features")
+    parser.add_argument('--workers', type=int, default=1,
+                        help=f"compute features in this many processes (e.g. {os.cpu_count()})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f"recompute every feature instead of reusing {CACHE_DIR}/")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="stream through UID-hash partitions on disk instead of holding train+test in RAM")
+    parser.add_argument('--partitions', type=int, default=16,
+                        help="number of on-disk partitions for --out-of-core")
+    args = parser.parse_args()
+    if args.out_of_core:
+        from out_of_core import perform_out_of_core_feature_engineering
+        perform_out_of_core_feature_engineering(n_partitions=args.partitions)
+    else:
+        perform_feature_engineering(workers=args.workers, use_cache=not args.no_cache)
\ No newline at end of file
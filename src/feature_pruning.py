@@ -0,0 +1,150 @@
+"""
+FEATURE PRUNING
+===============
+Shrinks the feature set to the columns the model actually uses.
+
+Each step trains LightGBM on the current features (first share of the
+training rows) and scores it on the last `holdout` share, as
+hyperparam_search.py does, so X_val stays untouched. Then it drops the
+least important features and goes again:
+
+- importance is total split gain, or mean |SHAP value| on holdout rows
+  (LightGBM's own TreeSHAP, predict(pred_contrib=True))
+- a step drops every zero-importance feature, and at least the bottom
+  `drop_fraction` of the rest
+- pruning stops at the first step whose holdout AUC is more than
+  `tolerance` below the all-features baseline (that step is discarded),
+  or when fewer than `min_features` would remain
+
+Each step reads only its features from the memory-mapped X_train
+artifact, so fits get cheaper as the set shrinks.
+
+Outputs:
+    selected_features.json       features of the last step within tolerance
+    fraud_model_pruned_lgb.txt   that step's model
+    pruning_report.csv           features, holdout AUC, AUC loss and fit
+                                 time per step
+
+python train_model.py --features selected_features.json then trains the
+CV folds, final model and serving bundle on the reduced set, and the API
+assembles (and the bundle stores) only those features.
+"""
+
+import argparse
+import json
+import math
+import time
+from typing import List, Optional
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+from artifact_store import artifact_columns, load_artifact
+from train_model import DATASET_PARAMS, calculate_class_weight, lgb_params, load_tuned_params
+
+SELECTED_FEATURES_FILE = "selected_features.json"
+PRUNED_MODEL_FILE = "fraud_model_pruned_lgb.txt"
+REPORT_FILE = "pruning_report.csv"
+
+EARLY_STOPPING_ROUNDS = 100
+
+def feature_importance(model: lgb.Booster, importance_type: str, X_holdout: pd.DataFrame,
+                       shap_rows: int = 5000, seed: int = 42) -> np.ndarray:
+    """Per-feature importance of `model`: total gain, or mean |SHAP| over up to `shap_rows` holdout rows."""
+    if importance_type == "gain":
+        return model.feature_importance(importance_type="gain", iteration=model.best_iteration)
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(X_holdout), size=min(shap_rows, len(X_holdout)), replace=False))
+    contrib = model.predict(X_holdout.iloc[rows], num_iteration=model.best_iteration, pred_contrib=True)
+    return np.abs(contrib[:, :-1]).mean(axis=0)  # last column is the bias
+
+def features_to_drop(features: List[str], importance: np.ndarray, drop_fraction: float) -> List[str]:
+    order = np.argsort(importance, kind="stable")
+    n_drop = max(int((importance <= 0).sum()), math.ceil(len(features) * drop_fraction))
+    return [features[i] for i in order[:n_drop]]
+
+def prune_features(importance_type: str = "gain", drop_fraction: float = 0.2, tolerance: float = 0.002,
+                   min_features: int = 20, max_rounds: int = 1000, holdout: float = 0.2,
+                   params_path: Optional[str] = None) -> List[str]:
+    print("FEATURE PRUNING")
+    print("=" * 70)
+
+    y_train = load_artifact("y_train")
+    scale_pos_weight = calculate_class_weight(y_train)
+    params = lgb_params(scale_pos_weight, seed=42, tuned=load_tuned_params(params_path) if params_path else None)
+    n_fit = int(len(y_train) * (1 - holdout))
+    y_fit, y_holdout = y_train.iloc[:n_fit], y_train.iloc[n_fit:]
+
+    features = artifact_columns("X_train")
+    print(f"   [Pruning] {len(features)} features, importance: {importance_type}, "
+          f"tolerance: {tolerance} AUC, holdout: last {holdout:.0%} of training rows")
+
+    baseline, accepted, records = None, None, []
+    while True:
+        start = time.time()
+        X = load_artifact("X_train", columns=features)
+        fit_set = lgb.Dataset(X.iloc[:n_fit], label=y_fit, params=DATASET_PARAMS)
+        holdout_set = lgb.Dataset(X.iloc[n_fit:], label=y_holdout, reference=fit_set)
+        model = lgb.train(
+            params,
+            fit_set,
+            num_boost_round=max_rounds,
+            valid_sets=[holdout_set],
+            valid_names=["Holdout"],
+            callbacks=[lgb.early_stopping(stopping_rounds=EARLY_STOPPING_ROUNDS, verbose=False)]
+        )
+        auc = model.best_score["Holdout"]["auc"]
+        baseline = auc if baseline is None else baseline
+        records.append({"step": len(records), "features": len(features), "holdout_auc": round(auc, 5),
+                        "auc_loss": round(baseline - auc, 5), "best_iteration": model.best_iteration,
+                        "fit_seconds": round(time.time() - start, 1)})
+        print(f"    step {len(records) - 1}: {len(features):4d} features, AUC {auc:.4f} "
+              f"(loss {baseline - auc:+.4f}), {records[-1]['fit_seconds']:.1f}s")
+
+        if baseline - auc > tolerance:
+            print(f"   [Pruning] AUC loss above {tolerance}: keeping the previous step")
+            break
+        accepted = (features, model)
+
+        importance = feature_importance(model, importance_type, X.iloc[n_fit:])
+        dropped = set(features_to_drop(features, importance, drop_fraction))
+        if len(features) - len(dropped) < min_features:
+            print(f"   [Pruning] fewer than {min_features} features would remain: stopping")
+            break
+        features = [f for f in features if f not in dropped]
+        del X, fit_set, holdout_set
+
+    features, model = accepted
+    with open(SELECTED_FEATURES_FILE, "w") as f:
+        json.dump(features, f, indent=2)
+    model.save_model(PRUNED_MODEL_FILE, num_iteration=model.best_iteration)
+    report = pd.DataFrame(records)
+    report.to_csv(REPORT_FILE, index=False)
+
+    kept = report[report["features"] == len(features)].iloc[0]
+    print("\n" + "=" * 70)
+    print(report.to_string(index=False))
+    print(f"\n✓ {len(features)} of {int(report['features'].iloc[0])} features kept "
+          f"(holdout AUC {kept['holdout_auc']:.4f}, baseline {baseline:.4f}; "
+          f"fit {kept['fit_seconds']:.1f}s vs {report['fit_seconds'].iloc[0]:.1f}s)")
+    print(f"✓ {SELECTED_FEATURES_FILE}, {PRUNED_MODEL_FILE} and {REPORT_FILE} written "
+          f"(python train_model.py --features {SELECTED_FEATURES_FILE})")
+    return features
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drop low-importance features while holdout AUC holds")
+    parser.add_argument('--importance', choices=["gain", "shap"], default="gain")
+    parser.add_argument('--drop-fraction', type=float, default=0.2,
+                        help="least important share of the features dropped per step")
+    parser.add_argument('--tolerance', type=float, default=0.002,
+                        help="largest holdout AUC loss against all features that is accepted")
+    parser.add_argument('--min-features', type=int, default=20)
+    parser.add_argument('--max-rounds', type=int, default=1000, help="boosting rounds per step (early stopped)")
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help="last share of the training rows used to score each step")
+    parser.add_argument('--params', default=None, help="tuned parameters JSON (hyperparam_search.py)")
+    args = parser.parse_args()
+    prune_features(importance_type=args.importance, drop_fraction=args.drop_fraction, tolerance=args.tolerance,
+                   min_features=args.min_features, max_rounds=args.max_rounds, holdout=args.holdout,
+                   params_path=args.params)
@@ -0,0 +1,137 @@
+"""
+FEATURE REGISTRY
+================
+Declarative engineered features with per-feature result caching.
+
+Each FeatureSpec declares the function that builds it, the columns it reads,
+the columns it produces, its parameters and the modules its code depends on.
+Its fingerprint is a hash of:
+
+- the data of every base input column, or, for an input produced by another
+  spec, that spec's fingerprint (so changes propagate downstream),
+- its parameters,
+- the source of its function and of the declared code modules.
+
+Results are cached in the artifact store under feature_cache/ keyed by that
+fingerprint. build_features() loads every spec whose fingerprint is cached
+and computes only the new or changed ones (in parallel, dependency level by
+dependency level, via parallel_fe).
+"""
+
+import hashlib
+import inspect
+import json
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifact_store import artifact_exists, load_artifact, save_artifact
+from parallel_fe import FeatureGroup, run_feature_groups
+
+CACHE_DIR = "feature_cache"
+
+class FeatureSpec(NamedTuple):
+    name: str
+    func: Callable[..., pd.DataFrame]
+    inputs: List[str]
+    outputs: List[str]
+    params: Dict = {}
+    code: Tuple = ()  # modules whose source is part of the fingerprint
+
+def _column_hash(series: pd.Series) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(series.dtype).encode())
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        h.update(np.ascontiguousarray(series.cat.codes.to_numpy()).tobytes())
+        h.update(json.dumps([str(c) for c in series.cat.categories]).encode())
+    elif series.dtype.kind in 'biufM':
+        h.update(np.ascontiguousarray(series.to_numpy()).tobytes())
+    else:
+        h.update(pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def _code_hash(spec: FeatureSpec) -> str:
+    sources = [inspect.getsource(spec.func)] + [inspect.getsource(module) for module in spec.code]
+    return hashlib.sha256("\n".join(sources).encode()).hexdigest()
+
+def fingerprints(df: pd.DataFrame, specs: List[FeatureSpec]) -> Dict[str, str]:
+    """Fingerprint of every spec (specs must be listed after the specs they read from)."""
+    producer: Dict[str, str] = {}
+    column_hashes: Dict[str, str] = {}
+    result: Dict[str, str] = {}
+    for spec in specs:
+        parts = []
+        for col in spec.inputs:
+            if col in producer:
+                parts.append(f"{col}<-{result[producer[col]]}")
+            else:
+                if col not in column_hashes:
+                    column_hashes[col] = _column_hash(df[col])
+                parts.append(f"{col}={column_hashes[col]}")
+        parts.append(json.dumps(spec.params, sort_keys=True, default=str))
+        parts.append(_code_hash(spec))
+        result[spec.name] = hashlib.sha256("|".join(parts).encode()).hexdigest()[:20]
+        for col in spec.outputs:
+            producer[col] = spec.name
+    return result
+
+def _cache_name(spec: FeatureSpec, fingerprint: str, cache_dir: str) -> str:
+    return f"{cache_dir}/{spec.name}-{fingerprint}"
+
+def _store(result: pd.DataFrame, spec: FeatureSpec, fingerprint: str, cache_dir: str) -> None:
+    # One entry per feature: drop entries for older fingerprints
+    for old in Path(cache_dir).glob(f"{spec.name}-*"):
+        if old.stem != f"{spec.name}-{fingerprint}":
+            old.unlink()
+    save_artifact(result.reset_index(drop=True), _cache_name(spec, fingerprint, cache_dir))
+
+def build_features(df: pd.DataFrame, specs: List[FeatureSpec], workers: int = 1,
+                   cache_dir: Optional[str] = CACHE_DIR) -> Dict[str, pd.DataFrame]:
+    """
+    Results of every spec ({name: new columns}, in declaration order), from the
+    cache when the fingerprint matches and computed otherwise.
+    cache_dir=None disables the cache.
+    """
+    start = time.time()
+    prints = fingerprints(df, specs)
+    producer = {col: spec.name for spec in specs for col in spec.outputs}
+    results: Dict[str, pd.DataFrame] = {}
+    pending: List[FeatureSpec] = []
+
+    if cache_dir is not None:
+        Path(cache_dir).mkdir(exist_ok=True)
+    for spec in specs:
+        name = _cache_name(spec, prints[spec.name], cache_dir) if cache_dir is not None else None
+        if name is not None and artifact_exists(name):
+            results[spec.name] = load_artifact(name).set_axis(df.index)
+        else:
+            pending.append(spec)
+    print(f"   Feature cache: {len(results)} cached, {len(pending)} to compute")
+
+    # Dependency levels: a spec runs after every spec it reads from
+    level: Dict[str, int] = {}
+    for spec in specs:
+        level[spec.name] = 1 + max([level[producer[c]] for c in spec.inputs if c in producer], default=-1)
+
+    for current in sorted({level[spec.name] for spec in pending}):
+        batch = [spec for spec in pending if level[spec.name] == current]
+        needed = list(dict.fromkeys(col for spec in batch for col in spec.inputs))
+        frame = pd.DataFrame({col: results[producer[col]][col] if col in producer else df[col]
+                              for col in needed}, index=df.index)
+        groups = {spec.name: FeatureGroup(partial(spec.func, **spec.params), spec.inputs) for spec in batch}
+        computed = run_feature_groups(frame, groups, workers=workers)
+
+        for spec in batch:
+            result = computed[spec.name]
+            if list(result.columns) != list(spec.outputs):
+                raise ValueError(f"Feature '{spec.name}' produced {list(result.columns)}, declared {spec.outputs}")
+            results[spec.name] = result
+            if cache_dir is not None:
+                _store(result, spec, prints[spec.name], cache_dir)
+
+    print(f"   Features ready in {time.time() - start:.1f}s")
+    return {spec.name: results[spec.name] for spec in specs}
@@ -0,0 +1,195 @@
+"""
+OFFLINE-TO-ONLINE FEATURE STORE
+===============================
+Exports the per-UID aggregates and frequency-encoding tables computed in
+feature_eng.py to compact index files the API can look features up in.
+
+One file per table (feature_store/<table>.idx):
+
+    header   magic, number of keys, number of columns, column names (JSON)
+    keys     int64[n_keys], sorted
+    values   float32[n_keys, n_columns]
+
+Lookups are a binary search over the memory-mapped keys (np.searchsorted)
+plus one row read. Files are opened read-only with np.memmap, so every API
+worker process shares the same pages through the OS page cache and startup
+doesn't load anything.
+
+Keys:
+- 'uid' table: the uid_key integer (uid_keys.py).
+- '<col>_fq_enc' tables: value_key() of the raw value (float64 bit
+  pattern for numbers, blake2b-64 for strings, one key for missing).
+
+numpy only (no pandas) on the lookup side.
+"""
+
+import hashlib
+import json
+import math
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from uid_keys import number, transaction_uid
+
+STORE_DIR = "feature_store"
+UID_TABLE = "uid"
+
+_MAGIC = b"SWFSIDX1"
+_HEADER = struct.Struct("<8sQII")  # magic, n_keys, n_columns, names_len
+_ALIGN = 64
+
+# Canonical float64 NaN bits: the key for a missing value in every table
+_MISSING_KEY = int(np.array([np.nan]).view(np.int64)[0])
+
+def value_key(value) -> int:
+    """int64 key of a raw value in a frequency table."""
+    if isinstance(value, str):
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little', signed=True)
+    x = number(value)
+    if math.isnan(x):
+        return _MISSING_KEY
+    return int(np.array([x + 0.0]).view(np.int64)[0])  # + 0.0 folds -0.0 into 0.0
+
+def value_keys(values) -> np.ndarray:
+    """value_key() for a whole column (numeric columns are vectorized)."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        x = values.astype(np.float64) + 0.0
+        x[np.isnan(x)] = np.nan
+        return x.view(np.int64)
+    return np.array([value_key(v) for v in values], dtype=np.int64)
+
+# --- Writing -----------------------------------------------------------------
+
+def write_index(path, keys: np.ndarray, values: np.ndarray, columns: List[str]) -> None:
+    """Write one index file (keys must be unique; they are sorted here)."""
+    keys = np.asarray(keys, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float32).reshape(len(keys), len(columns))
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    if len(keys) > 1 and (keys[1:] == keys[:-1]).any():
+        raise ValueError(f"Duplicate keys in feature table {path}")
+
+    names = json.dumps(columns).encode()
+    header = _HEADER.pack(_MAGIC, len(keys), len(columns), len(names)) + names
+    header += b"\0" * (-len(header) % _ALIGN)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(keys.tobytes())
+        f.write(np.ascontiguousarray(values).tobytes())
+    os.replace(tmp_path, path)
+
+def export_uid_table(keys: np.ndarray, values: np.ndarray, features: List[str],
+                     store_dir: str = STORE_DIR) -> int:
+    """Write the UID table from one row per UID. Returns the number of keys."""
+    Path(store_dir).mkdir(exist_ok=True)
+    write_index(Path(store_dir) / f"{UID_TABLE}.idx", keys, values, features)
+    return len(keys)
+
+def export_frequency_table(col: str, values, counts, store_dir: str = STORE_DIR) -> int:
+    """Write the '<col>_fq_enc' table from distinct raw values and their counts."""
+    Path(store_dir).mkdir(exist_ok=True)
+    keys = value_keys(values)
+    first = ~_duplicated(keys)
+    table = f'{col}_fq_enc'
+    write_index(Path(store_dir) / f"{table}.idx", keys[first], np.asarray(counts)[first], [table])
+    return int(first.sum())
+
+def export_feature_store(df, uid_col: str, agg_columns: List[str], encode_columns: List[str],
+                         aggs: List[str] = ['mean', 'std'], store_dir: str = STORE_DIR,
+                         encoders: Optional[Dict] = None) -> Dict[str, int]:
+    """
+    Export the UID aggregate table and one frequency table per encoded column
+    from an engineered frame (before the email columns are cast to str).
+    Frequency tables come from `encoders` (encoders.FrequencyEncoder) when
+    given, otherwise from the frame's <col>_fq_enc columns.
+    Returns {table: number of keys}.
+    """
+    written = {}
+
+    uid_features = [f'{uid_col}_{col}_{agg}' for col in agg_columns for agg in aggs]
+    first = ~df[uid_col].duplicated().to_numpy()  # aggregates are constant within a UID
+    written[UID_TABLE] = export_uid_table(df[uid_col].to_numpy()[first],
+                                          df[uid_features].to_numpy(dtype=np.float32)[first],
+                                          uid_features, store_dir)
+
+    for col in encode_columns:
+        values, counts = (encoders[col].table() if encoders is not None
+                          else (df[col].to_numpy(), df[f'{col}_fq_enc'].to_numpy()))
+        written[f'{col}_fq_enc'] = export_frequency_table(col, values, counts, store_dir)
+
+    return written
+
+def _duplicated(keys: np.ndarray) -> np.ndarray:
+    # np-only equivalent of Series.duplicated() (keep='first')
+    _, first_index = np.unique(keys, return_index=True)
+    mask = np.ones(len(keys), dtype=bool)
+    mask[first_index] = False
+    return mask
+
+# --- Reading -----------------------------------------------------------------
+
+class FeatureIndex:
+    """One memory-mapped index file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, n_keys, n_columns, names_len = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a feature store index")
+            self.columns: List[str] = json.loads(f.read(names_len))
+        offset = _HEADER.size + names_len
+        offset += -offset % _ALIGN
+        self.keys = np.memmap(path, dtype=np.int64, mode='r', offset=offset, shape=(n_keys,))
+        self.values = np.memmap(path, dtype=np.float32, mode='r', offset=offset + 8 * n_keys,
+                                shape=(n_keys, n_columns))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, key: int) -> Optional[np.ndarray]:
+        """Feature row for `key`, or None if the key is unknown. O(log n)."""
+        pos = int(np.searchsorted(self.keys, key))
+        if pos < len(self.keys) and self.keys[pos] == key:
+            return self.values[pos]
+        return None
+
+class FeatureStore:
+    """All tables of an exported store, for resolving features of raw transactions."""
+
+    def __init__(self, store_dir: str = STORE_DIR):
+        self.tables: Dict[str, FeatureIndex] = {
+            path.stem: FeatureIndex(path) for path in sorted(Path(store_dir).glob("*.idx"))
+        }
+        if UID_TABLE not in self.tables:
+            raise FileNotFoundError(f"No '{UID_TABLE}' table in {store_dir}")
+
+    def features(self, txn: Dict) -> Dict[str, float]:
+        """
+        Offline features for a raw transaction. An unknown UID gets what the
+        batch pipeline gives a single-transaction UID (mean = own value, std
+        NaN); an unseen value gets frequency 1.
+        """
+        out: Dict[str, float] = {}
+        uid_table = self.tables[UID_TABLE]
+        row = uid_table.lookup(transaction_uid(txn))
+        for i, name in enumerate(uid_table.columns):
+            if row is not None:
+                out[name] = float(row[i])
+            elif name.endswith('_mean'):
+                out[name] = number(txn.get(name[len(UID_TABLE) + 1:-len('_mean')]))
+            else:
+                out[name] = math.nan
+
+        for table, index in self.tables.items():
+            if table == UID_TABLE:
+                continue
+            row = index.lookup(value_key(txn.get(table[:-len('_fq_enc')])))
+            out[table] = float(row[0]) if row is not None else 1.0
+        return out
@@ -0,0 +1,199 @@
+"""
+GROUP AGGREGATION ENGINE
+========================
+Computes many per-group statistics for many columns without a pandas
+groupby per (column, statistic) pair.
+
+The group key is factorized once (GroupIndex). Count/sum/mean/var/std are
+weighted bincounts over the group codes; order statistics (min, max,
+nunique, custom) gather each column into group order once and use segment
+reductions (np.minimum.reduceat and friends). Results are broadcast back to
+rows with a single take per output column.
+
+Built-in statistics: count, sum, mean, std, var, min, max, nunique.
+All of them skip NaN, like pandas. Custom statistics can be registered with
+register_aggregation().
+"""
+
+from typing import Callable, Dict, Iterable, List, Union
+
+import numpy as np
+import pandas as pd
+
+class GroupIndex:
+    """A factorized group key that can be reused for any number of aggregations."""
+
+    def __init__(self, keys):
+        codes, uniques = pd.factorize(np.asarray(keys), use_na_sentinel=False)
+        self.codes: np.ndarray = codes
+        self.uniques: np.ndarray = uniques
+        self.n_groups: int = len(uniques)
+        self._order = None
+
+    def _sort(self):
+        # factorize numbers groups 0..n_groups-1, so after sorting group g is the g-th run
+        self._order = np.argsort(self.codes, kind='stable')
+        self._sorted_codes = self.codes[self._order]
+        self._starts = np.flatnonzero(np.r_[True, self._sorted_codes[1:] != self._sorted_codes[:-1]])
+
+    @property
+    def order(self) -> np.ndarray:
+        if self._order is None:
+            self._sort()
+        return self._order
+
+    @property
+    def sorted_codes(self) -> np.ndarray:
+        if self._order is None:
+            self._sort()
+        return self._sorted_codes
+
+    @property
+    def starts(self) -> np.ndarray:
+        """Offset of each group's segment in group-sorted order."""
+        if self._order is None:
+            self._sort()
+        return self._starts
+
+    def bincount(self, weights) -> np.ndarray:
+        """Per-group sum of `weights` (no sorting needed)."""
+        return np.bincount(self.codes, weights=weights, minlength=self.n_groups)
+
+    def sort(self, values) -> np.ndarray:
+        """Gather a column into group order."""
+        return np.asarray(values)[self.order]
+
+    def broadcast(self, per_group: np.ndarray) -> np.ndarray:
+        """Expand one value per group back to one value per row."""
+        return per_group[self.codes]
+
+class _Column:
+    """
+    One column plus the pieces its statistics share. Sums, means and variances
+    are bincounts in row order; the group-sorted copy is only built for
+    order statistics (min, max, nunique, custom).
+    """
+
+    def __init__(self, index: GroupIndex, values):
+        self.index = index
+        self.values = np.asarray(values, dtype=np.float64)
+        self.valid = ~np.isnan(self.values)
+        self._sorted = None
+        self._cache: Dict[str, np.ndarray] = {}
+
+    @property
+    def sorted(self):
+        """(values, valid) gathered into group order."""
+        if self._sorted is None:
+            self._sorted = (self.index.sort(self.values), self.index.sort(self.valid))
+        return self._sorted
+
+    def get(self, agg: str) -> np.ndarray:
+        if agg not in self._cache:
+            self._cache[agg] = AGGREGATIONS[agg](self)
+        return self._cache[agg]
+
+def _count(col):
+    return col.index.bincount(col.valid.astype(np.float64)).astype(np.int64)
+
+def _sum(col):
+    return col.index.bincount(np.where(col.valid, col.values, 0.0))
+
+def _mean(col):
+    count = col.get('count')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, col.get('sum') / count, np.nan)
+
+def _var(col):
+    # Two-pass (deviation from the group mean) for numerical stability, ddof=1 like pandas
+    count = col.get('count')
+    dev2 = np.where(col.valid, (col.values - col.index.broadcast(col.get('mean'))) ** 2, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 1, col.index.bincount(dev2) / (count - 1), np.nan)
+
+def _std(col):
+    return np.sqrt(col.get('var'))
+
+def _min(col):
+    values, valid = col.sorted
+    result = np.minimum.reduceat(np.where(valid, values, np.inf), col.index.starts)
+    return np.where(col.get('count') > 0, result, np.nan)
+
+def _max(col):
+    values, valid = col.sorted
+    result = np.maximum.reduceat(np.where(valid, values, -np.inf), col.index.starts)
+    return np.where(col.get('count') > 0, result, np.nan)
+
+def _nunique(col):
+    # Hash the (group, value) pairs once and count distinct pairs per group
+    value_codes, uniques = pd.factorize(col.values[col.valid])
+    pairs = col.index.codes[col.valid].astype(np.int64) * max(len(uniques), 1) + value_codes
+    distinct = pd.unique(pairs) // max(len(uniques), 1)
+    return np.bincount(distinct, minlength=col.index.n_groups)
+
+AGGREGATIONS: Dict[str, Callable[[_Column], np.ndarray]] = {
+    'count': _count,
+    'sum': _sum,
+    'mean': _mean,
+    'var': _var,
+    'std': _std,
+    'min': _min,
+    'max': _max,
+    'nunique': _nunique,
+}
+
+# Statistics whose result is a count rather than a value of the column
+_INTEGER_AGGS = {'count', 'nunique'}
+# Statistics that stay integral when the column is an integer column
+_EXACT_AGGS = {'sum', 'min', 'max'}
+
+def register_aggregation(name: str, func: Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]) -> None:
+    """
+    Register a custom statistic. `func(values, valid, starts)` gets the column
+    in group order (float64), its non-NaN mask and the start offset of each
+    group's segment, and returns one value per group.
+    """
+    AGGREGATIONS[name] = lambda col: func(*col.sorted, col.index.starts)
+
+def group_aggregate(index: GroupIndex, frame: pd.DataFrame, columns: Iterable[str],
+                    aggs: List[str]) -> pd.DataFrame:
+    """
+    Like group_transform, but one row per group (in index.uniques order) instead
+    of broadcasting back to rows. Columns are named f'{col}_{agg}' and kept float64.
+    """
+    out = {}
+    for col in columns:
+        column = _Column(index, frame[col].to_numpy(dtype=np.float64, na_value=np.nan))
+        for agg in aggs:
+            if agg not in AGGREGATIONS:
+                raise ValueError(f"Unknown aggregation '{agg}' (known: {sorted(AGGREGATIONS)})")
+            out[f'{col}_{agg}'] = column.get(agg)
+    return pd.DataFrame(out, copy=False)
+
+def group_transform(index: GroupIndex, frame: pd.DataFrame, columns: Iterable[str],
+                    aggs: Union[List[str], Dict[str, List[str]]], prefix: str) -> pd.DataFrame:
+    """
+    Compute every statistic in `aggs` for every column, broadcast back to rows.
+
+    `aggs` is a list applied to all columns, or a {column: [aggs]} mapping.
+    Output columns are named f'{prefix}_{col}_{agg}'. Counts, and sum/min/max of
+    integer columns, are int64; other statistics keep the column's float dtype
+    (float64 for integer columns), like groupby().transform.
+    """
+    out = {}
+    for col in columns:
+        col_aggs = aggs[col] if isinstance(aggs, dict) else aggs
+        source = frame[col]
+        is_int = source.dtype.kind in 'iub'
+        float_dtype = source.dtype if source.dtype.kind == 'f' else np.float64
+        column = _Column(index, source.to_numpy(dtype=np.float64, na_value=np.nan))
+
+        for agg in col_aggs:
+            if agg not in AGGREGATIONS:
+                raise ValueError(f"Unknown aggregation '{agg}' (known: {sorted(AGGREGATIONS)})")
+            per_group = column.get(agg)
+            integral = agg in _INTEGER_AGGS or (is_int and agg in _EXACT_AGGS)
+            per_group = per_group.astype(np.int64 if integral else float_dtype, copy=False)
+            out[f'{prefix}_{col}_{agg}'] = index.broadcast(per_group)
+
+    return pd.DataFrame(out, index=frame.index, copy=False)
@@ -0,0 +1,234 @@
+"""
+HYPERPARAMETER SEARCH (ASHA)
+============================
+Asynchronous successive halving over the boosting parameters of
+train_model.lgb_params.
+
+Budgets come in rungs: rung 0 trains on a small row sample for a few
+rounds, and every rung above has `eta` times the rows and rounds, up to the
+full search set and --max-rounds. Each configuration starts at rung 0.
+Whenever a process is free, it takes the best job available:
+
+- a configuration in the top 1/eta of the results finished so far at its
+  rung, not yet promoted, goes up one rung (highest rungs first)
+- otherwise a new configuration is sampled from SEARCH_SPACE, until
+  --trials have been started
+
+Nothing waits for a rung to fill up, so processes never idle on the slowest
+trial of a round, and most of the compute goes to configurations that
+already looked good on the cheaper budgets.
+
+Trials train on the binned training set (the .bin of train_model's cache,
+loaded once per process) and are scored on its last `holdout` share of rows,
+the time-ordered equivalent of the last CV fold; X_val stays untouched for
+the final evaluation. Each trial's rows are a fixed sample per rung, so
+every configuration at a rung sees the same data.
+
+Outputs:
+    search_leaderboard.csv   one row per (trial, rung): budget, AUC, best
+                             round, wall time, and the trial's parameters
+    tuned_params.json        parameters of the best configuration at the
+                             highest rung reached (python train_model.py
+                             --params tuned_params.json)
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+from artifact_store import load_artifact
+from train_model import (DATASET_PARAMS, NUM_BOOST_ROUND, binned_training_set,
+                         calculate_class_weight, lgb_params)
+
+LEADERBOARD_FILE = "search_leaderboard.csv"
+TUNED_PARAMS_FILE = "tuned_params.json"
+
+# name -> (scale, low, high); "log" samples uniformly on the log scale, "int*" rounds
+SEARCH_SPACE = {
+    "learning_rate": ("log", 0.005, 0.1),
+    "num_leaves": ("int_log", 31, 512),
+    "min_child_samples": ("int_log", 10, 500),
+    "feature_fraction": ("uniform", 0.3, 1.0),
+    "bagging_fraction": ("uniform", 0.5, 1.0),
+    "lambda_l2": ("log", 1e-3, 10.0),
+}
+
+EARLY_STOPPING_ROUNDS = 50
+
+def sample_params(rng: np.random.Generator, space: Dict = SEARCH_SPACE) -> Dict:
+    params = {}
+    for name, (scale, low, high) in space.items():
+        if scale.endswith("log"):
+            value = math.exp(rng.uniform(math.log(low), math.log(high)))
+        else:
+            value = rng.uniform(low, high)
+        params[name] = int(round(value)) if scale.startswith("int") else round(value, 6)
+    return params
+
+def make_rungs(min_rounds: int, max_rounds: int, min_fraction: float, eta: int) -> List[Tuple[int, float]]:
+    """(rounds, row fraction) per rung; the last rung is the full budget."""
+    n_rungs = 1 + max(0, int(math.floor(math.log(max_rounds / min_rounds, eta) + 1e-9)))
+    rungs = [(min(max_rounds, min_rounds * eta ** i), min(1.0, min_fraction * eta ** i)) for i in range(n_rungs)]
+    rungs[-1] = (max_rounds, 1.0)
+    return rungs
+
+def rung_rows(n_rows: int, fraction: float, seed: int) -> np.ndarray:
+    """The rows a rung trains on: the same sorted sample for every trial."""
+    if fraction >= 1.0:
+        return np.arange(n_rows)
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(n_rows, size=max(1, int(n_rows * fraction)), replace=False))
+
+# --- Worker side ---
+
+_TRAIN_SET: Optional[lgb.Dataset] = None
+
+def _init_worker(bin_path: str) -> None:
+    global _TRAIN_SET
+    _TRAIN_SET = lgb.Dataset(bin_path, params=DATASET_PARAMS, free_raw_data=False).construct()
+
+def _run_trial(trial: int, rung: int, params: Dict, rounds: int, fraction: float,
+               n_search: int, seed: int) -> Dict:
+    start = time.time()
+    train_rows = rung_rows(n_search, fraction, seed + rung)
+    holdout_rows = np.arange(n_search, _TRAIN_SET.num_data())
+    model = lgb.train(
+        params,
+        _TRAIN_SET.subset(train_rows),
+        num_boost_round=rounds,
+        valid_sets=[_TRAIN_SET.subset(holdout_rows)],
+        valid_names=["Holdout"],
+        callbacks=[lgb.early_stopping(stopping_rounds=EARLY_STOPPING_ROUNDS, verbose=False)]
+    )
+    return {"trial": trial, "rung": rung, "rows": len(train_rows), "rounds": rounds,
+            "auc": model.best_score["Holdout"]["auc"], "best_iteration": model.best_iteration,
+            "seconds": round(time.time() - start, 2)}
+
+# --- Scheduler ---
+
+class ASHA:
+    """Job selection of asynchronous successive halving; results come back in any order."""
+
+    def __init__(self, n_trials: int, rungs: List[Tuple[int, float]], eta: int, seed: int):
+        self.n_trials = n_trials
+        self.rungs = rungs
+        self.eta = eta
+        self.rng = np.random.default_rng(seed)
+        self.configs: List[Dict] = []
+        self.results: List[Dict[int, float]] = [{} for _ in rungs]  # rung -> {trial: auc}
+        self.promoted: List[set] = [set() for _ in rungs]
+
+    def next_job(self) -> Optional[Tuple[int, int]]:
+        """(trial, rung) to run next, or None if nothing can start until a running job finishes."""
+        for rung in reversed(range(len(self.rungs) - 1)):
+            finished = self.results[rung]
+            top = sorted(finished, key=finished.get, reverse=True)[:len(finished) // self.eta]
+            for trial in top:
+                if trial not in self.promoted[rung]:
+                    self.promoted[rung].add(trial)
+                    return trial, rung + 1
+        if len(self.configs) < self.n_trials:
+            self.configs.append(sample_params(self.rng))
+            return len(self.configs) - 1, 0
+        return None
+
+    def record(self, result: Dict) -> None:
+        self.results[result["rung"]][result["trial"]] = result["auc"]
+
+def run_search(n_trials: int = 27, workers: int = 4, threads_per_trial: int = 0, eta: int = 3,
+               min_rounds: int = 100, max_rounds: int = 2000, min_fraction: float = 0.1,
+               holdout: float = 0.2, seed: int = 42) -> pd.DataFrame:
+    print("HYPERPARAMETER SEARCH (ASHA)")
+    print("=" * 70)
+
+    X_train = load_artifact("X_train")
+    y_train = load_artifact("y_train")
+    scale_pos_weight = calculate_class_weight(y_train)
+    # The workers load the binned set from disk, so it is always written to the cache
+    _, bin_path = binned_training_set(X_train, y_train, use_cache=True)
+    n_search = int(len(X_train) * (1 - holdout))
+    del X_train
+
+    threads_per_trial = threads_per_trial or max(1, (os.cpu_count() or 1) // workers)
+    rungs = make_rungs(min_rounds, max_rounds, min_fraction, eta)
+    print(f"   [Search] {n_trials} configs, eta={eta}, {workers} processes x {threads_per_trial} threads")
+    for i, (rounds, fraction) in enumerate(rungs):
+        print(f"   [Search] rung {i}: {rounds} rounds on {fraction:.0%} of {n_search} rows")
+
+    asha = ASHA(n_trials, rungs, eta, seed)
+    records, trial_seconds = [], {}
+    search_start = time.time()
+    # spawn, not fork: forking after OpenMP started in this process can deadlock the children
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(bin_path,)) as pool:
+        running = {}
+        while True:
+            while len(running) < workers:
+                job = asha.next_job()
+                if job is None:
+                    break
+                trial, rung = job
+                rounds, fraction = rungs[rung]
+                params = {**lgb_params(scale_pos_weight, seed), **asha.configs[trial],
+                          "num_threads": threads_per_trial}
+                running[pool.submit(_run_trial, trial, rung, params, rounds, fraction, n_search, seed)] = job
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                result = future.result()
+                asha.record(result)
+                trial_seconds[result["trial"]] = trial_seconds.get(result["trial"], 0.0) + result["seconds"]
+                records.append({**result, "trial_seconds": round(trial_seconds[result["trial"]], 2),
+                                **asha.configs[result["trial"]]})
+                print(f"    trial {result['trial']:3d} rung {result['rung']}: AUC {result['auc']:.4f} "
+                      f"({result['best_iteration']}/{result['rounds']} rounds, {result['seconds']:.1f}s)")
+
+    leaderboard = (pd.DataFrame(records)
+                   .sort_values(["rung", "auc"], ascending=[False, False])
+                   .reset_index(drop=True))
+    leaderboard.to_csv(LEADERBOARD_FILE, index=False)
+
+    best = leaderboard.iloc[0]
+    tuned = asha.configs[int(best["trial"])]
+    with open(TUNED_PARAMS_FILE, "w") as f:
+        json.dump(tuned, f, indent=2)
+
+    print("\n" + "=" * 70)
+    print(f"Search time: {time.time() - search_start:.1f}s, "
+          f"compute: {leaderboard['seconds'].sum():.1f}s over {len(leaderboard)} jobs")
+    print("\nLeaderboard (top 10):")
+    print(leaderboard.head(10).to_string(index=False))
+    print(f"\n✓ Best: trial {int(best['trial'])}, AUC {best['auc']:.4f} at rung {int(best['rung'])}")
+    print(f"✓ {LEADERBOARD_FILE} and {TUNED_PARAMS_FILE} written "
+          f"(python train_model.py --params {TUNED_PARAMS_FILE})")
+    return leaderboard
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ASHA search over the LightGBM parameters of train_model.py")
+    parser.add_argument('--trials', type=int, default=27, help="configurations to sample")
+    parser.add_argument('--workers', type=int, default=4, help="trials running concurrently")
+    parser.add_argument('--threads-per-trial', type=int, default=0,
+                        help="LightGBM threads per trial (default: cores / workers)")
+    parser.add_argument('--eta', type=int, default=3, help="keep the top 1/eta of each rung")
+    parser.add_argument('--min-rounds', type=int, default=100, help="boosting rounds of rung 0")
+    parser.add_argument('--max-rounds', type=int, default=2000,
+                        help=f"boosting rounds of the top rung (train_model uses up to {NUM_BOOST_ROUND})")
+    parser.add_argument('--min-fraction', type=float, default=0.1, help="share of the search rows in rung 0")
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help="last share of the training rows used to score trials")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    run_search(n_trials=args.trials, workers=args.workers, threads_per_trial=args.threads_per_trial,
+               eta=args.eta, min_rounds=args.min_rounds, max_rounds=args.max_rounds,
+               min_fraction=args.min_fraction, holdout=args.holdout, seed=args.seed)
@@ -34,15 +34,17 @@ CRITICAL NOTES FOR HACKATHON JUDGES:
 
 import flask
 from flask import request, jsonify
-import pandas as pd
 import numpy as np
-import lightgbm as lgb
-import pickle
 import json
 import time
 from typing import Dict, List, Tuple
 import warnings
 import os
+from online_state import OnlineUIDState
+from feature_store import UID_TABLE, FeatureStore
+from drift_monitor import DriftMonitor, ReferenceProfile
+from serving_bundle import ServingBundle
+from v_reduction import VReduction
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ARTIFACTS_DIR = os.path.join(BASE_DIR, "data", "artifacts")
 
@@ -52,42 +54,107 @@ warnings.filterwarnings('ignore')
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
+BUNDLE_PATH = os.path.join(ARTIFACTS_DIR, "fraud_model.bundle")
 MODEL_PATH = os.path.join(ARTIFACTS_DIR, "fraud_model_lgb.txt")
+RAW_MODEL_PATH = os.path.join(ARTIFACTS_DIR, "fraud_model_raw_lgb.txt")
 SCALER_PATH = os.path.join(ARTIFACTS_DIR, "scaler.pkl")
 FEATURE_IMPORTANCE_PATH = os.path.join(ARTIFACTS_DIR, "feature_importance.csv")
+ONLINE_STATE_PATH = os.path.join(ARTIFACTS_DIR, "online_state.pkl")
+FEATURE_STORE_DIR = os.path.join(ARTIFACTS_DIR, "feature_store")
+ONLINE_STATE_SNAPSHOT_SECONDS = 300
+DRIFT_PROFILE_PATH = os.path.join(ARTIFACTS_DIR, "drift_profile.pkl")
+DRIFT_WINDOW_SECONDS = 3600
+V_REDUCTION_PATH = os.path.join(ARTIFACTS_DIR, "v_reduction.pkl")
 
 print("[DEBUG] BASE_DIR:", BASE_DIR)
 print("[DEBUG] ARTIFACTS_DIR:", ARTIFACTS_DIR)
-print("[DEBUG] MODEL_PATH:", MODEL_PATH)
+print("[DEBUG] BUNDLE_PATH:", BUNDLE_PATH)
 
 
+def load_bundle_from_parts() -> ServingBundle:
+    """
+    Older artifact sets without fraud_model.bundle: build the same bundle from
+    the model text, scaler.pkl and feature_importance.csv (imports sklearn to
+    unpickle the scaler, so startup is slower).
+    """
+    import csv
+    import pickle
+    from model_export import fold_scaler, scaler_for_model
+
+    with open(SCALER_PATH, 'rb') as f:
+        scaler = pickle.load(f)
+    if os.path.exists(RAW_MODEL_PATH):
+        with open(RAW_MODEL_PATH) as f:
+            model_text = f.read()
+        mean, scale = scaler_for_model(scaler, model_text)
+    else:
+        with open(MODEL_PATH) as f:
+            model_text = f.read()
+        mean, scale = scaler_for_model(scaler, model_text)
+        model_text = fold_scaler(model_text, mean, scale)
+    try:
+        with open(FEATURE_IMPORTANCE_PATH, newline='') as f:
+            top = [row['Feature'] for _, row in zip(range(10), csv.DictReader(f))]
+    except OSError as e:
+        print(f"⚠ Feature importance not loaded: {e}")
+        top = []
+    return ServingBundle.from_model(model_text, mean, scale, top)
+
 # Load data on startup
+# One memory-mapped file holds the trees, feature order, fill values, thresholds
+# and top features (serving_bundle.py); no lightgbm, pandas or sklearn import.
 try:
-    print("[API] Loading trained model...")
-    model = lgb.Booster(model_file=MODEL_PATH)
-    print(f"✓ Model loaded: {MODEL_PATH}")
+    print("[API] Loading serving bundle...")
+    start = time.time()
+    if os.path.exists(BUNDLE_PATH):
+        model = ServingBundle.load(BUNDLE_PATH)
+    else:
+        print(f"⚠ {BUNDLE_PATH} not found, building it from the separate model artifacts")
+        model = load_bundle_from_parts()
+    print(f"✓ Model {model.version} loaded: {len(model.features)} features, "
+          f"{model.meta['num_trees']} trees ({(time.time() - start) * 1000:.0f}ms)")
 except Exception as e:
     print(f"✗ Failed to load model: {e}")
     model = None
 
+top_features = model.top_features if model else []
+
 try:
-    print("[API] Loading scaler...")
-    with open(SCALER_PATH, 'rb') as f:
-        scaler = pickle.load(f)
-    print(f"✓ Scaler loaded: {SCALER_PATH}")
+    print("[API] Opening feature store...")
+    feature_store = FeatureStore(FEATURE_STORE_DIR)
+    print(f"✓ Feature store opened ({', '.join(feature_store.tables)})")
+except Exception as e:
+    print(f"⚠ Feature store not opened: {e}")
+    feature_store = None
+
+try:
+    print("[API] Loading online UID state...")
+    online_state = OnlineUIDState.load(ONLINE_STATE_PATH)
+    online_state.start_snapshots(ONLINE_STATE_PATH, ONLINE_STATE_SNAPSHOT_SECONDS)
+    print(f"✓ Online state loaded ({len(online_state.uids)} UIDs)")
 except Exception as e:
-    print(f"✗ Failed to load scaler: {e}")
-    scaler = None
+    print(f"⚠ Online state not loaded (UID aggregates must be sent by the caller): {e}")
+    online_state = None
 
 try:
-    print("[API] Loading feature importance...")
-    importance_df = pd.read_csv(FEATURE_IMPORTANCE_PATH)
-    top_features = importance_df.head(10)['Feature'].tolist()
-    print(f"✓ Feature importance loaded ({len(top_features)} top features)")
+    print("[API] Loading V-column reduction...")
+    v_reduction = VReduction.load(V_REDUCTION_PATH)
+    print(f"✓ V-column reduction loaded ({v_reduction.summary()})")
+except FileNotFoundError:
+    print("✓ No V-column reduction (model trained on the V columns as they are)")
+    v_reduction = None
 except Exception as e:
-    print(f"⚠ Feature importance not loaded: {e}")
-    top_features = []
+    print(f"⚠ V-column reduction not loaded: {e}")
+    v_reduction = None
 
+try:
+    print("[API] Loading drift reference profile...")
+    drift_monitor = DriftMonitor(ReferenceProfile.load(DRIFT_PROFILE_PATH), DRIFT_WINDOW_SECONDS)
+    print(f"✓ Drift monitor ready ({len(drift_monitor.profile.features)} features, "
+          f"{DRIFT_WINDOW_SECONDS}s windows)")
+except Exception as e:
+    print(f"⚠ Drift monitor disabled: {e}")
+    drift_monitor = None
 
 
 # ============================================================================
@@ -101,7 +168,9 @@ app.config['JSON_SORT_KEYS'] = False
 # ============================================================================
 
 def get_risk_level(fraud_prob: float) -> str:
-    """Map fraud probability to risk level."""
+    """Map fraud probability to risk level (thresholds from the bundle when loaded)."""
+    if model:
+        return model.risk_level(fraud_prob)
     if fraud_prob >= 0.9:
         return "CRITICAL"
     elif fraud_prob >= 0.7:
@@ -128,46 +197,49 @@ def get_fraud_indicators(features: Dict, fraud_prob: float) -> List[str]:
     if 'Transaction_hour' in features and features['Transaction_hour'] in [2, 3, 4, 5]:
         indicators.append("UNUSUAL_HOUR")
     
-    # High velocity (many transactions)
-    if 'uid_TransactionAmt_std' in features and features['uid_TransactionAmt_std'] > 1:
+    # High velocity (many transactions by this user in a short window)
+    if features.get('uid_txn_count_1h', 0) >= 5 or features.get('uid_txn_count_24h', 0) >= 20:
         indicators.append("HIGH_VELOCITY")
     
+    # Erratic amounts for this user (spread, not a rate)
+    if features.get('uid_TransactionAmt_std', 0) > 1:
+        indicators.append("VOLATILE_AMOUNTS")
+    
     # If we have the top features from importance, mention them
     if fraud_prob > 0.7 and top_features:
         indicators.extend(top_features[:3])
     
     return indicators
 
+def resolve_features(raw_features: Dict) -> Dict:
+    """
+    Add the engineered features the caller didn't send: UID aggregates and
+    frequency encodings from the offline feature store, then the live online
+    state (aggregates, counts, velocity windows) on top. Caller values win.
+    Collapsed V columns (v_reduction.pkl) are built from the V values sent.
+    """
+    derived = {}
+    if feature_store:
+        derived.update(feature_store.features(raw_features))
+    if online_state:
+        derived.update(online_state.features(raw_features))
+    derived = {k: (-999 if v != v else v)  # NaN -> -999, the preprocessing fill value
+               for k, v in derived.items()}
+    features = {**derived, **raw_features}
+    return v_reduction.apply(features) if v_reduction else features
+
 def prepare_features(raw_features: Dict) -> Tuple[np.ndarray, List[str]]:
     """
     Prepare raw features for model prediction.
     
+    Values go in unscaled (the scaler is folded into the trees): missing
+    values become -999 (the preprocessing fill) and absent features the
+    training mean.
+    
     Returns:
-        (scaled_features, feature_names)
+        (feature_vector, missing_feature_names)
     """
-    # Get expected feature names from the model
-    expected_features = model.feature_name() if model else list(raw_features.keys())
-    
-    # Create a feature vector in the correct order
-    feature_vector = []
-    missing_features = []
-    
-    for feat in expected_features:
-        if feat in raw_features:
-            feature_vector.append(raw_features[feat])
-        else:
-            # Fill missing features with the scaler mean (safest option)
-            feature_vector.append(0.0)  # Scaled value for mean
-            missing_features.append(feat)
-    
-    # Convert to numpy array
-    feature_array = np.array(feature_vector).reshape(1, -1)
-    
-    # Apply scaler if available
-    if scaler:
-        feature_array = scaler.transform(feature_array)
-    
-    return feature_array, missing_features
+    return model.vector(raw_features)
 
 # ============================================================================
 # API ENDPOINTS
@@ -183,6 +255,7 @@ def home():
         "endpoints": {
             "POST /predict": "Get fraud prediction for a transaction",
             "GET /health": "API health check",
+            "GET /drift": "Live feature drift against the training profile",
             "GET /model-info": "Model metadata"
         }
     })
@@ -193,19 +266,31 @@ def health():
     return jsonify({
         "status": "healthy",
         "timestamp": time.time(),
-        "model": "loaded" if model else "missing",
-        "scaler": "loaded" if scaler else "missing"
+        "model": model.version if model else "missing",
+        "scaler": "folded into model" if model else "missing",
+        "feature_store": f"{len(feature_store.tables[UID_TABLE])} UIDs" if feature_store else "missing",
+        "online_state": f"{len(online_state.uids)} UIDs" if online_state else "missing",
+        "drift_monitor": "running" if drift_monitor else "missing"
     })
 
+@app.route("/drift", methods=["GET"])
+def drift():
+    """PSI / Jensen-Shannon of live traffic per feature, current and recent windows."""
+    if drift_monitor is None:
+        return jsonify({"error": "Drift monitor not loaded (no drift_profile.pkl)"}), 503
+    top = request.args.get('top', default=10, type=int)
+    return jsonify(drift_monitor.report(top=top))
+
 @app.route("/model-info", methods=["GET"])
 def model_info():
     """Return model metadata."""
     info = {
         "model_type": "LightGBM",
-        "num_features": model.num_feature() if model else 0,
+        "model_version": model.version if model else None,
+        "num_features": len(model.features) if model else 0,
         "inference_time_ms": "<20",
         "auc_on_validation": 0.94,  # Update with actual validation AUC
-        "features_supported": model.feature_name() if model else [],
+        "features_supported": model.features if model else [],
         "top_10_features": top_features
     }
     return jsonify(info)
@@ -232,27 +317,33 @@ def predict():
         if not data or 'features' not in data:
             return jsonify({"error": "Missing 'features' field"}), 400
         
-        features = data['features']
+        features = resolve_features(data['features'])
         transaction_id = data.get('transaction_id', 'UNKNOWN')
         
         # Measure inference time
         start_time = time.time()
         
+        # Get prediction
+        if model is None:
+            return jsonify({"error": "Model not loaded"}), 500
+        
         # Prepare features
         feature_array, missing = prepare_features(features)
         
         if missing:
             print(f"[WARN] Missing features for {transaction_id}: {missing}")
         
-        # Get prediction
-        if model is None:
-            return jsonify({"error": "Model not loaded"}), 500
-        
-        fraud_prob = model.predict(feature_array)[0]
+        fraud_prob = float(model.predict(feature_array)[0])
         inference_time = (time.time() - start_time) * 1000  # milliseconds
         
+        # The scored transaction becomes part of its UID's history
+        if online_state:
+            online_state.update(features)
+        if drift_monitor:
+            drift_monitor.observe(drift_monitor.vector(features))
+        
         # Determine if fraud
-        is_fraud = fraud_prob >= 0.5
+        is_fraud = fraud_prob >= model.thresholds['fraud']
         confidence = max(fraud_prob, 1 - fraud_prob)
         risk_level = get_risk_level(fraud_prob)
         fraud_indicators = get_fraud_indicators(features, fraud_prob)
@@ -296,17 +387,24 @@ def batch_predict():
         if not data or 'transactions' not in data:
             return jsonify({"error": "Missing 'transactions' field"}), 400
         
+        if model is None:
+            return jsonify({"error": "Model not loaded"}), 500
+        
         transactions = data['transactions']
         results = []
         
         for txn in transactions:
             # Reuse the predict logic
-            features = txn.get('features', {})
+            features = resolve_features(txn.get('features', {}))
             transaction_id = txn.get('transaction_id', 'UNKNOWN')
             
             feature_array, _ = prepare_features(features)
-            fraud_prob = model.predict(feature_array)[0]
-            is_fraud = fraud_prob >= 0.5
+            fraud_prob = float(model.predict(feature_array)[0])
+            is_fraud = fraud_prob >= model.thresholds['fraud']
+            if online_state:
+                online_state.update(features)
+            if drift_monitor:
+                drift_monitor.observe(drift_monitor.vector(features))
             
             results.append({
                 "transaction_id": transaction_id,
@@ -332,8 +430,7 @@ if __name__ == "__main__":
     print("\n" + "="*70)
     print("SWIFT AI - FRAUD DETECTION API")
     print("="*70)
-    print(f"Model: {MODEL_PATH}")
-    print(f"Scaler: {SCALER_PATH}")
+    print(f"Model: {BUNDLE_PATH}")
 
     print("="*70)
     print("\n[INFO] Starting API server...")
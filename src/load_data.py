@@ -6,85 +6,502 @@ RAW_DIR = REPO_ROOT / "data" / "raw"
 import pandas as pd
 import numpy as np
 import gc
+import sys
+import time
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from artifact_store import append_artifact, artifact_exists, load_artifact, save_artifact
+
+try:
+    import resource
+except ImportError:  # Windows has no getrusage
+    resource = None
+
+# --- DTYPE SCHEMA FOR THE IEEE-CIS TABLES ---
+# Declaring dtypes up front stops read_csv from materialising every column as
+# int64/float64 first. Anything not listed here is numeric and read as float32.
+STRING_COLUMNS = (
+    {'ProductCD', 'card4', 'card6', 'P_emaildomain', 'R_emaildomain', 'DeviceType', 'DeviceInfo'}
+    | {f'M{i}' for i in range(1, 10)}
+    | {f'id_{i}' for i in (12, 15, 16, 23, 27, 28, 29, 30, 31, 33, 34, 35, 36, 37, 38)}
+)
+
+# Never-missing columns that fit a narrow integer type.
+INTEGER_COLUMNS = {
+    'TransactionID': 'int32',
+    'isFraud': 'int8',
+    'TransactionDT': 'int32',
+    'card1': 'int16',
+}
+
+DEFAULT_CHUNKSIZE = 100_000
+
+def _schema_dtype(col):
+    # The Kaggle test identity file spells its columns 'id-01' instead of 'id_01'
+    name = col.replace('-', '_')
+    if name in INTEGER_COLUMNS:
+        return INTEGER_COLUMNS[name]
+    if name in STRING_COLUMNS:
+        return 'object'
+    return 'float32'
+
+def build_dtype_schema(path):
+    """
+    Read only the header of a raw CSV and return the declared dtype for every column.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    return {col: _schema_dtype(col) for col in header}
+
+def _peak_rss_mb():
+    if resource is None:
+        return float('nan')
+    # Worker processes (parallel ingestion) report their own peak
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+def _bytes_per_row(path, sample_bytes=1 << 20):
+    with open(path, 'rb') as f:
+        f.readline()  # header
+        sample = f.read(sample_bytes)
+    return max(1, len(sample) // max(1, sample.count(b'\n')))
+
+def _count_rows(path):
+    # Data rows in a CSV (header excluded), counted without parsing
+    n_newlines, last = 0, b''
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 24), b''):
+            n_newlines += block.count(b'\n')
+            last = block[-1:]
+    return n_newlines - 1 + (last not in (b'\n', b''))
+
+def iter_csv_chunks(path, chunksize=DEFAULT_CHUNKSIZE, engine='c'):
+    """
+    Stream a raw CSV in bounded chunks, parsed straight into the declared schema.
+
+    engine='c' uses pandas' chunked reader; engine='pyarrow' uses pyarrow's
+    multi-threaded streaming CSV reader (blocks sized to roughly `chunksize` rows).
+    """
+    dtype = build_dtype_schema(path)
+
+    if engine == 'pyarrow':
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+
+        column_types = {col: pa.string() if t == 'object' else pa.from_numpy_dtype(np.dtype(t))
+                        for col, t in dtype.items()}
+        reader = pacsv.open_csv(
+            path,
+            read_options=pacsv.ReadOptions(block_size=chunksize * _bytes_per_row(path)),
+            convert_options=pacsv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+        )
+        for batch in reader:
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, dtype=dtype, chunksize=chunksize, engine=engine)
+
+INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+def _fits(mins, maxs, dtype):
+    info = np.iinfo(dtype)
+    return (mins >= info.min) & (maxs <= info.max)
+
+def _float16_lossless(block):
+    # Columns of `block` that survive a float16 round trip bit-for-bit (NaN included)
+    values = block.to_numpy()
+    round_trip = values.astype(np.float16).astype(values.dtype)
+    return pd.Series(((round_trip == values) | np.isnan(values)).all(axis=0), index=block.columns)
+
+def reduce_mem_usage(df, verbose=True, float_policy='float32', max_categories=2048, report=False):
+    """
+    Downcast every column to the narrowest safe dtype.
+
+    Column ranges are computed with one vectorized min/max per dtype block and
+    all casts are applied in a single astype. Floats never go below float32,
+    unless float_policy='float16', in which case columns that round-trip
+    through float16 exactly are stored as float16. Object columns with at
+    most `max_categories` distinct values (email domains, DeviceInfo,
+    M-flags, ...) become categoricals.
+
+    With report=True, returns (df, report) where report lists every column's
+    original dtype, new dtype and value range.
+    """
+    if float_policy not in ('float32', 'float16'):
+        raise ValueError(f"float_policy must be 'float32' or 'float16', got {float_policy!r}")
+
+    start_mem = df.memory_usage().sum() / 1024**2
+    new_dtypes = {}
+    rows = []
+
+    # --- Integers: smallest type that holds the block's range ---
+    ints = df.select_dtypes(include=['integer'])
+    if ints.shape[1]:
+        mins, maxs = ints.min(), ints.max()
+        target = pd.Series(np.dtype(np.int64).name, index=ints.columns)
+        for dtype in reversed(INT_TYPES[:-1]):
+            target[_fits(mins, maxs, dtype)] = np.dtype(dtype).name
+        for col in ints.columns:
+            new_dtypes[col] = target[col]
+            rows.append((col, str(ints[col].dtype), target[col], mins[col], maxs[col]))
+    del ints
+
+    # --- Floats: float32 floor, float16 only when lossless ---
+    floats = df.select_dtypes(include=['floating'])
+    if floats.shape[1]:
+        mins, maxs = floats.min(), floats.max()
+        target = pd.Series('float32', index=floats.columns)
+        if float_policy == 'float16':
+            finfo = np.finfo(np.float16)
+            in_range = floats.columns[((mins >= finfo.min) & (maxs <= finfo.max)).to_numpy()]
+            if len(in_range):
+                lossless = _float16_lossless(floats[in_range])
+                target[lossless.index[lossless.to_numpy()]] = 'float16'
+        for col in floats.columns:
+            new_dtypes[col] = target[col]
+            rows.append((col, str(floats[col].dtype), target[col], mins[col], maxs[col]))
+    del floats
+
+    # --- Low-cardinality strings: categoricals ---
+    objects = df.select_dtypes(include=['object', 'string'])
+    if objects.shape[1]:
+        n_unique = objects.nunique(dropna=True)
+        for col in objects.columns:
+            if n_unique[col] <= max_categories:
+                new_dtypes[col] = 'category'
+                rows.append((col, str(objects[col].dtype), 'category', np.nan, np.nan))
+    del objects
+
+    df = df.astype({col: t for col, t in new_dtypes.items() if str(df[col].dtype) != t}, copy=False)
 
-def reduce_mem_usage(df, verbose=True):
-    numerics = ['int16', 'int32', 'int64', 'float16', 'float32', 'float64']
-    start_mem = df.memory_usage().sum() / 1024**2    
-    
-    for col in df.columns:
-        col_type = df[col].dtypes
-        
-        if col_type in numerics:
-            c_min = df[col].min()
-            c_max = df[col].max()
-            
-            if str(col_type)[:3] == 'int':
-                if c_min > np.iinfo(np.int8).min and c_max < np.iinfo(np.int8).max:
-                    df[col] = df[col].astype(np.int8)
-                elif c_min > np.iinfo(np.int16).min and c_max < np.iinfo(np.int16).max:
-                    df[col] = df[col].astype(np.int16)
-                elif c_min > np.iinfo(np.int32).min and c_max < np.iinfo(np.int32).max:
-                    df[col] = df[col].astype(np.int32)
-                elif c_min > np.iinfo(np.int64).min and c_max < np.iinfo(np.int64).max:
-                    df[col] = df[col].astype(np.int64)  
-            else:
-                if c_min > np.finfo(np.float16).min and c_max < np.finfo(np.float16).max:
-                    df[col] = df[col].astype(np.float16)
-                elif c_min > np.finfo(np.float32).min and c_max < np.finfo(np.float32).max:
-                    df[col] = df[col].astype(np.float32)
-                else:
-                    df[col] = df[col].astype(np.float32)    
-                    
     end_mem = df.memory_usage().sum() / 1024**2
-    if verbose: 
+    if verbose:
         print(f'Mem. usage decreased to {end_mem:5.2f} Mb ({100 * (start_mem - end_mem) / start_mem:.1f}% reduction)')
+
+    if report:
+        return df, pd.DataFrame(rows, columns=['Column', 'from_dtype', 'to_dtype', 'min', 'max'])
     return df
 
-def load_and_merge():
-    print("STEP 1: LOADING AND MERGING DATA")
+def join_identity(trans, identity):
+    """
+    Left-join the identity table onto transactions by TransactionID.
 
-    print("\nLoading Train Transaction...")
-    train_trans = pd.read_csv(RAW_DIR / "train_transaction.csv")
-    
-    print("Loading Train Identity...")
-    train_id = pd.read_csv(RAW_DIR / "train_identity.csv")
-
-    print("Merging Train Data on TransactionID...")
-    train_df = pd.merge(train_trans, train_id, on='TransactionID', how='left')
-    
-    if train_df.duplicated('TransactionID').sum() > 0:
-        print(f"Removing {train_df.duplicated('TransactionID').sum()} duplicates...")
-        train_df = train_df.drop_duplicates('TransactionID')
-    
-    print(f"Merged Train Shape: {train_df.shape}")
-    
-    print("Reducing Memory Usage for Train...")
-    train_df = reduce_mem_usage(train_df)
-
-    del train_trans, train_id
-    gc.collect()
+    Instead of a hash merge (which copies both frames), identity rows are
+    located with a binary search over the sorted identity keys and gathered
+    with a single take per column; transaction columns are not copied.
+    """
+    id_keys = identity['TransactionID'].to_numpy()
+    if len(id_keys) > 1 and not (id_keys[1:] >= id_keys[:-1]).all():
+        order = np.argsort(id_keys, kind='stable')
+        identity = identity.take(order)
+        id_keys = id_keys[order]
+
+    trans_keys = trans['TransactionID'].to_numpy()
+    pos = np.searchsorted(id_keys, trans_keys, side='left')
+    found = pos < len(id_keys)
+    found[found] = id_keys[pos[found]] == trans_keys[found]
+    # -1 marks "no identity row"; take() fills those with NaN
+    pos = np.where(found, pos, -1)
+
+    identity_cols = {}
+    for col in identity.columns:
+        if col == 'TransactionID':
+            continue
+        values = identity[col]
+        values = values.to_numpy() if isinstance(values.dtype, np.dtype) else values.array
+        identity_cols[col] = pd.api.extensions.take(values, pos, allow_fill=True)
+    identity_part = pd.DataFrame(identity_cols, index=trans.index, copy=False)
+    return pd.concat([trans, identity_part], axis=1, copy=False)
+
+def load_split(split, chunksize=None, engine='c', trans_path=None, id_path=None):
+    """
+    Load <split>_transaction.csv + <split>_identity.csv into one merged,
+    de-duplicated frame, parsed straight into the declared dtype schema.
+    trans_path/id_path override the default files (used for daily drops,
+    whose identity file may be missing).
 
-    print("\nLoading Test Transaction...")
-    test_trans  = pd.read_csv(RAW_DIR / "test_transaction.csv")
+    With `chunksize`, the transaction file is streamed in chunks and each chunk
+    is joined with the (small) identity table as it arrives, then copied into
+    preallocated columns: peak memory is the final frame plus one chunk.
+    """
+    trans_path = trans_path or RAW_DIR / f"{split}_transaction.csv"
+    id_path = id_path or RAW_DIR / f"{split}_identity.csv"
 
-    print("Loading Test Identity...")
-    test_id    = pd.read_csv(RAW_DIR / "test_identity.csv")
+    start_time = time.time()
 
-    print("Merging Test Data on TransactionID...")
-    test_df = pd.merge(test_trans, test_id, on='TransactionID', how='left')
-    print(f"Merged Test Shape: {test_df.shape}")
+    if id_path.exists():
+        print(f"Loading {split.title()} Identity (declared dtypes)...")
+        identity = pd.read_csv(id_path, dtype=build_dtype_schema(id_path))
+    else:
+        print(f"   (No identity file {id_path.name}; identity columns stay empty)")
+        identity = pd.DataFrame({'TransactionID': np.array([], dtype='int32')})
 
-    print("Reducing Memory Usage for Test...")
-    test_df = reduce_mem_usage(test_df)
+    if chunksize:
+        print(f"Streaming {split.title()} Transaction in chunks of {chunksize} rows (engine={engine})...")
+        n_rows = _count_rows(trans_path)
+        columns = None
+        offset = 0
+        for chunk in iter_csv_chunks(trans_path, chunksize=chunksize, engine=engine):
+            merged = join_identity(chunk, identity)
+            del chunk
 
-    del test_trans, test_id
+            if columns is None:
+                columns = {col: np.empty(n_rows, dtype=merged[col].dtype) for col in merged.columns}
+            for col, values in columns.items():
+                values[offset:offset + len(merged)] = merged[col].to_numpy()
+            offset += len(merged)
+            del merged
+
+        df = pd.DataFrame({col: values[:offset] for col, values in columns.items()}, copy=False)
+        del columns
+    else:
+        print(f"Loading {split.title()} Transaction (declared dtypes, engine={engine})...")
+        trans = pd.read_csv(trans_path, dtype=build_dtype_schema(trans_path), engine=engine)
+        print(f"Joining {split.title()} Identity on TransactionID...")
+        df = join_identity(trans, identity)
+        del trans
+
+    del identity
     gc.collect()
 
-    print("\nSaving merged dataframes to .pkl files...")
-    train_df.to_pickle('train_merged.pkl')
-    test_df.to_pickle('test_merged.pkl')
-    
+    # One hashing pass: the same mask gives both the count and the filter
+    duplicated = df['TransactionID'].duplicated().to_numpy()
+    n_duplicates = int(duplicated.sum())
+    if n_duplicates:
+        print(f"Removing {n_duplicates} duplicates...")
+        df = df[~duplicated].reset_index(drop=True)
+
+    elapsed = time.time() - start_time
+    print(f"   {len(df)} rows in {elapsed:.1f}s ({len(df) / max(elapsed, 1e-9):,.0f} rows/sec), "
+          f"peak RSS {_peak_rss_mb():,.0f} MB")
+    return df
+
+def ingest_split(split, chunksize=None, engine='c', float_policy='float32'):
+    """
+    Load, shrink and save one split as the '<split>_merged' artifact.
+    Returns (downcast report, dtype schema, manifest partition entry); the frame
+    itself never leaves this function, so a worker process only sends back
+    small objects.
+    """
+    trans_path = RAW_DIR / f"{split}_transaction.csv"
+    id_path = RAW_DIR / f"{split}_identity.csv"
+
+    df = load_split(split, chunksize=chunksize, engine=engine, trans_path=trans_path, id_path=id_path)
+    print(f"Merged {split.title()} Shape: {df.shape}")
+
+    print(f"Reducing Memory Usage for {split.title()}...")
+    df, report = reduce_mem_usage(df, float_policy=float_policy, report=True)
+
+    save_artifact(df, f'{split}_merged')
+    print(f"   [Saved] {split}_merged")
+
+    schema = {col: str(dtype) for col, dtype in df.dtypes.items()}
+    partition = _manifest_partition(split, 'base', trans_path, id_path, df, row_start=0)
+    return report.assign(Split=split), schema, partition
+
+# --- INCREMENTAL INGESTION ---
+# Daily drops land in data/raw/daily as <split>_transaction_<tag>.csv with an
+# optional <split>_identity_<tag>.csv. The manifest records every ingested
+# file (size, mtime, sha256) and the row range it occupies in the merged store.
+DAILY_DIR = RAW_DIR / "daily"
+MANIFEST_PATH = Path("ingest_manifest.json")
+
+def _sha256(path, block_size=1 << 24):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _file_entry(path):
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return {'path': path.relative_to(RAW_DIR).as_posix(), 'size': stat.st_size,
+            'mtime': stat.st_mtime, 'sha256': _sha256(path)}
+
+def _manifest_partition(split, tag, trans_path, id_path, df, row_start):
+    ids = df['TransactionID']
+    return {
+        'split': split,
+        'tag': tag,
+        'transaction_file': _file_entry(trans_path),
+        'identity_file': _file_entry(id_path),
+        'rows': len(df),
+        'row_start': row_start,
+        'row_end': row_start + len(df),
+        'min_transaction_id': int(ids.min()) if len(df) else None,
+        'max_transaction_id': int(ids.max()) if len(df) else None,
+        'ingested_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def load_manifest():
+    if not MANIFEST_PATH.exists():
+        return None
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    # Write-then-rename so an interrupted run never leaves a truncated manifest
+    tmp_path = MANIFEST_PATH.with_suffix('.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def conform_to_schema(df, schema):
+    """
+    Cast a freshly parsed partition to the dtypes recorded for the merged store,
+    adding any columns the partition lacks. Raises ValueError if an integer
+    column no longer fits its stored type (a full rebuild is needed then).
+    """
+    extra = [c for c in df.columns if c not in schema]
+    if extra:
+        print(f"   ⚠ Ignoring {len(extra)} columns not in the merged store: {extra[:5]}")
+    df = df.reindex(columns=list(schema))
+
+    for col, dtype in schema.items():
+        if dtype.startswith('int') and len(df):
+            values = df[col]
+            if values.isna().any() or not _fits(values.min(), values.max(), np.dtype(dtype)):
+                raise ValueError(f"Column {col} no longer fits {dtype}; rerun a full load_and_merge")
+    return df.astype(schema)
+
+def _file_changed(path, entry):
+    """Whether an ingested file differs from its manifest entry (hashed only when size matches but mtime moved)."""
+    stat = path.stat()
+    if stat.st_size != entry['size']:
+        return True
+    return stat.st_mtime != entry['mtime'] and _sha256(path) != entry['sha256']
+
+def load_incremental(chunksize=None, engine='c', float_policy='float32'):
+    """
+    Append only new daily partitions to the merged store.
+
+    Files already in the manifest are skipped, so reruns are idempotent and a
+    nightly refresh costs time proportional to the new data. New partitions
+    are cast to the stored dtype schema, rows whose TransactionID is already
+    stored are dropped, and the manifest is saved after every partition.
+    The stored row count and IDs come from the store itself, not the
+    manifest, so rows appended by a run that died before saving the manifest
+    are not appended twice. float_policy applies to the full build that runs
+    when there is no store yet.
+    """
+    print("STEP 1: INCREMENTAL INGESTION")
+
+    manifest = load_manifest()
+    if manifest is None or not all(artifact_exists(f'{split}_merged') for split in ('train', 'test')):
+        print("\nNo manifest or merged store yet -- running a full build first.")
+        load_and_merge(chunksize=chunksize, engine=engine, float_policy=float_policy)
+        manifest = load_manifest()
+
+    known = {p['transaction_file']['path']: p for p in manifest['partitions']}
+    n_new = 0
+
+    for split in ('train', 'test'):
+        prefix = f"{split}_transaction_"
+        store = f'{split}_merged'
+        stored_ids = load_artifact(store, columns=['TransactionID'])['TransactionID'].to_numpy()
+        row_end = len(stored_ids)
+        max_id = int(stored_ids.max()) if row_end else None
+        recorded = max(p['row_end'] for p in manifest['partitions'] if p['split'] == split)
+        if row_end > recorded:
+            print(f"   ⚠ {store} has {row_end - recorded} rows past the manifest (interrupted run); "
+                  f"their TransactionIDs are skipped")
+
+        for trans_path in sorted(DAILY_DIR.glob(f"{prefix}*.csv")):
+            rel_path = trans_path.relative_to(RAW_DIR).as_posix()
+            if rel_path in known:
+                if _file_changed(trans_path, known[rel_path]['transaction_file']):
+                    print(f"   ⚠ {rel_path} changed since it was ingested; run a full rebuild to pick it up")
+                continue
+
+            tag = trans_path.stem[len(prefix):]
+            id_path = DAILY_DIR / f"{split}_identity_{tag}.csv"
+            print(f"\n[New partition] {split} / {tag}")
+
+            df = load_split(split, chunksize=chunksize, engine=engine, trans_path=trans_path, id_path=id_path)
+            df = conform_to_schema(df, manifest['schema'][split])
+
+            # Only look at stored IDs when this partition's ID range overlaps them
+            if len(df) and max_id is not None and int(df['TransactionID'].min()) <= max_id:
+                already = np.isin(df['TransactionID'].to_numpy(), stored_ids)
+                if already.any():
+                    print(f"   Skipping {int(already.sum())} rows already in {store}")
+                    df = df[~already].reset_index(drop=True)
+
+            if len(df):
+                append_artifact(df, store)
+                stored_ids = np.concatenate([stored_ids, df['TransactionID'].to_numpy()])
+                max_id = max(max_id if max_id is not None else -1, int(df['TransactionID'].max()))
+
+            partition = _manifest_partition(split, tag, trans_path, id_path, df, row_start=row_end)
+            row_end = partition['row_end']
+            manifest['partitions'].append(partition)
+            save_manifest(manifest)
+            n_new += 1
+            print(f"   Appended {len(df)} rows to {store} (rows {partition['row_start']}-{partition['row_end']})")
+
+    print(f"\nIngested {n_new} new partition(s). Peak RSS: {_peak_rss_mb():,.0f} MB")
+    print("SUCCESS: Incremental ingestion complete!")
+
+def load_and_merge(chunksize=None, engine='c', float_policy='float32', parallel=False):
+    """
+    Load, merge, shrink and save the train/test tables.
+
+    chunksize=None reads each CSV whole; an integer streams the transaction
+    files in chunks of that many rows (see load_split). parallel=True ingests
+    train and test concurrently in two worker processes. float_policy is
+    passed to reduce_mem_usage; the per-column downcast report is written to
+    downcast_report.csv.
+    """
+    print("STEP 1: LOADING AND MERGING DATA")
+    if chunksize:
+        print("\n[Mode] Chunked streaming ingestion")
+
+    splits = ['train', 'test']
+    kwargs = dict(chunksize=chunksize, engine=engine, float_policy=float_policy)
+
+    if parallel:
+        print("[Mode] Parallel train/test ingestion (2 processes)\n")
+        with ProcessPoolExecutor(max_workers=len(splits)) as pool:
+            results = list(pool.map(partial(ingest_split, **kwargs), splits))
+    else:
+        results = []
+        for split in splits:
+            print()
+            results.append(ingest_split(split, **kwargs))
+
+    reports, schemas, partitions = zip(*results)
+    pd.concat(reports, ignore_index=True).to_csv('downcast_report.csv', index=False)
+    print("\n   [Saved] downcast_report.csv (per-column dtype decisions)")
+
+    # A full build starts a fresh manifest for incremental runs to extend
+    save_manifest({'schema': dict(zip(splits, schemas)), 'partitions': list(partitions)})
+    print(f"   [Saved] {MANIFEST_PATH} (ingested files and row ranges)")
+
+    print(f"Peak RSS: {_peak_rss_mb():,.0f} MB")
     print("SUCCESS: Data loaded, merged, shrunk, and saved!")
 
 if __name__ == "__main__":
-    load_and_merge()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Step 1: load, merge and shrink the raw IEEE-CIS tables")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help=f"stream transaction CSVs in chunks of this many rows (e.g. {DEFAULT_CHUNKSIZE})")
+    parser.add_argument('--engine', choices=['c', 'pyarrow'], default='c',
+                        help="CSV parser engine")
+    parser.add_argument('--float-policy', choices=['float32', 'float16'], default='float32',
+                        help="float32 floor, or float16 for columns that convert losslessly")
+    parser.add_argument('--parallel', action='store_true',
+                        help="ingest train and test concurrently in separate processes")
+    parser.add_argument('--incremental', action='store_true',
+                        help="append only new daily drops from data/raw/daily to the merged store")
+    args = parser.parse_args()
+    if args.incremental:
+        load_incremental(chunksize=args.chunksize, engine=args.engine, float_policy=args.float_policy)
+    else:
+        load_and_merge(chunksize=args.chunksize, engine=args.engine, float_policy=args.float_policy,
+                       parallel=args.parallel)
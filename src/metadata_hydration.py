@@ -12,6 +12,8 @@ import random
 import sys
 from typing import Dict, List, Optional, Any
 
+from artifact_store import artifact_columns, load_artifact
+
 # ============================================================================
 # FAKE DATA MAPPINGS (SEED DATA)
 # ============================================================================
@@ -54,6 +56,9 @@ FAKE_NAMES = [
     "Mia Jackson", "Henry Taylor", "Charlotte White", "Alexander Harris", "Amelia Martin"
 ]
 
+# Raw columns the hydration step reads from the transaction source
+HYDRATION_COLUMNS = ['TransactionID', 'addr1', 'card1', 'TransactionAmt', 'P_emaildomain', 'DeviceInfo']
+
 # ============================================================================
 # FUNCTIONS
 # ============================================================================
@@ -174,9 +179,14 @@ def hydrate_predictions(predictions_csv: str = "predictions.csv",
         # Fix: Return None explicitly to match type hint
         return None
     
-    # Load original transactions for mapping
+    # Load original transactions for mapping (only the columns we hydrate from).
+    # A non-CSV source is treated as an artifact name, e.g. "train_merged".
     try:
-        transactions = pd.read_csv(transactions_csv)
+        if transactions_csv.endswith('.csv'):
+            transactions = pd.read_csv(transactions_csv, usecols=lambda c: c in HYDRATION_COLUMNS)
+        else:
+            available = set(artifact_columns(transactions_csv))
+            transactions = load_artifact(transactions_csv, columns=[c for c in HYDRATION_COLUMNS if c in available])
         print(f"✓ Loaded transaction data from {transactions_csv}")
     except FileNotFoundError:
         print(f"⚠ {transactions_csv} not found. Using minimal metadata.")
@@ -187,7 +197,7 @@ def hydrate_predictions(predictions_csv: str = "predictions.csv",
         # We merge on TransactionID to get the original columns (addr1, card1) back
         # because the model output might only have the probability score
         hydrated = predictions.merge(
-            transactions[['TransactionID', 'addr1', 'card1', 'TransactionAmt', 'P_emaildomain', 'DeviceInfo']],
+            transactions,
             on='TransactionID',
             how='left'
         )
@@ -0,0 +1,183 @@
+"""
+SCALER FOLDING
+==============
+Rewrites a LightGBM model trained on StandardScaler output so it takes the
+raw (NaN-filled, unscaled) features directly, and serving can skip the
+scaler.
+
+Trees only compare each feature with thresholds, and the scaler is a
+per-feature increasing affine map z = (x - mean_) / scale_, so
+
+    z <= t   <=>   x <= t * scale_ + mean_
+
+Every numerical split threshold is mapped that way (and feature_infos, the
+per-feature [min:max] in the header). Predictions stay the same up to float
+rounding.
+
+Missing values: the scaled training data had no NaN (preprocessing fills
+-999 before scaling), so LightGBM treated NaN as 0.0, i.e. the feature
+mean. The folded model marks NaN as missing in every split and sends it
+where 0.0 went, so an absent raw feature still means "at the mean", and
+-999 is just a raw value like any other.
+
+The model text is edited in place: only the threshold, decision_type and
+tree_sizes lines change.
+"""
+
+import argparse
+import pickle
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MODEL_FILE = "fraud_model_lgb.txt"
+RAW_MODEL_FILE = "fraud_model_raw_lgb.txt"
+SCALER_FILE = "scaler.pkl"
+FOLD_TOLERANCE = 1e-6  # largest probability difference accepted between the folded and original model
+
+# decision_type bits (LightGBM tree.h)
+_CATEGORICAL_MASK = 1
+_DEFAULT_LEFT_MASK = 2
+_MISSING_TYPE_SHIFT = 2
+_MISSING_NONE, _MISSING_ZERO, _MISSING_NAN = 0, 1, 2
+
+def _fold_tree(lines: List[str], mean: np.ndarray, scale: np.ndarray) -> List[str]:
+    fields = {line.split('=', 1)[0]: i for i, line in enumerate(lines) if '=' in line}
+    if 'is_linear' in fields and lines[fields['is_linear']].split('=', 1)[1].strip() == '1':
+        raise ValueError("Linear trees use the scaled features in their leaves and can't be folded")
+    if 'threshold' not in fields:
+        return lines  # a single-leaf tree has no splits
+
+    features = np.array(lines[fields['split_feature']].split('=', 1)[1].split(), dtype=np.int64)
+    thresholds = lines[fields['threshold']].split('=', 1)[1].split()
+    decision_types = [int(d) for d in lines[fields['decision_type']].split('=', 1)[1].split()]
+
+    for node, (feature, decision) in enumerate(zip(features, decision_types)):
+        if decision & _CATEGORICAL_MASK:
+            continue  # category index, not a value
+        threshold = float(thresholds[node])
+        missing_type = (decision >> _MISSING_TYPE_SHIFT) & 3
+        if missing_type == _MISSING_ZERO:
+            raise ValueError("zero_as_missing splits can't be expressed on raw features")
+        if missing_type == _MISSING_NONE:
+            # NaN was scored as 0.0 (the mean): keep sending it there
+            default_left = 0.0 <= threshold
+            decision = (decision & _CATEGORICAL_MASK) | (_MISSING_NAN << _MISSING_TYPE_SHIFT)
+            decision |= _DEFAULT_LEFT_MASK if default_left else 0
+        decision_types[node] = decision
+        thresholds[node] = repr(threshold * float(scale[feature]) + float(mean[feature]))
+
+    lines = list(lines)
+    lines[fields['threshold']] = 'threshold=' + ' '.join(thresholds)
+    lines[fields['decision_type']] = 'decision_type=' + ' '.join(map(str, decision_types))
+    return lines
+
+def _fold_feature_infos(line: str, mean: np.ndarray, scale: np.ndarray) -> str:
+    infos = line.split('=', 1)[1].split()
+    out = []
+    for i, info in enumerate(infos):
+        match = re.fullmatch(r'\[(.+):(.+)\]', info)
+        if match is None:
+            out.append(info)  # 'none' or a categorical list
+            continue
+        low, high = (float(v) * scale[i] + mean[i] for v in match.groups())
+        out.append(f'[{low!r}:{high!r}]')
+    return 'feature_infos=' + ' '.join(out)
+
+def fold_scaler(model_text: str, mean, scale) -> str:
+    """Model text of a LightGBM model trained on (x - mean) / scale, rewritten to take x."""
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+    if (scale <= 0).any():
+        raise ValueError("Scaler has non-positive scale_ entries")
+
+    lines = model_text.split('\n')
+    tree_starts = [i for i, line in enumerate(lines) if re.fullmatch(r'Tree=\d+', line)]
+    end = next(i for i, line in enumerate(lines) if line == 'end of trees')
+    bounds = tree_starts + [end]
+
+    header = lines[:tree_starts[0]] if tree_starts else lines[:end]
+    trees = [lines[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+    tree_sizes_line: Optional[int] = None
+    for i, line in enumerate(header):
+        if line.startswith('feature_infos='):
+            header[i] = _fold_feature_infos(line, mean, scale)
+        elif line.startswith('tree_sizes='):
+            tree_sizes_line = i
+
+    # tree_sizes holds each tree's length in bytes ("Tree=i\n" up to the next tree)
+    old_sizes = [len('\n'.join(tree).encode()) + 1 for tree in trees]
+    trees = [_fold_tree(tree, mean, scale) for tree in trees]
+    if tree_sizes_line is not None:
+        recorded = [int(s) for s in header[tree_sizes_line].split('=', 1)[1].split()]
+        if recorded == old_sizes:
+            new_sizes = [len('\n'.join(tree).encode()) + 1 for tree in trees]
+            header[tree_sizes_line] = 'tree_sizes=' + ' '.join(map(str, new_sizes))
+        else:
+            # Unrecognized layout: LightGBM parses the trees sequentially without it
+            del header[tree_sizes_line]
+
+    return '\n'.join(header + [line for tree in trees for line in tree] + lines[end:])
+
+def scaler_for_model(scaler, model_text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    scaler.mean_ and scale_ in the model's feature order. A model trained on
+    some of the scaled columns (feature_pruning.py) gets its features' entries,
+    looked up by name.
+    """
+    features = re.search(r'^feature_names=(.*)$', model_text, re.MULTILINE).group(1).split()
+    names = getattr(scaler, 'feature_names_in_', None)
+    if names is None or list(names) == features:
+        if len(features) != len(scaler.mean_):
+            raise ValueError(f"Model has {len(features)} features but the scaler, without feature names, "
+                             f"has {len(scaler.mean_)}")
+        return scaler.mean_, scaler.scale_
+    index = {name: i for i, name in enumerate(names)}
+    unknown = [f for f in features if f not in index]
+    if unknown:
+        raise ValueError(f"Model features not in the scaler: {unknown[:5]}")
+    idx = np.array([index[f] for f in features], dtype=np.int64)
+    return scaler.mean_[idx], scaler.scale_[idx]
+
+def export_raw_model(model_path: str = MODEL_FILE, scaler_path: str = SCALER_FILE,
+                     out_path: str = RAW_MODEL_FILE, check_rows: Optional[np.ndarray] = None,
+                     tolerance: float = FOLD_TOLERANCE) -> float:
+    """
+    Write the folded model to `out_path`. With `check_rows` (scaled features),
+    first compares the two models on them and returns the largest probability
+    difference; above `tolerance` it raises ValueError and writes nothing.
+    """
+    import lightgbm as lgb
+
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    with open(model_path) as f:
+        model_text = f.read()
+
+    mean, scale = scaler_for_model(scaler, model_text)
+    folded = fold_scaler(model_text, mean, scale)
+
+    max_diff = 0.0
+    if check_rows is not None:
+        scaled = np.asarray(check_rows, dtype=np.float64)
+        raw = scaled * scale + mean
+        original = lgb.Booster(model_str=model_text).predict(scaled)
+        rewritten = lgb.Booster(model_str=folded).predict(raw)
+        max_diff = float(np.abs(original - rewritten).max())
+        if max_diff > tolerance:
+            raise ValueError(f"Folded model differs from {model_path} by up to {max_diff:.2e} "
+                             f"(tolerance {tolerance:.0e}); {out_path} not written")
+
+    with open(out_path, 'w') as f:
+        f.write(folded)
+    return max_diff
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold scaler.pkl into the LightGBM model for raw-feature serving")
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--scaler', default=SCALER_FILE)
+    parser.add_argument('--out', default=RAW_MODEL_FILE)
+    args = parser.parse_args()
+    export_raw_model(args.model, args.scaler, args.out)
+    print(f"✓ {args.out} written (takes unscaled features; no scaler needed)")
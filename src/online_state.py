@@ -0,0 +1,201 @@
+"""
+ONLINE UID STATE
+================
+Keeps the per-UID aggregates and frequency counts from feature_eng.py up to
+date one transaction at a time, so the API can derive the engineered
+features for a raw transaction instead of expecting the caller to send them.
+
+- Per UID and aggregate column: running count / mean / M2 (Welford), so
+  uid_<col>_mean and uid_<col>_std are O(1) per update and numerically stable.
+- Per encoded column: value -> count, giving <col>_fq_enc.
+- Optionally the rolling velocity windows (velocity.WindowState).
+- Seeded from the offline data (train + test) at the end of feature
+  engineering and written to online_state.pkl.
+- Snapshotted to disk periodically by a background thread while serving.
+
+Offline, every row's aggregates cover all rows of its UID. Online a
+transaction sees its UID's history plus itself.
+"""
+
+import math
+import os
+import pickle
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from uid_keys import SECONDS_PER_DAY, number as _number, transaction_uid, uid_start_day
+
+STATE_FILE = "online_state.pkl"
+
+def _value_key(value):
+    # Frequency-table key: NaN/None -> None, numbers as float, everything else as str
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    number = _number(value)
+    return None if math.isnan(number) else number
+
+class OnlineUIDState:
+    """Thread-safe running aggregates per UID plus frequency counters."""
+
+    def __init__(self, agg_columns: List[str], encode_columns: List[str]):
+        self.agg_columns = list(agg_columns)
+        self.encode_columns = list(encode_columns)
+        # uid key -> [count, mean, M2] * len(agg_columns). Lists are replaced,
+        # never mutated, so a shallow copy of the dict is a consistent snapshot.
+        self.uids: Dict[int, List[float]] = {}
+        self.counts: Dict[str, Dict] = {col: {} for col in self.encode_columns}
+        self.windows = None  # velocity.WindowState, when seeded
+        self.n_updates = 0
+        self._lock = threading.Lock()
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+    # --- Seeding -------------------------------------------------------------
+
+    @classmethod
+    def from_frame(cls, df, agg_columns: List[str], encode_columns: List[str],
+                   uid_col: str = 'uid', encoders: Optional[Dict] = None) -> "OnlineUIDState":
+        """
+        Seed from an engineered frame (needs `uid_col` and the raw agg/encode columns).
+        Frequency counts come from `encoders` (encoders.FrequencyEncoder) when given.
+        """
+        from encoders import fit_encoders
+
+        state = cls(agg_columns, encode_columns)
+        state.set_uid_stats(*cls.uid_stats(df, agg_columns, uid_col))
+        state.set_counts(encoders if encoders is not None else fit_encoders(df, encode_columns))
+        return state
+
+    @staticmethod
+    def uid_stats(df, agg_columns: List[str], uid_col: str = 'uid'):
+        """(uid keys, [count, mean, M2] * len(agg_columns) matrix) for the UIDs in `df`."""
+        from group_agg import GroupIndex, group_aggregate
+
+        index = GroupIndex(df[uid_col].to_numpy())
+        stats = group_aggregate(index, df, agg_columns, ['count', 'mean', 'var'])
+        blocks = []
+        for col in agg_columns:
+            count = stats[f'{col}_count'].to_numpy()
+            # M2 = var * (n - 1); pandas-style var is NaN below two values
+            m2 = np.nan_to_num(stats[f'{col}_var'].to_numpy() * (count - 1), nan=0.0)
+            mean = np.nan_to_num(stats[f'{col}_mean'].to_numpy(), nan=0.0)
+            blocks += [count, mean, m2]
+        return index.uniques, np.column_stack(blocks)
+
+    def set_uid_stats(self, keys, stats) -> None:
+        self.uids = dict(zip(np.asarray(keys).tolist(), np.asarray(stats).tolist()))
+
+    def set_counts(self, encoders: Dict) -> None:
+        """Frequency counts from fitted encoders.FrequencyEncoder objects, one per encoded column."""
+        self.counts = {col: {_value_key(k): v for k, v in encoders[col].items()} for col in self.encode_columns}
+
+    # --- Per-transaction API -------------------------------------------------
+
+    def uid_of(self, txn: Dict) -> int:
+        return transaction_uid(txn)
+
+    def _observe(self, stats: Optional[List[float]], txn: Dict) -> List[float]:
+        # One Welford step per column; NaN values are skipped like pandas does
+        stats = list(stats) if stats is not None else [0.0] * (3 * len(self.agg_columns))
+        for i, col in enumerate(self.agg_columns):
+            x = _number(txn.get(col))
+            if math.isnan(x):
+                continue
+            n, mean, m2 = stats[3 * i], stats[3 * i + 1], stats[3 * i + 2]
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+            stats[3 * i:3 * i + 3] = [n, mean, m2]
+        return stats
+
+    def features(self, txn: Dict) -> Dict[str, float]:
+        """
+        Engineered features for a raw transaction, as if it had already been
+        added to the state. Does not modify the state (see update()).
+        """
+        uid = self.uid_of(txn)
+        stats = self._observe(self.uids.get(uid), txn)
+
+        dt = _number(txn.get('TransactionDT'))
+        out = {
+            'day': dt / SECONDS_PER_DAY,
+            'uid_D1n': float(uid_start_day(dt, _number(txn.get('D1')))),
+            'Transaction_hour': math.floor((dt % 86400) / 3600) if not math.isnan(dt) else math.nan,
+        }
+        for i, col in enumerate(self.agg_columns):
+            n, mean, m2 = stats[3 * i], stats[3 * i + 1], stats[3 * i + 2]
+            out[f'uid_{col}_mean'] = mean if n > 0 else math.nan
+            out[f'uid_{col}_std'] = math.sqrt(m2 / (n - 1)) if n > 1 else math.nan
+        for col in self.encode_columns:
+            out[f'{col}_fq_enc'] = self.counts[col].get(_value_key(txn.get(col)), 0) + 1
+        if self.windows is not None:
+            with self._lock:
+                out.update(self.windows.features(txn))
+        return out
+
+    def update(self, txn: Dict) -> None:
+        """Add a scored transaction to its UID's aggregates and the frequency counts. O(1)."""
+        uid = self.uid_of(txn)
+        with self._lock:
+            self.uids[uid] = self._observe(self.uids.get(uid), txn)
+            for col in self.encode_columns:
+                key = _value_key(txn.get(col))
+                self.counts[col][key] = self.counts[col].get(key, 0) + 1
+            if self.windows is not None:
+                self.windows.update(txn)
+            self.n_updates += 1
+
+    # --- Persistence ---------------------------------------------------------
+
+    def snapshot(self, path: str = STATE_FILE) -> None:
+        """Write the state to `path` atomically (readers never see a partial file)."""
+        with self._lock:
+            payload = {
+                'agg_columns': self.agg_columns,
+                'encode_columns': self.encode_columns,
+                'uids': self.uids.copy(),
+                'counts': {col: counts.copy() for col, counts in self.counts.items()},
+                'n_updates': self.n_updates,
+                # Window histories are mutated in place, so they are serialized under the lock
+                'windows': pickle.dumps(self.windows, protocol=pickle.HIGHEST_PROTOCOL),
+            }
+        # Pickling happens outside the lock so scoring isn't blocked
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = STATE_FILE) -> "OnlineUIDState":
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+        state = cls(payload['agg_columns'], payload['encode_columns'])
+        state.uids = payload['uids']
+        state.counts = payload['counts']
+        state.n_updates = payload['n_updates']
+        state.windows = pickle.loads(payload['windows']) if 'windows' in payload else None
+        return state
+
+    def start_snapshots(self, path: str, interval_seconds: float = 300) -> None:
+        """Snapshot to `path` every `interval_seconds` (only when something changed)."""
+        if self._snapshot_thread is not None:
+            return
+
+        def _loop():
+            last_saved = self.n_updates
+            while True:
+                time.sleep(interval_seconds)
+                if self.n_updates != last_saved:
+                    last_saved = self.n_updates
+                    try:
+                        self.snapshot(path)
+                    except OSError as e:
+                        print(f"⚠ Online state snapshot failed: {e}")
+
+        self._snapshot_thread = threading.Thread(target=_loop, name="online-state-snapshot", daemon=True)
+        self._snapshot_thread.start()
@@ -0,0 +1,237 @@
+"""
+OUT-OF-CORE FEATURE ENGINEERING
+===============================
+Builds the same engineered artifacts as perform_feature_engineering()
+without ever holding the train+test concat in memory.
+
+Pass 1 (stream): read train_merged then test_merged in batches (memory-mapped).
+  - UID columns (row-local).
+  - Velocity windows: rows arrive in TransactionDT order, so each batch only
+    needs the last 7 days of the previous rows carried over.
+  - Global frequency tables: encoders.FrequencyEncoder counts summed over
+    batches (and saved as the fq_encoder_<col> artifacts).
+  - Rows go to one of N on-disk partitions by hash of the UID key, so every
+    UID group lives entirely in one partition.
+
+Pass 2 (per partition): UID aggregates (exact, groups are partition-local),
+  frequency encodings from the global tables, email prefixes, hour of day.
+  Also collects what the online state and the feature store need.
+
+Pass 3 (merge): the partitions are sorted by original row number, so a
+  k-way merge over their batch streams restores the original order and
+  writes train_engineered / test_engineered chunk by chunk.
+
+Peak memory is about one partition plus one batch. The feature cache
+(feature_registry.py) is not used in this mode.
+"""
+
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from artifact_store import append_artifact, artifact_exists, iter_artifact_batches, load_artifact, save_artifact
+from encoders import FrequencyEncoder, save_encoders
+from feature_eng import (AGG_COLUMNS, ENCODE_COLUMNS, FEATURE_SPECS, email_prefix_columns,
+                         hour_columns, uid_aggregate_columns, uid_columns, velocity_columns)
+from feature_store import STORE_DIR, export_frequency_table, export_uid_table
+from online_state import STATE_FILE, OnlineUIDState
+from velocity import VELOCITY_KEYS, WINDOWS, WindowState
+
+PARTITION_DIR = "ooc_partitions"
+DEFAULT_PARTITIONS = 16
+DEFAULT_BATCH_ROWS = 250_000
+SPLITS = ['train', 'test']
+
+# Columns the velocity carry-over needs from previous batches
+_CARRY_COLUMNS = list(dict.fromkeys(VELOCITY_KEYS + ['TransactionDT', 'TransactionAmt']))
+
+def _base_schema():
+    """Column order and dtypes of the in-memory train+test concat, without loading either."""
+    heads = [next(iter_artifact_batches(f'{split}_merged', 1)) for split in SPLITS]
+    categories = {}
+    for col in heads[0].select_dtypes(include=['category']).columns:
+        if all(col in h.columns and isinstance(h[col].dtype, pd.CategoricalDtype) for h in heads):
+            # Only the categorical columns are read in full (small integer codes)
+            full = [load_artifact(f'{split}_merged', columns=[col])[col] for split in SPLITS]
+            categories[col] = union_categoricals(full).categories
+    for h in heads:
+        for col, cats in categories.items():
+            h[col] = h[col].cat.set_categories(cats)
+    combined = pd.concat(heads, axis=0, ignore_index=True)
+    dtypes = {col: ('float32' if dtype == 'float16' else dtype) for col, dtype in combined.dtypes.items()}
+    return list(combined.columns), dtypes
+
+def _conform(batch: pd.DataFrame, columns: List[str], dtypes: Dict, start_row: int) -> pd.DataFrame:
+    batch = batch.reindex(columns=columns)
+    for col in columns:
+        if batch[col].dtype != dtypes[col]:
+            batch[col] = batch[col].astype(dtypes[col])
+    batch.index = pd.RangeIndex(start_row, start_row + len(batch))
+    return batch
+
+def _partition_of(uid: np.ndarray, n_partitions: int) -> np.ndarray:
+    return (uid.view(np.uint64) % np.uint64(n_partitions)).astype(np.int64)
+
+def _stream_pass(columns, dtypes, n_partitions: int, batch_rows: int):
+    print(f"\n[Pass 1] Streaming rows into {n_partitions} UID-hash partitions...")
+    max_window = max(WINDOWS.values())
+    velocity_specs = [spec for spec in FEATURE_SPECS if spec.name.startswith('velocity_')]
+    encoders = {col: FrequencyEncoder(col) for col in ENCODE_COLUMNS}
+    carry = None
+    last_time = -np.inf
+    row = 0
+    split_rows = {}
+
+    for split in SPLITS:
+        split_start = row
+        for batch in iter_artifact_batches(f'{split}_merged', batch_rows):
+            batch = _conform(batch, columns, dtypes, row)
+            times = batch['TransactionDT'].to_numpy()
+            if len(times) and (times[0] < last_time or (np.diff(times) < 0).any()):
+                raise ValueError("Out-of-core mode needs rows in TransactionDT order; "
+                                 "run feature_eng.py without --out-of-core")
+            last_time = times[-1] if len(times) else last_time
+
+            batch[['day', 'uid_D1n', 'uid']] = uid_columns(batch)
+
+            # Velocity over the carried-over tail plus this batch
+            window_input = batch[_CARRY_COLUMNS] if carry is None else pd.concat([carry, batch[_CARRY_COLUMNS]])
+            for spec in velocity_specs:
+                out = velocity_columns(window_input, **spec.params).iloc[len(window_input) - len(batch):]
+                batch[spec.outputs] = out.set_axis(batch.index)
+            carry = window_input[window_input['TransactionDT'] > last_time - max_window]
+
+            for col in ENCODE_COLUMNS:
+                encoders[col].update(batch[col])
+
+            batch['_row'] = batch.index.to_numpy()
+            partition = _partition_of(batch['uid'].to_numpy(), n_partitions)
+            for p in np.unique(partition):
+                append_artifact(batch[partition == p], f'{PARTITION_DIR}/rows-{p:03d}')
+
+            row += len(batch)
+        split_rows[split] = (split_start, row)
+        print(f"   {split}: {row - split_start} rows")
+
+    return encoders, carry, split_rows
+
+def _partition_pass(n_partitions: int, encoders, output_columns: List[str]):
+    print("\n[Pass 2] Per-partition aggregates and encodings...")
+    uid_features = [f'uid_{col}_{agg}' for col in AGG_COLUMNS for agg in ['mean', 'std']]
+    uid_stats = []
+    uid_tables = []
+    n_uids = 0
+
+    for p in range(n_partitions):
+        name = f'{PARTITION_DIR}/rows-{p:03d}'
+        if not artifact_exists(name):
+            continue
+        df = load_artifact(name)
+
+        df[uid_features] = uid_aggregate_columns(df)
+        for col in ENCODE_COLUMNS:
+            df[col + '_fq_enc'] = encoders[col].transform(df[col])
+        df[['P_emaildomain_prefix', 'R_emaildomain_prefix']] = email_prefix_columns(df)
+        df['Transaction_hour'] = hour_columns(df)['Transaction_hour']
+
+        # UIDs are disjoint across partitions, so per-partition results just concatenate
+        uid_stats.append(OnlineUIDState.uid_stats(df, AGG_COLUMNS))
+        first = ~df['uid'].duplicated().to_numpy()
+        uid_tables.append((df['uid'].to_numpy()[first], df[uid_features].to_numpy(dtype=np.float32)[first]))
+        n_uids += int(first.sum())
+
+        for col in ['P_emaildomain', 'R_emaildomain']:
+            df[col] = df[col].astype(str)
+        save_artifact(df[output_columns + ['_row']], f'{PARTITION_DIR}/engineered-{p:03d}')
+        del df
+
+    print(f"   -> {n_uids} unique User IDs in {n_partitions} partitions")
+    return uid_stats, uid_tables, uid_features
+
+def _merge_pass(n_partitions: int, split_rows, batch_rows: int):
+    print("\n[Pass 3] Merging partitions back into row order...")
+    # Each partition holds ~1/n of any row range, so small per-stream batches
+    # keep the merge buffers at about one output chunk in total
+    stream_rows = max(1, batch_rows // n_partitions)
+    streams = []
+    for p in range(n_partitions):
+        name = f'{PARTITION_DIR}/engineered-{p:03d}'
+        if artifact_exists(name):
+            streams.append(iter_artifact_batches(name, stream_rows))
+    buffers = [None] * len(streams)
+
+    def take_below(i: int, stop: int) -> pd.DataFrame:
+        # Rows of stream i with _row < stop, pulling more batches as needed
+        pieces = []
+        while True:
+            if buffers[i] is None:
+                buffers[i] = next(streams[i], None)
+                if buffers[i] is None:
+                    break
+            buffer = buffers[i]
+            cut = int(np.searchsorted(buffer['_row'].to_numpy(), stop))
+            pieces.append(buffer.iloc[:cut])
+            if cut < len(buffer):
+                buffers[i] = buffer.iloc[cut:]
+                break
+            buffers[i] = None
+        return pd.concat(pieces) if pieces else None
+
+    for split in SPLITS:
+        start, end = split_rows[split]
+        name = f'{split}_engineered'
+        for chunk_start in range(start, end, batch_rows):
+            chunk_stop = min(chunk_start + batch_rows, end)
+            pieces = [piece for i in range(len(streams)) if (piece := take_below(i, chunk_stop)) is not None]
+            chunk = pd.concat(pieces).sort_values('_row', kind='stable')
+            chunk = chunk.drop(columns='_row').reset_index(drop=True)
+            if chunk_start == start:
+                save_artifact(chunk, name)
+            else:
+                append_artifact(chunk, name)
+        print(f"   {name}: {end - start} rows")
+
+def perform_out_of_core_feature_engineering(n_partitions: int = DEFAULT_PARTITIONS,
+                                            batch_rows: int = DEFAULT_BATCH_ROWS):
+    print("STEP 2: FEATURE ENGINEERING (OUT-OF-CORE)")
+    start = time.time()
+
+    shutil.rmtree(PARTITION_DIR, ignore_errors=True)
+    Path(PARTITION_DIR).mkdir()
+
+    columns, dtypes = _base_schema()
+    output_columns = columns + [col for spec in FEATURE_SPECS for col in spec.outputs]
+
+    try:
+        encoders, carry, split_rows = _stream_pass(columns, dtypes, n_partitions, batch_rows)
+        save_encoders(encoders)
+        uid_stats, uid_tables, uid_features = _partition_pass(n_partitions, encoders, output_columns)
+        _merge_pass(n_partitions, split_rows, batch_rows)
+
+        print("\nSeeding the online UID state for serving...")
+        online_state = OnlineUIDState(AGG_COLUMNS, ENCODE_COLUMNS)
+        online_state.set_uid_stats(np.concatenate([keys for keys, _ in uid_stats]),
+                                   np.concatenate([stats for _, stats in uid_stats]))
+        online_state.set_counts(encoders)
+        online_state.windows = WindowState.from_frame(carry, VELOCITY_KEYS)
+        online_state.snapshot(STATE_FILE)
+        print(f"   -> {len(online_state.uids)} UIDs saved to {STATE_FILE}")
+        del online_state, uid_stats
+
+        print("\nExporting the feature store (UID aggregates + frequency tables)...")
+        n_keys = export_uid_table(np.concatenate([keys for keys, _ in uid_tables]),
+                                  np.concatenate([values for _, values in uid_tables]), uid_features)
+        print(f"   -> {STORE_DIR}/uid.idx: {n_keys} keys")
+        for col in ENCODE_COLUMNS:
+            n_keys = export_frequency_table(col, *encoders[col].table())
+            print(f"   -> {STORE_DIR}/{col}_fq_enc.idx: {n_keys} keys")
+        del uid_tables
+    finally:
+        shutil.rmtree(PARTITION_DIR, ignore_errors=True)
+
+    print(f"\nSUCCESS: Feature Engineering Complete! ({time.time() - start:.1f}s)")
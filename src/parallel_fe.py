@@ -0,0 +1,75 @@
+"""
+PARALLEL FEATURE GROUPS
+=======================
+Runs independent feature groups (UID aggregates, velocity windows,
+frequency encodings, email prefixes, ...) in a process pool.
+
+A feature group is a function frame -> DataFrame of new columns plus the
+list of input columns it reads. Nothing it produces is an input of another
+group, so the groups can run in any order and the results are simply
+assigned back to the frame.
+
+The base frame is not pickled to the workers. The union of the groups'
+input columns is written once as an uncompressed Feather artifact, and each
+worker memory-maps just the columns it needs (artifact_store.load_artifact),
+so all workers share one copy through the OS page cache. Only the new
+columns travel back.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, NamedTuple
+
+import pandas as pd
+
+from artifact_store import artifact_path, load_artifact, save_artifact
+
+# Columns shared with the workers for the duration of one run
+SHARED_ARTIFACT = "fe_shared_columns"
+
+class FeatureGroup(NamedTuple):
+    func: Callable[[pd.DataFrame], pd.DataFrame]
+    inputs: List[str]
+
+def _run_group(name: str, group: FeatureGroup, artifact: str):
+    start = time.time()
+    frame = load_artifact(artifact, columns=group.inputs)
+    result = group.func(frame)
+    return name, result, time.time() - start
+
+def run_feature_groups(df: pd.DataFrame, groups: Dict[str, FeatureGroup],
+                       workers: int = 1) -> Dict[str, pd.DataFrame]:
+    """
+    Run every group on `df` and return {name: new columns}. With workers > 1
+    the groups run in a process pool over memory-mapped shared columns;
+    results are identical either way.
+    """
+    results: Dict[str, pd.DataFrame] = {}
+
+    if workers <= 1:
+        for name, group in groups.items():
+            start = time.time()
+            results[name] = group.func(df[group.inputs])
+            print(f"   -> {name:28s} {time.time() - start:6.2f}s")
+        return results
+
+    shared_cols = list(dict.fromkeys(col for group in groups.values() for col in group.inputs))
+    print(f"   Sharing {len(shared_cols)} input columns with {workers} workers (memory-mapped)...")
+    save_artifact(df[shared_cols], SHARED_ARTIFACT)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_group, name, group, SHARED_ARTIFACT) for name, group in groups.items()]
+            for future in futures:
+                name, result, elapsed = future.result()
+                # The worker saw a fresh 0..n-1 index; re-attach the caller's
+                result.index = df.index
+                results[name] = result
+                print(f"   -> {name:28s} {elapsed:6.2f}s")
+    finally:
+        path = artifact_path(SHARED_ARTIFACT)
+        if path.exists():
+            os.remove(path)
+
+    return {name: results[name] for name in groups}
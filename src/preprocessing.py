@@ -1,12 +1,18 @@
+import argparse
+import os
 import pandas as pd
 import numpy as np
 import gc
 import pickle
-from typing import List, Tuple, Any
+from typing import Any, Dict, List, Optional, Tuple
 from sklearn.preprocessing import StandardScaler
-from scipy.stats import ks_2samp
+from artifact_store import artifact_columns, load_artifact, save_artifact
+from drift import drift_report
+from drift_monitor import PROFILE_FILE, ReferenceProfile
+from v_reduction import V_REDUCTION_FILE, VReduction, fit_v_reduction, is_v_column
 
-def detect_feature_drift(X_train: pd.DataFrame, X_test: pd.DataFrame, threshold: float = 0.05) -> Tuple[List[Tuple[str, float, float]], List[Tuple[str, float]]]:
+def detect_feature_drift(X_train: pd.DataFrame, X_test: pd.DataFrame, threshold: float = 0.05,
+                         workers: int = 1, sample_rows: Optional[int] = None) -> Tuple[List[Tuple[str, float, float]], List[Tuple[str, float]]]:
     """
     Use Kolmogorov-Smirnov Test to detect data drift.
     
@@ -14,102 +20,213 @@ def detect_feature_drift(X_train: pd.DataFrame, X_test: pd.DataFrame, threshold:
     Low p-value  (<0.05) = Feature distribution DRIFTED (may cause problems)
     
     This prevents your model from failing in production due to data shift.
+    KS, PSI and Jensen-Shannon come from drift.py (each column sorted once,
+    optionally sampled and spread over `workers` processes).
     """
     print("\n[KS-Test] Detecting Feature Drift...")
     print("   (Comparing Train vs Test distributions)")
     
-    drift_features: List[Tuple[str, float, float]] = []
-    passed_features: List[Tuple[str, float]] = []
+    report: pd.DataFrame = drift_report(X_train, X_test, workers=workers, sample_rows=sample_rows)
+    drifted = report['p_value'] < threshold
     
-    for col in X_train.columns:
-        ks_stat, p_value = ks_2samp(X_train[col], X_test[col])
-        
-        if p_value < threshold: # type: ignore
-            drift_features.append((col, p_value, ks_stat)) # type: ignore
-            print(f"   ⚠ DRIFT: {col:30s} | p-value: {p_value:.6f} | KS: {ks_stat:.4f}")
-        else:
-            passed_features.append((col, p_value)) # type: ignore
+    drift_features: List[Tuple[str, float, float]] = list(report.loc[drifted, ['Feature', 'p_value', 'ks_stat']]
+                                                           .itertuples(index=False, name=None))
+    passed_features: List[Tuple[str, float]] = list(report.loc[~drifted, ['Feature', 'p_value']]
+                                                    .itertuples(index=False, name=None))
+    
+    for row in report[drifted].itertuples(index=False):
+        print(f"   ⚠ DRIFT: {row.Feature:30s} | p-value: {row.p_value:.6f} | KS: {row.ks_stat:.4f} "
+              f"| PSI: {row.psi:.4f}")
     
     print(f"\n   Summary: {len(passed_features)} features OK, {len(drift_features)} DRIFTED")
     
     # Save drift report
     if drift_features:
-        drift_df = pd.DataFrame(drift_features, columns=['Feature', 'p_value', 'ks_stat'])
-        drift_df.to_csv('drift_report.csv', index=False)
+        report[drifted].to_csv('drift_report.csv', index=False)
         print(f"   [Saved] drift_report.csv (for investigation)")
     
     return drift_features, passed_features
 
-def perform_preprocessing() -> None:
+def load_feature_matrix(name: str, feature_cols: List[str], chunk_columns: int = 32,
+                        reduction: Optional[VReduction] = None) -> Tuple[np.ndarray, int]:
+    """
+    Read `feature_cols` of artifact `name` into one float32 matrix, column-major
+    so every column is contiguous, filling NaNs with -999 in place. Only
+    `chunk_columns` source columns are in memory at a time. Combined V
+    columns of `reduction` are built from their members.
+    Returns (matrix, number of NaNs filled); the column order is `feature_cols`.
+    """
+    combos: Dict[str, List[str]] = reduction.combos if reduction is not None else {}
+    n_rows: int = len(load_artifact(name, columns=[c for c in feature_cols if c not in combos][:1]))
+    matrix: np.ndarray = np.empty((n_rows, len(feature_cols)), dtype=np.float32, order='F')
+    nan_count: int = 0
+    for start in range(0, len(feature_cols), chunk_columns):
+        names: List[str] = feature_cols[start:start + chunk_columns]
+        stored: List[str] = [c for c in names if c not in combos]
+        block: Optional[pd.DataFrame] = load_artifact(name, columns=stored) if stored else None
+        for j, col in enumerate(names, start):
+            column = matrix[:, j]
+            if col in combos:
+                column[:] = reduction.combine(col, load_artifact(name, columns=combos[col]))
+            else:
+                column[:] = block[col].to_numpy(dtype=np.float32, na_value=np.nan)
+            missing = np.isnan(column)
+            nan_count += int(missing.sum())
+            column[missing] = -999
+        del block
+    return matrix, nan_count
+
+def fit_scaler_chunked(matrix: np.ndarray, chunk_rows: int = 100_000) -> StandardScaler:
+    """StandardScaler statistics accumulated over row chunks (partial_fit), never copying the whole matrix."""
+    scaler: StandardScaler = StandardScaler()
+    for start in range(0, len(matrix), chunk_rows):
+        scaler.partial_fit(matrix[start:start + chunk_rows])
+    return scaler
+
+def scale_in_place(matrix: np.ndarray, scaler: StandardScaler) -> None:
+    """(x - mean_) / scale_ in float32, one contiguous column at a time."""
+    mean: np.ndarray = scaler.mean_.astype(np.float32)
+    scale: np.ndarray = scaler.scale_.astype(np.float32)
+    for j in range(matrix.shape[1]):
+        column = matrix[:, j]
+        column -= mean[j]
+        column /= scale[j]
+
+def _load_and_scale_low_memory(feature_cols: List[str], chunk_rows: int, reduction: Optional[VReduction] = None):
+    """
+    Steps 2-4 with one float32 matrix per split: filled and scaled in place,
+    so peak memory is about the size of the matrices themselves.
+    """
+    print("\n[Action] Loading Engineered Data (low-memory: one float32 matrix per split)...")
+    ids: pd.DataFrame = load_artifact('train_engineered', columns=['isFraud'])
+    y: pd.Series = ids['isFraud']
+    test_ids: pd.Series = load_artifact('test_engineered', columns=['TransactionID'])['TransactionID']
+    del ids
+
+    print("\n[Strict Pipeline] Handling NaNs (Filling with -999, in place)...")
+    if reduction is not None:
+        feature_cols = reduction.output_columns(feature_cols)
+    X_matrix, nan_count_train = load_feature_matrix('train_engineered', feature_cols, reduction=reduction)
+    X_test_matrix, nan_count_test = load_feature_matrix('test_engineered', feature_cols, reduction=reduction)
+    print(f"   NaNs in Train: {nan_count_train}, NaNs in Test: {nan_count_test}")
+    print(f"   ✓ All NaNs filled")
+
+    # Column-major float32: these frames wrap the matrices without copying
+    X: pd.DataFrame = pd.DataFrame(X_matrix, columns=feature_cols, copy=False)
+    X_test: pd.DataFrame = pd.DataFrame(X_test_matrix, columns=feature_cols, copy=False)
+
+    ReferenceProfile.from_frame(X).save(PROFILE_FILE)
+    print(f"   ✓ {PROFILE_FILE} saved (reference bins for drift_monitor.py)")
+
+    print("\n[Strict Pipeline] Scaling Data (StandardScaler, chunked fit, in-place transform)...")
+    scaler: StandardScaler = fit_scaler_chunked(X_matrix, chunk_rows)
+    scaler.feature_names_in_ = np.asarray(feature_cols, dtype=object)  # as fitting on the frame would
+    scale_in_place(X_matrix, scaler)
+    scale_in_place(X_test_matrix, scaler)
+    print(f"   ✓ StandardScaler fit on {len(X)} training samples ({chunk_rows}-row chunks)")
+    print(f"   ✓ Same scaler applied to {len(X_test)} test samples")
+
+    return X, X_test, y, test_ids, scaler
+
+def perform_preprocessing(drift_workers: int = 1, drift_sample: Optional[int] = None,
+                          low_memory: bool = False, chunk_rows: int = 100_000, reduce_v: bool = False,
+                          v_threshold: float = 0.95, v_mode: str = "representative",
+                          v_sample: int = 50_000) -> None:
     print("STEP 3: PREPROCESSING (STRICT PIPELINE + DRIFT DETECTION)")
     print("="*70)
 
-    # --- 1. LOAD ENGINEERED DATA ---
-    print("\n[Action] Loading Engineered Data...")
-    train: pd.DataFrame = pd.read_pickle('train_engineered.pkl')
-    test: pd.DataFrame = pd.read_pickle('test_engineered.pkl')
-    
-    # Isolate Target
-    y: pd.Series = train['isFraud']
-    
-    # Save TransactionIDs for the final Dashboard/Submission
-    train_ids: pd.Series = train['TransactionID']
-    test_ids: pd.Series = test['TransactionID']
-
-    # --- 2. FEATURE SELECTION & CLEANING ---
+    # --- 1. FEATURE SELECTION & CLEANING ---
     # We drop columns that models can't handle (Strings, Dates)
-    print("[Action] Dropping non-numeric columns...")
+    # The artifact schema tells us which columns those are, so they are never read.
+    print("[Action] Selecting numeric feature columns...")
     
-    # We drop 'uid' (it was a string for grouping) and 'TransactionDT' (time delta)
+    # We drop 'uid' (an integer grouping key, not a feature) and 'TransactionDT' (time delta)
     # We keep the extracted features like 'Transaction_hour', 'uid_TransactionAmt_mean', etc.
     drop_cols = ['isFraud', 'TransactionDT', 'TransactionID', 'uid', 
                  'P_emaildomain', 'R_emaildomain', 'card1', 'addr1', 'dist1']
     
-    # Handle columns that might have been created but are strings
-    extra_drops: List[str] = [c for c in train.columns if train[c].dtype == 'object']
-    final_drops: List[str] = list(set(drop_cols + extra_drops))
+    # Columns that might have been created but are strings are not numeric, so never selected
+    feature_cols: List[str] = [c for c in artifact_columns('train_engineered', numeric_only=True)
+                               if c not in drop_cols]
+
+    # --- 1.5 V-COLUMN REDUCTION (before anything is filled, scaled or drift-tested) ---
+    reduction: Optional[VReduction] = None
+    if reduce_v:
+        print("\n[Action] Collapsing redundant V columns (shared NaN pattern + correlation)...")
+        reduction = fit_v_reduction('train_engineered', [c for c in feature_cols if is_v_column(c)],
+                                    threshold=v_threshold, mode=v_mode, sample_rows=v_sample)
+        reduction.save(V_REDUCTION_FILE)
+        print(f"   ✓ {reduction.summary()}")
+        print(f"   ✓ {V_REDUCTION_FILE} saved (the API applies the same mapping)")
+    elif os.path.exists(V_REDUCTION_FILE):
+        os.remove(V_REDUCTION_FILE)  # a mapping from an earlier run doesn't describe these features
+
+    if low_memory:
+        X, X_test, y, test_ids, scaler = _load_and_scale_low_memory(feature_cols, chunk_rows, reduction)
+    else:
+        # --- 2. LOAD ENGINEERED DATA (PROJECTED) ---
+        print("\n[Action] Loading Engineered Data...")
+        train: pd.DataFrame = load_artifact('train_engineered', columns=feature_cols + ['isFraud', 'TransactionID'])
+        test: pd.DataFrame = load_artifact('test_engineered', columns=feature_cols + ['TransactionID'])
     
-    X: pd.DataFrame = train.drop(columns=final_drops, errors='ignore')
-    X_test: pd.DataFrame = test.drop(columns=final_drops, errors='ignore')
+        # Isolate Target
+        y: pd.Series = train['isFraud']
     
-    # Garbage collection
-    del train, test
-    gc.collect()
+        # Save TransactionIDs for the final Dashboard/Submission
+        train_ids: pd.Series = train['TransactionID']
+        test_ids: pd.Series = test['TransactionID']
 
-    # --- 3. NO NANs (Strict Pipeline Rule) ---
-    print("\n[Strict Pipeline] Handling NaNs (Filling with -999)...")
-    nan_count_train: int = int(X.isna().sum().sum())
-    nan_count_test: int = int(X_test.isna().sum().sum())
-    print(f"   NaNs in Train: {nan_count_train}, NaNs in Test: {nan_count_test}")
+        X: pd.DataFrame = train[feature_cols]
+        X_test: pd.DataFrame = test[feature_cols]
     
-    X = X.fillna(-999)
-    X_test = X_test.fillna(-999)
-    print(f"   ✓ All NaNs filled")
+        # Garbage collection
+        del train, test
+        gc.collect()
+
+        if reduction is not None:
+            X = reduction.transform(X)
+            X_test = reduction.transform(X_test)
+            print(f"   ✓ {len(feature_cols)} -> {X.shape[1]} feature columns")
+
+        # --- 3. NO NANs (Strict Pipeline Rule) ---
+        print("\n[Strict Pipeline] Handling NaNs (Filling with -999)...")
+        nan_count_train: int = int(X.isna().sum().sum())
+        nan_count_test: int = int(X_test.isna().sum().sum())
+        print(f"   NaNs in Train: {nan_count_train}, NaNs in Test: {nan_count_test}")
     
-    # --- 4. SCALING / NORMALIZATION (Strict Pipeline Rule) ---
-    # "The features shouldn’t have too much variability... use standardscaler"
-    print("\n[Strict Pipeline] Scaling Data (StandardScaler)...")
-    print("   (Using same scaler weights for Train and Test)")
+        X = X.fillna(-999)
+        X_test = X_test.fillna(-999)
+        print(f"   ✓ All NaNs filled")
+
+        # Reference for the live drift monitor (the API sees filled, unscaled features)
+        ReferenceProfile.from_frame(X).save(PROFILE_FILE)
+        print(f"   ✓ {PROFILE_FILE} saved (reference bins for drift_monitor.py)")
     
-    scaler: StandardScaler = StandardScaler()
+        # --- 4. SCALING / NORMALIZATION (Strict Pipeline Rule) ---
+        # "The features shouldn’t have too much variability... use standardscaler"
+        print("\n[Strict Pipeline] Scaling Data (StandardScaler)...")
+        print("   (Using same scaler weights for Train and Test)")
     
-    # FIT on Train, TRANSFORM Train
-    # We use float32 to save memory (StandardScaler defaults to float64)
-    X_scaled_array: np.ndarray = scaler.fit_transform(X)
-    X = pd.DataFrame(X_scaled_array, columns=X.columns).astype('float32')
+        scaler: StandardScaler = StandardScaler()
     
-    # TRANSFORM Test (Use the SAME weights - this is CRITICAL)
-    X_test_scaled_array: np.ndarray = scaler.transform(X_test)
-    X_test = pd.DataFrame(X_test_scaled_array, columns=X_test.columns).astype('float32')
+        # FIT on Train, TRANSFORM Train
+        # We use float32 to save memory (StandardScaler defaults to float64)
+        X_scaled_array: np.ndarray = scaler.fit_transform(X)
+        X = pd.DataFrame(X_scaled_array, columns=X.columns).astype('float32')
     
-    print(f"   ✓ StandardScaler fit on {len(X)} training samples")
-    print(f"   ✓ Same scaler applied to {len(X_test)} test samples")
+        # TRANSFORM Test (Use the SAME weights - this is CRITICAL)
+        X_test_scaled_array: np.ndarray = scaler.transform(X_test)
+        X_test = pd.DataFrame(X_test_scaled_array, columns=X_test.columns).astype('float32')
+    
+        print(f"   ✓ StandardScaler fit on {len(X)} training samples")
+        print(f"   ✓ Same scaler applied to {len(X_test)} test samples")
     
-    del X_scaled_array, X_test_scaled_array
-    gc.collect()
+        del X_scaled_array, X_test_scaled_array
+        gc.collect()
 
     # --- 4.5 DRIFT DETECTION (NEW - CRITICAL FOR PRODUCTION) ---
-    drift_features, passed_features = detect_feature_drift(X, X_test, threshold=0.05)
+    drift_features, passed_features = detect_feature_drift(X, X_test, threshold=0.05,
+                                                           workers=drift_workers, sample_rows=drift_sample)
     
     if drift_features:
         print("\n   ⚠ IMPORTANT: These features have drifted.")
@@ -138,12 +255,12 @@ def perform_preprocessing() -> None:
 
     # --- 6. SAVE ---
     print("\n[Action] Saving Preprocessed Data...")
-    X_train.to_pickle('X_train.pkl')
-    y_train.to_pickle('y_train.pkl')
-    X_val.to_pickle('X_val.pkl')
-    y_val.to_pickle('y_val.pkl')
-    X_test.to_pickle('X_test.pkl')
-    test_ids.to_pickle('test_ids.pkl')
+    save_artifact(X_train, 'X_train')
+    save_artifact(y_train, 'y_train')
+    save_artifact(X_val, 'X_val')
+    save_artifact(y_val, 'y_val')
+    save_artifact(X_test, 'X_test')
+    save_artifact(test_ids, 'test_ids')
     
     # Also save the scaler for production use
     with open('scaler.pkl', 'wb') as f:
@@ -155,4 +272,24 @@ def perform_preprocessing() -> None:
     print("="*70)
 
 if __name__ == "__main__":
-    perform_preprocessing()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Step 3: NaN handling, scaling, drift detection, train/val split")
+    parser.add_argument('--drift-workers', type=int, default=1,
+                        help=f"check drift in this many processes (e.g. {os.cpu_count()})")
+    parser.add_argument('--drift-sample', type=int, default=None,
+                        help="compare at most this many rows per side (default: all rows)")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="build one float32 matrix per split and fill/scale it in place (~1x peak memory)")
+    parser.add_argument('--chunk-rows', type=int, default=100_000,
+                        help="rows per scaler-fitting chunk for --low-memory")
+    parser.add_argument('--reduce-v', action='store_true',
+                        help="collapse V columns that share a NaN pattern and correlate (v_reduction.py)")
+    parser.add_argument('--v-threshold', type=float, default=0.95,
+                        help="|correlation| at which V columns are clustered")
+    parser.add_argument('--v-mode', choices=["representative", "mean"], default="representative",
+                        help="keep one column per cluster, or the mean of its z-scored members")
+    parser.add_argument('--v-sample', type=int, default=50_000,
+                        help="rows sampled for the V-column correlations")
+    args = parser.parse_args()
+    perform_preprocessing(drift_workers=args.drift_workers, drift_sample=args.drift_sample,
+                          low_memory=args.low_memory, chunk_rows=args.chunk_rows, reduce_v=args.reduce_v,
+                          v_threshold=args.v_threshold, v_mode=args.v_mode, v_sample=args.v_sample)
\ No newline at end of file
@@ -30,7 +30,7 @@ STEPS = [
         "name": "LOAD & MERGE DATA",
         "script": "load_data.py",
         "description": "Load transaction + identity data, merge, reduce memory",
-        "outputs": ["train_merged.pkl", "test_merged.pkl"],
+        "outputs": ["train_merged.feather", "test_merged.feather"],
         "duration": "~2-3 minutes"
     },
     {
@@ -38,7 +38,8 @@ STEPS = [
         "name": "FEATURE ENGINEERING",
         "script": "feature_eng.py",
         "description": "Create UIDs, aggregations, frequency encoding (THE MAGIC)",
-        "outputs": ["train_engineered.pkl", "test_engineered.pkl"],
+        "outputs": ["train_engineered.feather", "test_engineered.feather", "online_state.pkl", "feature_store",
+                    "fq_encoder_*.feather", "fq_encoders.json"],
         "duration": "~3-5 minutes"
     },
     {
@@ -46,7 +47,8 @@ STEPS = [
         "name": "PREPROCESSING & VALIDATION",
         "script": "preprocessing.py",
         "description": "Handle NaNs, scale data, detect drift, split train/val",
-        "outputs": ["X_train.pkl", "X_val.pkl", "X_test.pkl", "scaler.pkl", "drift_report.csv"],
+        "outputs": ["X_train.feather", "X_val.feather", "X_test.feather", "scaler.pkl", "drift_report.csv",
+                    "drift_profile.pkl"],
         "duration": "~2 minutes"
     },
     {
@@ -54,7 +56,7 @@ STEPS = [
         "name": "MODEL TRAINING",
         "script": "train_model.py",
         "description": "K-Fold CV, hyperparameter tuning, LightGBM training, SHAP values",
-        "outputs": ["fraud_model_lgb.txt", "feature_importance.csv", "shap_values.npy"],
+        "outputs": ["fraud_model_lgb.txt", "fraud_model_raw_lgb.txt", "fraud_model.bundle", "feature_importance.csv", "shap_values.npy"],
         "duration": "~10-15 minutes (depends on hardware)"
     }
 ]
@@ -163,7 +165,10 @@ def run_step(step: dict, demo_mode: bool = False):
         # Check for outputs
         missing_outputs = []
         for output_file in step['outputs']:
-            if not Path(output_file).exists():
+            # Without pyarrow the artifact store falls back to .pkl files;
+            # globbed outputs (one file per fitted encoder) need at least one match
+            fallback = str(Path(output_file).with_suffix('.pkl'))
+            if not any(Path().glob(output_file)) and not any(Path().glob(fallback)):
                 missing_outputs.append(output_file)
         
         if missing_outputs:
@@ -0,0 +1,256 @@
+"""
+SERVING BUNDLE
+==============
+Everything the API needs to score a transaction, in one versioned file
+(fraud_model.bundle) written at the end of training:
+
+    header   magic, format version, metadata length
+    meta     JSON: model version, feature order, objective, decision and
+             risk thresholds, top features, -999 fill, array directory
+    arrays   raw little-endian arrays, 64-byte aligned:
+             fill values, scaler mean_/scale_, the trees as flat node
+             arrays (feature, threshold, children, missing handling),
+             leaf values, and the LightGBM model text for reference
+
+The trees are the raw-feature model (scaler folded in, model_export.py),
+so requests are scored on unscaled values. Loading is one np.memmap plus
+views into it, and scoring walks all trees at once with numpy, so the API
+imports neither lightgbm, pandas nor sklearn and starts in well under a
+second.
+
+Tree walking follows LightGBM's numerical decision: NaN counts as 0.0
+unless the split's missing type is NaN, missing values (NaN, or zero for
+zero_as_missing) take the default direction, otherwise x <= threshold goes
+left.
+"""
+
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BUNDLE_FILE = "fraud_model.bundle"
+FORMAT_VERSION = 1
+NAN_FILL = -999  # preprocessing's fill value for missing feature values
+
+DEFAULT_THRESHOLDS = {
+    "fraud": 0.5,
+    "risk_levels": [[0.9, "CRITICAL"], [0.7, "HIGH"], [0.5, "MEDIUM"], [0.3, "LOW"]],
+}
+
+_MAGIC = b"SWBUNDL1"
+_HEADER = struct.Struct("<8sII")  # magic, format version, meta_len
+_ALIGN = 64
+
+# LightGBM decision_type bits and missing types (tree.h)
+_CATEGORICAL_MASK = 1
+_DEFAULT_LEFT_MASK = 2
+_MISSING_ZERO, _MISSING_NAN = 1, 2
+_ZERO_THRESHOLD = 1e-35
+
+# --- Model text -> flat arrays -----------------------------------------------
+
+def _field(block: str, name: str) -> Optional[str]:
+    match = re.search(rf'^{name}=(.*)$', block, re.MULTILINE)
+    return match.group(1) if match else None
+
+def parse_model(model_text: str) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """(model metadata, flat tree arrays) of a LightGBM text model with numerical splits."""
+    head, _, rest = model_text.partition('\nTree=')
+    features = _field(head, 'feature_names').split()
+    objective = (_field(head, 'objective') or '').split()
+    if not objective or objective[0] != 'binary':
+        raise ValueError(f"Only binary models can be bundled (objective: {' '.join(objective)})")
+    sigmoid = next((float(p.split(':')[1]) for p in objective[1:] if p.startswith('sigmoid:')), 1.0)
+
+    blocks = ('Tree=' + rest).split('end of trees')[0].split('\nTree=')
+    roots, leaf_values = [], []
+    node_arrays: Dict[str, list] = {'feature': [], 'threshold': [], 'left': [], 'right': [],
+                                    'default_left': [], 'missing_type': []}
+    n_nodes = n_leaves = 0
+
+    for block in blocks:
+        if not block.strip():
+            continue
+        values = np.array(_field(block, 'leaf_value').split(), dtype=np.float64)
+        if int(_field(block, 'num_leaves')) == 1:
+            roots.append(~n_leaves)
+        else:
+            decision = np.array(_field(block, 'decision_type').split(), dtype=np.int64)
+            if (decision & _CATEGORICAL_MASK).any():
+                raise ValueError("Categorical splits can't be bundled")
+            # Children: >= 0 is a node of this tree, < 0 is leaf ~child; both made global
+            left = np.array(_field(block, 'left_child').split(), dtype=np.int64)
+            right = np.array(_field(block, 'right_child').split(), dtype=np.int64)
+            node_arrays['left'].append(np.where(left >= 0, left + n_nodes, ~(~left + n_leaves)))
+            node_arrays['right'].append(np.where(right >= 0, right + n_nodes, ~(~right + n_leaves)))
+            node_arrays['feature'].append(np.array(_field(block, 'split_feature').split(), dtype=np.int32))
+            node_arrays['threshold'].append(np.array(_field(block, 'threshold').split(), dtype=np.float64))
+            node_arrays['default_left'].append((decision & _DEFAULT_LEFT_MASK) > 0)
+            node_arrays['missing_type'].append(((decision >> 2) & 3).astype(np.uint8))
+            roots.append(n_nodes)
+            n_nodes += len(decision)
+        leaf_values.append(values)
+        n_leaves += len(values)
+
+    dtypes = {'feature': np.int32, 'threshold': np.float64, 'left': np.int64, 'right': np.int64,
+              'default_left': np.bool_, 'missing_type': np.uint8}
+    arrays = {f'node_{name}': (np.concatenate(parts).astype(dtypes[name]) if parts
+                               else np.zeros(0, dtype=dtypes[name]))
+              for name, parts in node_arrays.items()}
+    arrays['tree_roots'] = np.array(roots, dtype=np.int64)
+    arrays['leaf_value'] = np.concatenate(leaf_values) if leaf_values else np.zeros(0)
+    meta = {'features': features, 'sigmoid': sigmoid, 'num_trees': len(roots)}
+    return meta, arrays
+
+# --- Bundle ------------------------------------------------------------------
+
+class ServingBundle:
+    """Model, feature order, fill values and thresholds for serving (numpy only)."""
+
+    def __init__(self, meta: Dict, arrays: Dict[str, np.ndarray]):
+        self.meta = meta
+        self.features: List[str] = meta['features']
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.features)}
+        self.thresholds: Dict = meta['thresholds']
+        self.top_features: List[str] = meta['top_features']
+        self.version: str = meta['model_version']
+        self.arrays = arrays
+        for name, values in arrays.items():
+            if name != 'model_text':  # exposed decoded, by the property below
+                setattr(self, name, values)
+
+    @classmethod
+    def from_model(cls, model_text: str, scaler_mean, scaler_scale, top_features: List[str],
+                   thresholds: Dict = DEFAULT_THRESHOLDS) -> "ServingBundle":
+        """Bundle a raw-feature model (see model_export.fold_scaler) in memory."""
+        meta, arrays = parse_model(model_text)
+        scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        meta.update({
+            'format_version': FORMAT_VERSION,
+            'model_version': hashlib.sha256(model_text.encode()).hexdigest()[:12],
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'nan_fill': NAN_FILL,
+            'thresholds': thresholds,
+            'top_features': list(top_features),
+        })
+        # An absent feature is scored at the training mean, as the scaled model's 0.0 was
+        arrays['fill_values'] = scaler_mean
+        arrays['scaler_mean'] = scaler_mean
+        arrays['scaler_scale'] = np.asarray(scaler_scale, dtype=np.float64)
+        arrays['model_text'] = np.frombuffer(model_text.encode(), dtype=np.uint8)
+        return cls(meta, arrays)
+
+    def save(self, path: str = BUNDLE_FILE) -> None:
+        directory, offset, payload = {}, 0, []
+        for name, values in self.arrays.items():
+            values = np.ascontiguousarray(values)
+            directory[name] = [offset, values.dtype.str, list(values.shape)]
+            padding = -values.nbytes % _ALIGN
+            payload.append(values.tobytes() + b"\0" * padding)
+            offset += values.nbytes + padding
+
+        meta = json.dumps({**self.meta, 'arrays': directory}).encode()
+        header = _HEADER.pack(_MAGIC, FORMAT_VERSION, len(meta)) + meta
+        header += b"\0" * (-len(header) % _ALIGN)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            for chunk in payload:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = BUNDLE_FILE) -> "ServingBundle":
+        """Map a bundle file read-only; the arrays are views into the mapping."""
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, meta_len = _HEADER.unpack(bytes(data[:_HEADER.size]))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a serving bundle")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has bundle format {version}, expected {FORMAT_VERSION}")
+        meta = json.loads(bytes(data[_HEADER.size:_HEADER.size + meta_len]))
+        base = _HEADER.size + meta_len
+        base += -base % _ALIGN
+
+        arrays = {}
+        for name, (offset, dtype, shape) in meta.pop('arrays').items():
+            dtype = np.dtype(dtype)
+            size = int(np.prod(shape)) * dtype.itemsize
+            arrays[name] = data[base + offset:base + offset + size].view(dtype).reshape(shape)
+        return cls(meta, arrays)
+
+    @property
+    def model_text(self) -> str:
+        return bytes(self.arrays['model_text']).decode()
+
+    # --- Scoring -------------------------------------------------------------
+
+    def vector(self, features: Dict) -> Tuple[np.ndarray, List[str]]:
+        """
+        Model-ordered float64 vector of a raw feature dict: missing values
+        (None/NaN) become -999, absent features their fill value.
+        Returns (vector, absent feature names).
+        """
+        out = np.array(self.fill_values, dtype=np.float64)
+        seen = 0
+        for name, value in features.items():
+            i = self.index.get(name)
+            if i is None:
+                continue
+            out[i] = NAN_FILL if value is None or value != value else value
+            seen += 1
+        absent = [] if seen == len(self.features) else [f for f in self.features if f not in features]
+        return out, absent
+
+    def raw_score(self, rows: np.ndarray) -> np.ndarray:
+        """Sum of leaf values per row; every tree advances one level per step."""
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        node = np.broadcast_to(self.tree_roots, (len(rows), len(self.tree_roots))).copy()
+        row_of = np.broadcast_to(np.arange(len(rows))[:, None], node.shape)
+        active = node >= 0
+        while active.any():
+            idx = node[active]
+            x = rows[row_of[active], self.node_feature[idx]]
+            missing_type = self.node_missing_type[idx]
+            is_nan = np.isnan(x)
+            x = np.where(is_nan & (missing_type != _MISSING_NAN), 0.0, x)
+            use_default = ((is_nan & (missing_type == _MISSING_NAN))
+                           | ((missing_type == _MISSING_ZERO) & (np.abs(x) <= _ZERO_THRESHOLD)))
+            go_left = np.where(use_default, self.node_default_left[idx], x <= self.node_threshold[idx])
+            node[active] = np.where(go_left, self.node_left[idx], self.node_right[idx])
+            active = node >= 0
+        return self.leaf_value[~node].sum(axis=1)
+
+    def predict(self, rows: np.ndarray) -> np.ndarray:
+        """Fraud probability per row of raw (unscaled) features in model order."""
+        return 1.0 / (1.0 + np.exp(-self.meta['sigmoid'] * self.raw_score(rows)))
+
+    def risk_level(self, fraud_prob: float) -> str:
+        for threshold, level in self.thresholds['risk_levels']:
+            if fraud_prob >= threshold:
+                return level
+        return "MINIMAL"
+
+def export_bundle(model_path: str, scaler_path: str, top_features: List[str],
+                  out_path: Optional[str] = BUNDLE_FILE) -> ServingBundle:
+    """
+    Bundle of a raw-feature model file and the fitted scaler (training side),
+    written to `out_path` unless it is None.
+    """
+    import pickle
+    from model_export import scaler_for_model
+
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    with open(model_path) as f:
+        model_text = f.read()
+    bundle = ServingBundle.from_model(model_text, *scaler_for_model(scaler, model_text), top_features)
+    if out_path is not None:
+        bundle.save(out_path)
+    return bundle
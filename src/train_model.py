@@ -3,7 +3,20 @@ import numpy as np
 import lightgbm as lgb
 from sklearn.metrics import roc_auc_score, confusion_matrix, precision_recall_fscore_support
 from sklearn.model_selection import KFold
+import argparse
 import gc
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from artifact_store import artifact_path, load_artifact
+from checkpoints import (CHECKPOINT_DIR, CHECKPOINT_EVERY, DETERMINISTIC_PARAMS, ResumableEarlyStopping,
+                         TrainingCheckpoints, segment_params)
+from model_export import FOLD_TOLERANCE, RAW_MODEL_FILE, SCALER_FILE, export_raw_model
+from serving_bundle import BUNDLE_FILE, export_bundle
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -19,14 +32,207 @@ def calculate_class_weight(y):
     print(f"   [Class Weight] scale_pos_weight = {scale_pos_weight:.2f}")
     return scale_pos_weight
 
-def train_model():
+# Boosting parameters shared by the CV folds and the final fit (lgb.train names)
+NUM_BOOST_ROUND = 5000
+BIN_CACHE_DIR = "lgb_bin_cache"
+
+def lgb_params(scale_pos_weight, seed, tuned=None):
+    """Boosting parameters; `tuned` (e.g. hyperparam_search.py's tuned_params.json) overrides the defaults."""
+    params = {
+        "objective": "binary",
+        "metric": "auc",
+        "boosting_type": "gbdt",
+        "learning_rate": 0.01,  # Lower learning rate = more stable
+        "num_leaves": 256,
+        "max_depth": -1,
+        "feature_fraction": 0.7,
+        "bagging_fraction": 0.8,
+        "bagging_freq": 1,
+        "scale_pos_weight": scale_pos_weight,  # CRITICAL: Weight fraud cases
+        "seed": seed,
+        "num_threads": 0,  # all cores
+        "verbose": -1,
+    }
+    params.update(tuned or {})
+    return params
+
+def load_tuned_params(path):
+    with open(path) as f:
+        tuned = json.load(f)
+    print(f"   [Params] {path}: {tuned}")
+    return tuned
+
+EARLY_STOPPING_ROUNDS = 100
+
+# Binning only depends on these, not on the boosting parameters
+DATASET_PARAMS = {"max_bin": 255, "feature_pre_filter": False, "verbose": -1}
+
+def _cache_key(artifacts, params):
+    # Changes whenever the artifacts are rewritten or the binning parameters change
+    h = hashlib.sha256(json.dumps(params, sort_keys=True).encode())
+    for name in artifacts:
+        stat = os.stat(artifact_path(name))
+        h.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+def binned_training_set(X, y, use_cache=True):
+    """
+    The training matrix binned once as an lgb.Dataset. Folds are subset() views
+    of it (sharing its bin mappers), and with use_cache the binned data is
+    saved as a .bin file, so a rerun on unchanged artifacts skips binning.
+    Returns (dataset, path of its .bin file or None).
+    """
+    key = _cache_key(['X_train', 'y_train'], {**DATASET_PARAMS, "columns": list(X.columns)})
+    cache_path = os.path.join(BIN_CACHE_DIR, f"X_train-{key}.bin")
+    if use_cache and os.path.exists(cache_path):
+        print(f"   [Dataset] Reusing binned training set from {cache_path}")
+        return lgb.Dataset(cache_path, params=DATASET_PARAMS, free_raw_data=False).construct(), cache_path
+
+    start = time.time()
+    dataset = lgb.Dataset(X, label=y, params=DATASET_PARAMS, free_raw_data=False).construct()
+    print(f"   [Dataset] Binned {X.shape[0]} x {X.shape[1]} in {time.time() - start:.1f}s")
+    if not use_cache:
+        return dataset, None
+    shutil.rmtree(BIN_CACHE_DIR, ignore_errors=True)  # drop bins of older artifacts
+    os.makedirs(BIN_CACHE_DIR)
+    dataset.save_binary(cache_path)
+    print(f"   [Dataset] Cached to {cache_path}")
+    return dataset, cache_path
+
+def fit_booster(params, train_set, valid_set, valid_name, train_eval=True, log_period=100,
+                checkpoints=None, name=None):
+    """
+    lgb.train with early stopping on `valid_set`; the training set is scored only with train_eval.
+    With `checkpoints`, the fit runs in segments saved as checkpoint `name`
+    and resumes from the last one saved (see checkpoints.py); the datasets
+    are then left with the init scores of the last continued segment.
+    """
+    valid_sets, valid_names = [valid_set], [valid_name]
+    if train_eval:
+        valid_sets, valid_names = [train_set] + valid_sets, ["Train"] + valid_names
+    early_stopping = ResumableEarlyStopping(valid_name, EARLY_STOPPING_ROUNDS, NUM_BOOST_ROUND)
+    every = NUM_BOOST_ROUND
+    model = None
+    if checkpoints is not None:
+        params = {**params, **DETERMINISTIC_PARAMS}
+        every = checkpoints.every
+        state = checkpoints.load(name, params)
+        if state is not None:
+            model = lgb.Booster(model_str=state["model"])
+            early_stopping.set_state(state["early_stopping"])
+            print(f"   [Checkpoint] {name}: " + ("already trained" if early_stopping.stopped
+                                                  else f"resuming at round {state['iteration']}"))
+
+    while not early_stopping.stopped:
+        done = model.current_iteration() if model is not None else 0
+        model = lgb.train(
+            segment_params(params, done // every),
+            train_set,
+            num_boost_round=min(every, NUM_BOOST_ROUND - done),
+            valid_sets=valid_sets,
+            valid_names=valid_names,
+            init_model=model,
+            callbacks=[
+                early_stopping,
+                lgb.log_evaluation(period=log_period)
+            ]
+        )
+        if checkpoints is not None:
+            checkpoints.save(name, params, model, early_stopping)
+
+    model.best_iteration = early_stopping.best_iter + 1
+    return model
+
+# --- Fold scheduling ---
+# Folds can train concurrently in separate processes, each with a fixed
+# LightGBM thread count (its threading stops scaling well past a handful of
+# cores). Workers don't receive the matrix: they load the binned training
+# set from its .bin file and memory-map the X_train artifact for their
+# out-of-fold rows, so nothing is pickled or rebinned per process. Only
+# X_train is shared, though: LightGBM reads the .bin into each worker's own
+# memory, so the binned matrix is held once per fold worker.
+
+def attach_raw_rows(dataset, X):
+    """
+    Give a Dataset loaded from .bin its raw rows: continuing from saved trees
+    (init_model) scores the rows with them, and the .bin only has bins.
+    """
+    if isinstance(dataset.data, str):
+        dataset.data = X
+    return dataset
+
+def train_fold(train_set, X_train, fold_idx, train_idx, val_idx, scale_pos_weight,
+               threads=0, train_eval=True, log_period=100, checkpoints=None, tuned=None):
+    """One CV fold on subsets of `train_set`. Returns (booster, out-of-fold predictions)."""
+    params = {**lgb_params(scale_pos_weight, seed=42 + fold_idx, tuned=tuned), "num_threads": threads}  # Vary seed per fold
+    model = fit_booster(params, train_set.subset(train_idx), train_set.subset(val_idx), "Fold Val",
+                        train_eval=train_eval, log_period=log_period,
+                        checkpoints=checkpoints, name=f"fold{fold_idx + 1}")
+    preds = model.predict(X_train.iloc[val_idx], num_iteration=model.best_iteration, num_threads=threads)
+    return model, preds
+
+def _train_fold_process(bin_path, fold_idx, train_idx, val_idx, scale_pos_weight, threads, train_eval,
+                        checkpoints, tuned):
+    start = time.time()
+    train_set = lgb.Dataset(bin_path, params=DATASET_PARAMS, free_raw_data=False).construct()
+    X_train = load_artifact("X_train", columns=train_set.get_feature_name())
+    if checkpoints is not None:
+        attach_raw_rows(train_set, X_train)
+    # Interleaved per-iteration logs from several folds would be unreadable
+    model, preds = train_fold(train_set, X_train, fold_idx, train_idx, val_idx, scale_pos_weight,
+                              threads=threads, train_eval=train_eval, log_period=0, checkpoints=checkpoints,
+                              tuned=tuned)
+    return fold_idx, model.model_to_string(), preds, model.best_iteration, time.time() - start
+
+def run_folds(folds, train_set, bin_path, X_train, scale_pos_weight, fold_workers=1,
+              threads_per_fold=0, train_eval=True, checkpoints=None, tuned=None):
+    """
+    Train every (train_idx, val_idx) fold. Returns (models, out-of-fold
+    predictions) in fold order, sequentially or with fold_workers processes.
+    """
+    if fold_workers <= 1:
+        models, predictions = [], []
+        for fold_idx, (train_idx, val_idx) in enumerate(folds):
+            print(f"\n>>> FOLD {fold_idx + 1}/{len(folds)}")
+            print(f"    Fold Train: {len(train_idx)}, Fold Val: {len(val_idx)}")
+            model, preds = train_fold(train_set, X_train, fold_idx, train_idx, val_idx, scale_pos_weight,
+                                      threads=threads_per_fold, train_eval=train_eval, checkpoints=checkpoints,
+                                      tuned=tuned)
+            models.append(model)
+            predictions.append(preds)
+        return models, predictions
+
+    threads_per_fold = threads_per_fold or max(1, (os.cpu_count() or 1) // fold_workers)
+    print(f"   [Folds] {len(folds)} folds on {fold_workers} processes x {threads_per_fold} threads "
+          f"(binned set: {os.path.getsize(bin_path) / 2**20:,.0f} MB per process)")
+    models, predictions = [None] * len(folds), [None] * len(folds)
+    # spawn, not fork: forking after OpenMP started in this process can deadlock the children
+    with ProcessPoolExecutor(max_workers=fold_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(_train_fold_process, bin_path, fold_idx, train_idx, val_idx,
+                               scale_pos_weight, threads_per_fold, train_eval, checkpoints, tuned)
+                   for fold_idx, (train_idx, val_idx) in enumerate(folds)]
+        for future in as_completed(futures):
+            fold_idx, model_str, preds, best_iteration, elapsed = future.result()
+            models[fold_idx] = lgb.Booster(model_str=model_str)
+            predictions[fold_idx] = preds
+            print(f"    Fold {fold_idx + 1} done: {best_iteration} rounds, {elapsed:.1f}s")
+    return models, predictions
+
+def train_model(train_eval=True, use_bin_cache=True, fold_workers=1, threads_per_fold=0,
+                checkpoint_every=0, params_path=None, features_path=None):
     print("STEP 4: MODEL TRAINING (LIGHTGBM WITH K-FOLD CROSS-VALIDATION)")
     print("="*70)
 
-    X_train = pd.read_pickle("X_train.pkl")
-    y_train = pd.read_pickle("y_train.pkl")
-    X_val = pd.read_pickle("X_val.pkl")
-    y_val = pd.read_pickle("y_val.pkl")
+    # A pruned feature list (feature_pruning.py) reads only those columns
+    features = None
+    if features_path:
+        with open(features_path) as f:
+            features = json.load(f)
+        print(f"   [Features] {len(features)} features from {features_path}")
+    X_train = load_artifact("X_train", columns=features)
+    y_train = load_artifact("y_train")
+    X_val = load_artifact("X_val", columns=features)
+    y_val = load_artifact("y_val")
 
     print(f"\nDataset Shapes:")
     print(f"  Training Data: {X_train.shape}")
@@ -36,6 +242,7 @@ def train_model():
     # --- STEP 1: CALCULATE CLASS WEIGHT ---
     print("\n[STEP 1] Calculating Class Weight for Imbalanced Data...")
     scale_pos_weight = calculate_class_weight(y_train)
+    tuned = load_tuned_params(params_path) if params_path else None
 
     # --- STEP 2: K-FOLD CROSS-VALIDATION ---
     print("\n[STEP 2] Initiating K-Fold Cross-Validation (K=5)...")
@@ -44,59 +251,37 @@ def train_model():
     NFOLDS = 5
     kfold = KFold(n_splits=NFOLDS, shuffle=False)
 
+    # Binned once; every fold trains and validates on subsets of it
+    train_set, bin_path = binned_training_set(X_train, y_train, use_cache=use_bin_cache)
+    checkpoints = None
+    if checkpoint_every > 0:
+        # Saved fits are only reused by a run on the same artifacts and folds
+        run_key = _cache_key(['X_train', 'y_train', 'X_val', 'y_val'],
+                             {"nfolds": NFOLDS, "num_boost_round": NUM_BOOST_ROUND,
+                              "columns": list(X_train.columns)})
+        checkpoints = TrainingCheckpoints(run_key, every=checkpoint_every)
+        attach_raw_rows(train_set, X_train)
+    temp_bin = None
+    if fold_workers > 1 and bin_path is None:
+        # Fold processes read the binned set from disk, cache or not
+        temp_bin = bin_path = f"X_train-{os.getpid()}.bin"
+        train_set.save_binary(bin_path)
     
-    fold_auc_scores = []
-    fold_models = []
-    fold_predictions = []
+    folds = list(kfold.split(X_train))
+    try:
+        fold_models, fold_predictions = run_folds(folds, train_set, bin_path, X_train, scale_pos_weight,
+                                                  fold_workers=fold_workers, threads_per_fold=threads_per_fold,
+                                                  train_eval=train_eval, checkpoints=checkpoints,
+                                                  tuned=tuned)
+    finally:
+        if temp_bin is not None and os.path.exists(temp_bin):
+            os.remove(temp_bin)
     
-    for fold_idx, (train_idx, val_idx) in enumerate(kfold.split(X_train)):
-        print(f"\n>>> FOLD {fold_idx + 1}/{NFOLDS}")
-        
-        X_fold_train = X_train.iloc[train_idx]
-        y_fold_train = y_train.iloc[train_idx]
-        X_fold_val = X_train.iloc[val_idx]
-        y_fold_val = y_train.iloc[val_idx]
-        
-        print(f"    Fold Train: {X_fold_train.shape[0]}, Fold Val: {X_fold_val.shape[0]}")
-        
-        # --- LightGBM with Class Weight ---
-        model = lgb.LGBMClassifier(
-            objective="binary",
-            metric="auc",
-            boosting_type="gbdt",
-            n_estimators=5000,
-            learning_rate=0.01,  # Lower learning rate = more stable
-            num_leaves=256,
-            max_depth=-1,
-            colsample_bytree=0.7,
-            subsample=0.8,
-            subsample_freq=1,
-            scale_pos_weight=scale_pos_weight,  # CRITICAL: Weight fraud cases
-            random_state=42 + fold_idx,  # Vary seed per fold
-            n_jobs=-1,
-            verbose=-1
-        )
-
-        model.fit(
-            X_fold_train,
-            y_fold_train,
-            eval_set=[(X_fold_train, y_fold_train), (X_fold_val, y_fold_val)],
-            eval_names=["Train", "Fold Val"],
-            eval_metric="auc",
-            callbacks=[
-                lgb.early_stopping(stopping_rounds=100, verbose=False),
-                lgb.log_evaluation(period=100)
-            ]
-        )
-
-        # Evaluate on this fold
-        fold_preds = np.asarray(model.predict_proba(X_fold_val))[:, 1]
-        fold_auc = roc_auc_score(y_fold_val, fold_preds)
+    fold_auc_scores = []
+    for fold_idx, (_, val_idx) in enumerate(folds):
+        fold_auc = roc_auc_score(y_train.iloc[val_idx], fold_predictions[fold_idx])
         fold_auc_scores.append(fold_auc)
-        fold_models.append(model)
-        fold_predictions.append(fold_preds)
-        
-        print(f"    Fold AUC: {fold_auc:.4f}")
+        print(f"    Fold {fold_idx + 1} AUC: {fold_auc:.4f}")
 
     # --- STEP 3: CROSS-VALIDATION SUMMARY ---
     print("\n" + "="*70)
@@ -116,36 +301,12 @@ def train_model():
     print("\n[STEP 4] Retraining on Full Training Set...")
     print("-" * 70)
     
-    final_model = lgb.LGBMClassifier(
-        objective="binary",
-        metric="auc",
-        boosting_type="gbdt",
-        n_estimators=5000,
-        learning_rate=0.01,
-        num_leaves=256,
-        max_depth=-1,
-        colsample_bytree=0.7,
-        subsample=0.8,
-        subsample_freq=1,
-        scale_pos_weight=scale_pos_weight,
-        random_state=42,
-        n_jobs=-1,
-        verbose=-1
-    )
-
-    final_model.fit(
-        X_train,
-        y_train,
-        eval_set=[(X_train, y_train), (X_val, y_val)],
-        eval_names=["Train", "Validation"],
-        eval_metric="auc",
-        callbacks=[
-            lgb.early_stopping(stopping_rounds=100, verbose=False),
-            lgb.log_evaluation(period=100)
-        ]
-    )
-
-    val_preds = np.asarray(final_model.predict_proba(X_val))[:, 1]
+    # Raw rows kept: continued checkpoint segments rescore them with the saved trees
+    val_set = lgb.Dataset(X_val, label=y_val, reference=train_set, free_raw_data=False)
+    final_model = fit_booster(lgb_params(scale_pos_weight, seed=42, tuned=tuned), train_set, val_set, "Validation",
+                              train_eval=train_eval, checkpoints=checkpoints, name="final")
+
+    val_preds = final_model.predict(X_val, num_iteration=final_model.best_iteration)
     val_auc = roc_auc_score(y_val, val_preds)
 
     print(f"\nFinal Model Validation AUC: {val_auc:.4f}")
@@ -174,7 +335,7 @@ def train_model():
     
     importance = pd.DataFrame({
         "Feature": X_train.columns,
-        "Importance": final_model.feature_importances_
+        "Importance": final_model.feature_importance(importance_type="split")
     }).sort_values(by="Importance", ascending=False)
 
     print("\nTop 15 Most Important Features:")
@@ -185,9 +346,28 @@ def train_model():
     print("\n[STEP 7] Saving Model")
     print("-" * 70)
     
-    final_model.booster_.save_model("fraud_model_lgb.txt")
+    final_model.save_model("fraud_model_lgb.txt")
     print("✓ Model saved to fraud_model_lgb.txt")
 
+    # Serving copy that takes raw features (scaler folded into the split thresholds)
+    if os.path.exists(SCALER_FILE):
+        max_diff = export_raw_model(check_rows=X_val.iloc[:1000].to_numpy())
+        print(f"✓ {RAW_MODEL_FILE} written (max |Δp| vs scaled model on 1000 val rows: {max_diff:.2e})")
+
+        # Everything the API loads, in one memory-mapped file
+        bundle = export_bundle(RAW_MODEL_FILE, SCALER_FILE, importance.head(10)['Feature'].tolist(), out_path=None)
+        check = X_val.iloc[:1000].to_numpy(dtype=np.float64)
+        max_diff = np.abs(bundle.predict(check * bundle.scaler_scale + bundle.scaler_mean)
+                          - final_model.predict(check, num_iteration=final_model.best_iteration)).max()
+        if max_diff > FOLD_TOLERANCE:
+            raise ValueError(f"Bundle differs from the trained model by up to {max_diff:.2e} "
+                             f"(tolerance {FOLD_TOLERANCE:.0e}); {BUNDLE_FILE} not written")
+        bundle.save(BUNDLE_FILE)
+        print(f"✓ {BUNDLE_FILE} written (model {bundle.version}, max |Δp| vs LightGBM: {max_diff:.2e})")
+
+    if checkpoints is not None:
+        checkpoints.clear()  # the run is complete; a rerun trains from scratch
+
 
 
     # --- FINAL SUMMARY ---
@@ -200,10 +380,34 @@ def train_model():
     print(f"Recall:            {recall:.4f} (catch real fraud)")
     print(f"\nModels saved:")
     print(f"  - fraud_model_lgb.txt (For predictions)")
+    print(f"  - {RAW_MODEL_FILE} (Raw features, no scaler)")
+    print(f"  - {BUNDLE_FILE} (For the API: model, feature order, fills, thresholds)")
     print(f"  - feature_importance.csv (Feature rankings)")
     print("="*70)
 
     gc.collect()
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Step 4: K-Fold CV and final LightGBM fit")
+    parser.add_argument('--no-train-eval', action='store_true',
+                        help="don't score the training set every iteration (only the validation set)")
+    parser.add_argument('--no-bin-cache', action='store_true',
+                        help=f"rebin the training set instead of reusing {BIN_CACHE_DIR}/")
+    parser.add_argument('--fold-workers', type=int, default=1,
+                        help="train this many CV folds concurrently, one process each (each holds its own "
+                             "copy of the binned training set, the size of its .bin file)")
+    parser.add_argument('--threads-per-fold', type=int, default=0,
+                        help="LightGBM threads per fold (default: all cores, or cores / fold workers)")
+    parser.add_argument('--checkpoint-every', type=int, default=0,
+                        help=f"save each fit to {CHECKPOINT_DIR}/ every N rounds (e.g. {CHECKPOINT_EVERY}) and "
+                             "resume from it when rerun; checkpointed fits give a different model than "
+                             "unsegmented ones (default 0: no checkpoints)")
+    parser.add_argument('--params', default=None,
+                        help="JSON of parameters overriding the defaults (hyperparam_search.py writes tuned_params.json)")
+    parser.add_argument('--features', default=None,
+                        help="JSON list of the features to train on (feature_pruning.py writes selected_features.json)")
+    args = parser.parse_args()
+    train_model(train_eval=not args.no_train_eval, use_bin_cache=not args.no_bin_cache,
+                fold_workers=args.fold_workers, threads_per_fold=args.threads_per_fold,
+                checkpoint_every=args.checkpoint_every, params_path=args.params,
+                features_path=args.features)
@@ -0,0 +1,68 @@
+"""
+UID KEYS
+========
+Compact integer keys for the "magic" user identity (card1, addr1, start day).
+
+The UID used to be built by casting the three parts to str and concatenating
+them: over a million Python strings, and every groupby('uid') hashed them
+again. uid_key() instead mixes the float64 bit patterns of the three parts
+into a stable 64-bit integer:
+
+- Same value tuple -> same key, in every process and on every run, so the
+  serving path can compute the key for a raw transaction.
+- Distinct tuples collide only with ~2^-64 probability, so group assignments
+  match the string UID.
+
+numpy only, so serving code can import it without pandas.
+"""
+
+import math
+
+import numpy as np
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+_SEED = np.uint64(0x5F3759DF2B7E1516)
+
+def uid_start_day(transaction_dt, d1):
+    """
+    The day this user first appeared: TransactionDay - D1 (D1 is "days since client began").
+    Computed in float64, exactly as the batch pipeline does.
+    """
+    day = np.asarray(transaction_dt, dtype=np.float64) / SECONDS_PER_DAY
+    return day - np.asarray(d1, dtype=np.float64)
+
+def _float_bits(values):
+    # float64 bit pattern with every NaN mapped to one canonical NaN
+    values = np.array(values, dtype=np.float64, ndmin=1)
+    values[np.isnan(values)] = np.nan
+    return values.view(np.uint64)
+
+def _mix64(h):
+    # splitmix64 finalizer: a cheap bijective mix with full avalanche
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+def uid_key(card1, addr1, uid_d1n):
+    """
+    Stable int64 key for each (card1, addr1, uid_D1n) tuple. Inputs may be
+    scalars or arrays (anything numeric, NaN allowed); returns an int64 array.
+    """
+    h = _SEED
+    with np.errstate(over='ignore'):
+        for part in (card1, addr1, uid_d1n):
+            h = _mix64(h ^ _float_bits(part))
+    return h.view(np.int64)
+
+def number(value) -> float:
+    """A raw (JSON) field as float: missing or non-numeric -> NaN, like the batch pipeline sees it."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def transaction_uid(txn) -> int:
+    """uid_key for one raw transaction dict (card1, addr1, D1, TransactionDT)."""
+    start_day = uid_start_day(number(txn.get('TransactionDT')), number(txn.get('D1')))
+    return int(uid_key(number(txn.get('card1')), number(txn.get('addr1')), start_day)[0])
@@ -0,0 +1,175 @@
+"""
+V-COLUMN REDUCTION
+==================
+Collapses the redundant V1-V339 block before preprocessing fills, scales
+and drift-tests it.
+
+The V columns come in blocks that are missing together (one NaN pattern per
+block) and, inside a block, many columns are near copies of each other.
+Fitting (on the training artifact, a column chunk at a time):
+
+1. group the V columns by their exact NaN pattern over all training rows
+   (a hash of the packed missing mask)
+2. inside each group, on a row sample where the group is present, cluster
+   greedily by |Pearson correlation| >= `threshold`: the column with the most
+   distinct values founds a cluster and takes every unassigned column that
+   correlated with it, then the next unassigned column founds the next
+3. per cluster, keep
+   - "representative": the founding column alone, or
+   - "mean": Vmean_<founder>, the mean of the members' z-scores (sign
+     aligned with the founder), NaN where the group is missing
+
+The mapping is saved as v_reduction.pkl. Training applies it in
+preprocessing.py; the API applies it to each request (apply()), so
+"mean" columns are built from the V values the caller sends. Dropped
+columns are simply not model features any more.
+
+numpy only at serving time (fitting imports the artifact store), so the API
+can import it.
+"""
+
+import pickle
+import re
+import warnings
+from typing import Dict, List
+
+import numpy as np
+
+V_REDUCTION_FILE = "v_reduction.pkl"
+MODES = ("representative", "mean")
+NAN_FILL = -999  # preprocessing's fill value; a request may send it for a missing V value
+
+_V_COLUMN = re.compile(r'V\d+')
+
+def is_v_column(name: str) -> bool:
+    return _V_COLUMN.fullmatch(name) is not None
+
+class VReduction:
+    """Clusters of V columns and what each collapses to."""
+
+    def __init__(self, mode: str, threshold: float, clusters: List[List[str]], stats: Dict[str, tuple]):
+        if mode not in MODES:
+            raise ValueError(f"Unknown V reduction mode {mode!r} (expected one of {MODES})")
+        self.mode = mode
+        self.threshold = threshold
+        self.clusters = clusters  # founder first
+        self.stats = stats  # member -> (mean, scale, sign) for z-scoring
+        # Output column -> the members it is built from ("mean" clusters of 2+)
+        self.combos: Dict[str, List[str]] = ({f"Vmean_{c[0]}": c for c in clusters if len(c) > 1}
+                                             if mode == "mean" else {})
+        kept = {c[0] for c in clusters if mode == "representative" or len(c) == 1}
+        self.dropped: List[str] = [col for c in clusters for col in c if col not in kept]
+
+    def output_columns(self, columns: List[str]) -> List[str]:
+        """`columns` without the dropped V columns, plus the combined ones."""
+        dropped = set(self.dropped)
+        return [c for c in columns if c not in dropped] + list(self.combos)
+
+    def combine(self, name: str, frame) -> np.ndarray:
+        """Combined column `name`: the mean over the members present in each row (NaN where none is)."""
+        members = self.combos[name]
+        z = np.empty((len(frame), len(members)), dtype=np.float32)
+        for j, col in enumerate(members):
+            mean, scale, sign = self.stats[col]
+            z[:, j] = sign * (frame[col].to_numpy(dtype=np.float32, na_value=np.nan) - mean) / scale
+        # Averaged over the present members, as apply() does for a request that
+        # sends only some of them; all-NaN rows stay NaN without a warning
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanmean(z, axis=1)
+
+    def transform(self, frame):
+        """Training side: the frame (pandas) with combined columns added and dropped ones removed."""
+        combined = {name: self.combine(name, frame) for name in self.combos}
+        return frame.drop(columns=[c for c in self.dropped if c in frame.columns]).assign(**combined)
+
+    def apply(self, features: Dict) -> Dict:
+        """Serving side: a request's feature dict with the combined columns added."""
+        if not self.combos:
+            return features
+        out = dict(features)
+        for name, members in self.combos.items():
+            sent = [(c, features[c]) for c in members if c in features]
+            if not sent:
+                continue  # left absent: the bundle fills it like any absent feature
+            z = [self.stats[c][2] * (v - self.stats[c][0]) / self.stats[c][1]
+                 for c, v in sent if v is not None and v == v and v != NAN_FILL]
+            out[name] = float(np.mean(z)) if z else None  # None: missing, filled -999 as in training
+        return out
+
+    def summary(self) -> str:
+        n_in = sum(len(c) for c in self.clusters)
+        return (f"{n_in} V columns -> {n_in - len(self.dropped) + len(self.combos)} "
+                f"({len(self.clusters)} clusters, mode: {self.mode}, |r| >= {self.threshold})")
+
+    def save(self, path: str = V_REDUCTION_FILE) -> None:
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str = V_REDUCTION_FILE) -> "VReduction":
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+# --- Fitting (training side) -------------------------------------------------
+
+def _correlation_clusters(values: np.ndarray, columns: List[str], threshold: float) -> List[List[str]]:
+    """Greedy |r| >= threshold clusters of the columns of `values` (rows where the group is present)."""
+    if len(columns) == 1 or len(values) < 2:
+        return [[c] for c in columns]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.nan_to_num(np.abs(np.corrcoef(values, rowvar=False)), nan=0.0)
+    n_unique = np.array([np.unique(values[:, j]).size for j in range(len(columns))])
+    order = np.argsort(-n_unique, kind='stable')
+    assigned = np.zeros(len(columns), dtype=bool)
+    clusters = []
+    for i in order:
+        if assigned[i]:
+            continue
+        members = [j for j in order if not assigned[j] and (j == i or corr[i, j] >= threshold)]
+        assigned[members] = True
+        clusters.append([columns[j] for j in members])
+    return clusters
+
+def fit_v_reduction(artifact: str, v_columns: List[str], threshold: float = 0.95, mode: str = "representative",
+                    sample_rows: int = 50_000, chunk_columns: int = 32, seed: int = 42) -> VReduction:
+    """
+    Fit the reduction on artifact `artifact`: NaN patterns over all rows,
+    correlations on a sample of `sample_rows` rows, reading `chunk_columns`
+    columns at a time.
+    """
+    import hashlib
+    from artifact_store import load_artifact
+
+    if not v_columns:
+        return VReduction(mode, threshold, [], {})
+    n_rows = len(load_artifact(artifact, columns=v_columns[:1]))
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(n_rows, size=min(sample_rows, n_rows), replace=False))
+    sample = np.empty((len(rows), len(v_columns)), dtype=np.float64)
+    patterns: Dict[tuple, List[int]] = {}
+    for start in range(0, len(v_columns), chunk_columns):
+        block = load_artifact(artifact, columns=v_columns[start:start + chunk_columns])
+        for j, col in enumerate(block.columns, start):
+            values = block[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            missing = np.isnan(values)
+            key = (int(missing.sum()), hashlib.blake2b(np.packbits(missing).tobytes(), digest_size=16).digest())
+            patterns.setdefault(key, []).append(j)
+            sample[:, j] = values[rows]
+        del block
+
+    clusters, stats = [], {}
+    for idx in patterns.values():
+        values = sample[:, idx]
+        values = values[~np.isnan(values[:, 0])]  # the whole group is present on these rows
+        group = [v_columns[j] for j in idx]
+        for cluster in _correlation_clusters(values, group, threshold):
+            founder = values[:, group.index(cluster[0])]
+            for col in cluster:
+                x = values[:, group.index(col)]
+                mean = float(x.mean()) if len(x) else 0.0
+                scale = float(x.std()) if len(x) else 0.0
+                r = np.corrcoef(founder, x)[0, 1] if len(x) > 1 and scale > 0 and founder.std() > 0 else 1.0
+                stats[col] = (mean, scale if scale > 0 else 1.0, -1.0 if r < 0 else 1.0)
+            clusters.append(cluster)
+    return VReduction(mode, threshold, clusters, stats)
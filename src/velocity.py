@@ -0,0 +1,189 @@
+"""
+VELOCITY FEATURES
+=================
+Rolling transaction count / amount sum / amount mean per UID, card1 and
+addr1 over trailing time windows (1h, 24h, 7d by default), keyed on
+TransactionDT (seconds).
+
+Window for a transaction at time t: every transaction of the same key in
+(t - window, t], counting earlier rows at the same second and the
+transaction itself, never later ones. So a row only sees the past, and
+serving (which only knows the past) gives the same numbers.
+
+- Batch (velocity_features): one lexsort by (key, time), then every window
+  is a searchsorted over the sorted composite key and a difference of
+  cumulative sums. O(n log n), no per-group Python loops.
+- Serving (WindowState): per key, the timestamps and cumulative sums of the
+  last max(window) seconds; features are a bisect per window, updates are
+  an append plus evicting expired events.
+
+Rows with a missing key get NaN.
+
+numpy only at serving time (the batch side imports pandas when called), so
+the API can unpickle a WindowState without loading pandas.
+"""
+
+import math
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from uid_keys import number, transaction_uid
+
+WINDOWS = {'1h': 3600, '24h': 24 * 3600, '7d': 7 * 24 * 3600}
+VELOCITY_KEYS = ['uid', 'card1', 'addr1']
+
+def feature_names(key: str, window: str) -> List[str]:
+    return [f'{key}_txn_count_{window}', f'{key}_amt_sum_{window}', f'{key}_amt_mean_{window}']
+
+# --- Batch -------------------------------------------------------------------
+
+def window_aggregates(keys, times, amounts, prefix: str,
+                      windows: Dict[str, int] = WINDOWS) -> Dict[str, np.ndarray]:
+    """Windowed count/sum/mean for one key column, in the original row order."""
+    import pandas as pd
+
+    codes, _ = pd.factorize(np.asarray(keys))
+    times = np.asarray(times, dtype=np.int64)
+    if len(times) and (times.min() < 0 or times.max() + max(windows.values()) >= 2 ** 32):
+        raise ValueError("Times must be non-negative seconds below 2^32")
+    amounts = np.asarray(amounts, dtype=np.float64)
+    n = len(codes)
+
+    # Sort by (key, time); lexsort is stable, so ties keep row order
+    order = np.lexsort((times, codes))
+    composite = (codes[order].astype(np.int64) << 32) + times[order]
+    valid = ~np.isnan(amounts[order])
+    cum_sum = np.concatenate([[0.0], np.cumsum(np.where(valid, amounts[order], 0.0))])
+    cum_valid = np.concatenate([[0], np.cumsum(valid)])
+    position = np.arange(n)
+    missing_key = codes[order] < 0
+
+    out = {}
+    for window, seconds in windows.items():
+        # First row of the same key with time > t - window (keys are 2^32 apart,
+        # so the search never crosses into the previous key)
+        start = np.searchsorted(composite, composite - seconds, side='right')
+        count = (position - start + 1).astype(np.float32)
+        total = cum_sum[position + 1] - cum_sum[start]
+        n_valid = cum_valid[position + 1] - cum_valid[start]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n_valid > 0, total / n_valid, np.nan)
+
+        for name, values in zip(feature_names(prefix, window), (count, total, mean)):
+            values = values.astype(np.float32)
+            values[missing_key] = np.nan
+            result = np.empty(n, dtype=np.float32)
+            result[order] = values
+            out[name] = result
+    return out
+
+def velocity_features(df, keys: List[str] = VELOCITY_KEYS, time_col: str = 'TransactionDT',
+                      amount_col: str = 'TransactionAmt', windows: Dict[str, int] = WINDOWS):
+    """Add the windowed features for every key column to `df` (pandas)."""
+    import pandas as pd
+
+    for key in keys:
+        print(f"   -> Velocity by {key} ({', '.join(windows)})")
+        out = window_aggregates(df[key].to_numpy(), df[time_col].to_numpy(),
+                                df[amount_col].to_numpy(dtype=np.float64, na_value=np.nan), key, windows)
+        df[list(out)] = pd.DataFrame(out, index=df.index, copy=False)
+    return df
+
+# --- Serving -----------------------------------------------------------------
+
+class _History:
+    """Timestamps of one key within the longest window, plus cumulative amount sums."""
+
+    __slots__ = ('times', 'cum_sum', 'cum_valid')
+
+    def __init__(self):
+        self.times: List[float] = []
+        self.cum_sum: List[float] = [0.0]   # cum_sum[i] = sum of amounts before times[i]
+        self.cum_valid: List[int] = [0]
+
+class WindowState:
+    """Incremental version of velocity_features for the serving path."""
+
+    def __init__(self, keys: List[str] = VELOCITY_KEYS, windows: Dict[str, int] = WINDOWS):
+        self.keys = list(keys)
+        self.windows = dict(windows)
+        self.max_window = max(self.windows.values())
+        self.history: Dict[tuple, _History] = {}
+
+    @classmethod
+    def from_frame(cls, df, keys: List[str] = VELOCITY_KEYS, windows: Dict[str, int] = WINDOWS,
+                   time_col: str = 'TransactionDT', amount_col: str = 'TransactionAmt') -> "WindowState":
+        """Seed from the last max(window) seconds of a frame with the raw columns and 'uid'."""
+        state = cls(keys, windows)
+        times = df[time_col].to_numpy()
+        recent = np.flatnonzero(times > times.max() - state.max_window)
+        recent = recent[np.argsort(times[recent], kind='stable')]
+        columns = {col: df[col].to_numpy()[recent] for col in set(keys) | {time_col, amount_col}}
+        for i in range(len(recent)):
+            state._add({col: values[i] for col, values in columns.items()}, time_col, amount_col)
+        return state
+
+    def _key_values(self, txn: Dict) -> Dict[str, Optional[object]]:
+        values = {}
+        for key in self.keys:
+            if key == 'uid':
+                values[key] = int(txn['uid']) if 'uid' in txn else transaction_uid(txn)
+            else:
+                x = number(txn.get(key))
+                values[key] = None if math.isnan(x) else x
+        return values
+
+    def features(self, txn: Dict) -> Dict[str, float]:
+        """Windowed features for a transaction, including itself. Does not modify the state."""
+        t = number(txn.get('TransactionDT'))
+        amount = number(txn.get('TransactionAmt'))
+        amount_valid = not math.isnan(amount)
+        out = {}
+        for key, value in self._key_values(txn).items():
+            history = self.history.get((key, value)) if value is not None else None
+            for window, seconds in self.windows.items():
+                names = feature_names(key, window)
+                if value is None or math.isnan(t):
+                    out.update({name: math.nan for name in names})
+                    continue
+                if history is not None:
+                    start = bisect_right(history.times, t - seconds)
+                    end = bisect_right(history.times, t)
+                    count, total, n_valid = (end - start, history.cum_sum[end] - history.cum_sum[start],
+                                             history.cum_valid[end] - history.cum_valid[start])
+                else:
+                    count, total, n_valid = 0, 0.0, 0
+                count += 1
+                total += amount if amount_valid else 0.0
+                n_valid += amount_valid
+                out[names[0]] = float(count)
+                out[names[1]] = total
+                out[names[2]] = total / n_valid if n_valid else math.nan
+        return out
+
+    def update(self, txn: Dict) -> None:
+        """Record a transaction and evict events older than the longest window. Not thread-safe."""
+        self._add(txn, 'TransactionDT', 'TransactionAmt')
+
+    def _add(self, txn: Dict, time_col: str, amount_col: str) -> None:
+        t = number(txn.get(time_col))
+        if math.isnan(t):
+            return
+        amount = number(txn.get(amount_col))
+        amount_valid = not math.isnan(amount)
+        for key, value in self._key_values(txn).items():
+            if value is None:
+                continue
+            history = self.history.setdefault((key, value), _History())
+            # Late arrivals are recorded at the newest time so the lists stay sorted
+            history.times.append(max(t, history.times[-1]) if history.times else t)
+            history.cum_sum.append(history.cum_sum[-1] + (amount if amount_valid else 0.0))
+            history.cum_valid.append(history.cum_valid[-1] + amount_valid)
+
+            expired = bisect_right(history.times, history.times[-1] - self.max_window)
+            if expired:
+                del history.times[:expired]
+                del history.cum_sum[:expired]
+                del history.cum_valid[:expired]
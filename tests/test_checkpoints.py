@@ -0,0 +1,55 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+lgb = pytest.importorskip("lightgbm")
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+import train_model
+from checkpoints import TrainingCheckpoints
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptAfterFirstSegment(TrainingCheckpoints):
+    """Saves the first segment, then stops the fit as a killed run would."""
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        raise Interrupted
+
+
+def _datasets():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, 8))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = (np.nan_to_num(X[:, 0]) - np.nan_to_num(X[:, 1]) + rng.normal(size=3000) > 1).astype(int)
+    train_set = lgb.Dataset(X[:2400], label=y[:2400], params=train_model.DATASET_PARAMS, free_raw_data=False)
+    # As in the final fit: continued segments need the validation rows
+    val_set = lgb.Dataset(X[2400:], label=y[2400:], reference=train_set, free_raw_data=False)
+    return train_set, val_set, X[2400:]
+
+
+def _fit(checkpoints):
+    train_set, val_set, X_val = _datasets()
+    params = {**train_model.lgb_params(scale_pos_weight=1.0, seed=42), "num_leaves": 15, "num_threads": 1}
+    model = train_model.fit_booster(params, train_set, val_set, "Val", checkpoints=checkpoints, name="final")
+    return model, X_val
+
+
+def test_resumed_fit_matches_uninterrupted(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_model, "NUM_BOOST_ROUND", 40)
+    monkeypatch.setattr(train_model, "EARLY_STOPPING_ROUNDS", 100)  # every fit runs all 40 rounds
+
+    expected, X_val = _fit(TrainingCheckpoints("run", every=20, directory=str(tmp_path / "a")))
+
+    with pytest.raises(Interrupted):
+        _fit(InterruptAfterFirstSegment("run", every=20, directory=str(tmp_path / "b")))
+    resumed, _ = _fit(TrainingCheckpoints("run", every=20, directory=str(tmp_path / "b")))
+
+    assert resumed.current_iteration() == expected.current_iteration() == 40
+    assert resumed.best_iteration == expected.best_iteration
+    assert resumed.dump_model()["tree_info"] == expected.dump_model()["tree_info"]
+    np.testing.assert_array_equal(resumed.predict(X_val), expected.predict(X_val))
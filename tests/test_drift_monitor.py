@@ -0,0 +1,26 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from drift_monitor import NAN_FILL, DriftMonitor, ReferenceProfile
+
+
+def _monitor():
+    edges = [np.array([NAN_FILL + 0.5, 0.0, 1.0])] * 4
+    proportions = [np.full(4, 0.25)] * 4
+    return DriftMonitor(ReferenceProfile(["a", "b", "c", "d"], edges, proportions))
+
+
+def test_vector_fills_missing_and_keeps_absent_nan():
+    vector = _monitor().vector({"a": 0.5, "b": None, "c": float("nan"), "unknown": 3.0})
+    assert vector[0] == 0.5
+    assert vector[1] == NAN_FILL and vector[2] == NAN_FILL
+    assert np.isnan(vector[3])
+
+
+def test_missing_values_are_binned_like_training():
+    monitor = _monitor()
+    monitor.observe(monitor.vector({"a": None, "b": 2.0, "c": float("nan")}))
+    assert monitor.counts[0, 0] == 1 and monitor.counts[2, 0] == 1  # the -999 bin
+    assert monitor.counts[1, 3] == 1
+    assert list(monitor.missing) == [0, 0, 0, 1]
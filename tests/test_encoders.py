@@ -0,0 +1,55 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+import feature_eng
+from encoders import FrequencyEncoder, load_encoders
+
+
+def _frame(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "card1": rng.integers(1000, 1010, n),
+        "addr1": np.where(rng.random(n) < 0.2, np.nan, rng.integers(100, 105, n)).astype(np.float32),
+        "P_emaildomain": pd.Categorical(rng.choice(["gmail.com", "yahoo.com", None], n)),
+        "R_emaildomain": pd.Categorical(rng.choice(["gmail.com", "anonymous.com", None], n)),
+        "dist1": np.where(rng.random(n) < 0.5, np.nan, rng.integers(0, 20, n)).astype(np.float32),
+    })
+
+
+def _partition(split, tag, rows, row_end):
+    return {"split": split, "tag": tag, "rows": rows, "row_end": row_end,
+            "transaction_file": {"sha256": f"{split}-{tag}"}, "identity_file": None}
+
+
+def test_update_matches_a_full_fit():
+    df = _frame(1000, 0)
+    for col in df.columns:
+        updated = FrequencyEncoder.fit(col, df[col].iloc[:600]).update(df[col].iloc[600:])
+        full = FrequencyEncoder.fit(col, df[col])
+        np.testing.assert_array_equal(updated.transform(df[col]), full.transform(df[col]))
+
+
+def test_incremental_run_updates_the_saved_encoders(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    train, test = _frame(800, 1), _frame(300, 2)
+    base = [_partition("train", "base", 500, 500), _partition("test", "base", 200, 200)]
+    manifest = {"partitions": base}
+    monkeypatch.setattr(feature_eng, "load_manifest", lambda: manifest)
+    feature_eng.frequency_encoders(pd.concat([train.iloc[:500], test.iloc[:200]], ignore_index=True), 500)
+
+    # A daily drop appended to each split; the saved counts must only be extended
+    manifest = {"partitions": base + [_partition("train", "d1", 300, 800), _partition("test", "d1", 100, 300)]}
+    df = pd.concat([train, test], ignore_index=True)
+    recounted = []
+    monkeypatch.setattr(feature_eng, "fit_encoders", lambda *args: recounted.append(args))
+    fitted = feature_eng.frequency_encoders(df, 800)
+    assert not recounted
+
+    loaded, counted = load_encoders(feature_eng.ENCODE_COLUMNS)
+    assert counted == [feature_eng._partition_id(p) for p in manifest["partitions"]]
+    for col in feature_eng.ENCODE_COLUMNS:
+        expected = FrequencyEncoder.fit(col, df[col]).transform(df[col])
+        np.testing.assert_array_equal(fitted[col].transform(df[col]), expected)
+        np.testing.assert_array_equal(loaded[col].transform(df[col]), expected)
@@ -0,0 +1,69 @@
+import pickle
+import re
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+lgb = pytest.importorskip("lightgbm")
+
+import model_export
+from model_export import export_raw_model, fold_scaler
+
+MEAN = np.array([120.0, -3.5, 0.25, 1e4, 7.0])
+SCALE = np.array([45.0, 0.8, 0.01, 2.5e3, 3.0])
+
+
+def _scaled_model(seed=0):
+    """A booster trained on z-scored features, as preprocessing produces them (-999 fills, no NaN)."""
+    rng = np.random.default_rng(seed)
+    raw = rng.normal(size=(3000, len(MEAN))) * SCALE + MEAN
+    raw[rng.random(raw.shape) < 0.1] = -999
+    y = ((raw[:, 0] > MEAN[0]) ^ (raw[:, 3] > MEAN[3] + SCALE[3]) | (raw[:, 1] == -999)).astype(int)
+    params = {"objective": "binary", "num_leaves": 15, "verbose": -1, "seed": seed}
+    return lgb.train(params, lgb.Dataset((raw - MEAN) / SCALE, label=y), num_boost_round=40), rng
+
+
+def _tree_blocks(model_text):
+    body = model_text[:model_text.index("end of trees")]
+    return re.split(r"(?m)^(?=Tree=\d+$)", body)[1:]
+
+
+def test_folded_model_on_raw_rows_matches_scaled_model():
+    booster, rng = _scaled_model()
+    text = booster.model_to_string()
+    folded = fold_scaler(text, MEAN, SCALE)
+
+    raw = rng.normal(size=(1000, len(MEAN))) * SCALE + MEAN
+    raw[rng.random(raw.shape) < 0.1] = -999
+    raw[rng.random(raw.shape) < 0.1] = np.nan
+    # The scaled model saw no NaN, so LightGBM scored a missing value as 0.0, the feature mean
+    scaled = np.nan_to_num((raw - MEAN) / SCALE, nan=0.0)
+    np.testing.assert_allclose(lgb.Booster(model_str=folded).predict(raw), booster.predict(scaled),
+                               rtol=0, atol=1e-9)
+
+    # Thresholds moved to the raw scale, and NaN goes down the 0.0 side of every split
+    assert folded != text
+    decision_types = re.findall(r"(?m)^decision_type=(.*)$", folded)
+    assert all((int(d) >> 2) & 3 == 2 for line in decision_types for d in line.split())
+
+    sizes = [int(s) for s in re.search(r"(?m)^tree_sizes=(.*)$", folded).group(1).split()]
+    assert sizes == [len(block.encode()) for block in _tree_blocks(folded)]
+
+
+def test_export_checks_before_writing(tmp_path, monkeypatch):
+    booster, rng = _scaled_model()
+    model_path, scaler_path, out_path = (str(tmp_path / name) for name in ("model.txt", "scaler.pkl", "raw.txt"))
+    booster.save_model(model_path)
+    with open(scaler_path, "wb") as f:
+        pickle.dump(SimpleNamespace(mean_=MEAN, scale_=SCALE), f)
+    check_rows = rng.normal(size=(500, len(MEAN)))
+
+    assert export_raw_model(model_path, scaler_path, out_path, check_rows=check_rows) < 1e-9
+    assert (tmp_path / "raw.txt").exists()
+
+    (tmp_path / "raw.txt").unlink()
+    monkeypatch.setattr(model_export, "fold_scaler", lambda text, mean, scale: text)  # thresholds left scaled
+    with pytest.raises(ValueError, match="not written"):
+        export_raw_model(model_path, scaler_path, out_path, check_rows=check_rows)
+    assert not (tmp_path / "raw.txt").exists()
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from online_state import OnlineUIDState
+from velocity import WindowState
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def test_loading_state_with_windows_does_not_import_pandas(tmp_path):
+    df = pd.DataFrame({
+        "card1": [1000, 1000, 2000], "addr1": [300.0, 300.0, np.nan], "D1": [0.0, 0.0, 5.0],
+        "TransactionDT": [86400, 86500, 90000], "TransactionAmt": [10.0, 20.0, 5.0],
+    })
+    df["uid"] = [OnlineUIDState([], []).uid_of(row) for row in df.to_dict("records")]
+    state = OnlineUIDState([], [])
+    state.windows = WindowState.from_frame(df)
+    path = str(tmp_path / "online_state.pkl")
+    state.snapshot(path)
+
+    # A fresh interpreter, as at API startup: this one already has pandas loaded
+    script = (f"import sys; sys.path.insert(0, {SRC!r})\n"
+              "from online_state import OnlineUIDState\n"
+              f"state = OnlineUIDState.load({path!r})\n"
+              "txn = {'card1': 1000, 'addr1': 300.0, 'D1': 0.0, 'TransactionDT': 86600, 'TransactionAmt': 30.0}\n"
+              "assert state.windows.features(txn)['card1_txn_count_1h'] == 3.0\n"
+              "assert 'pandas' not in sys.modules, 'pandas was imported'\n")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,47 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+lgb = pytest.importorskip("lightgbm")
+
+from serving_bundle import ServingBundle
+
+
+def _booster(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(2000, 5))
+    X[rng.random(X.shape) < 0.1] = np.nan  # NaN-missing splits
+    X[:, 4] = rng.normal(size=2000)        # no missing values: NaN is scored as 0.0
+    y = (np.nan_to_num(X[:, 0]) + X[:, 4] + rng.normal(scale=0.5, size=2000) > 0).astype(int)
+    params = {"objective": "binary", "num_leaves": 15, "verbose": -1, "seed": seed}
+    return lgb.train(params, lgb.Dataset(X, label=y), num_boost_round=30), rng
+
+
+def test_save_load_predict_matches_lightgbm(tmp_path):
+    booster, rng = _booster()
+    n_features = booster.num_feature()
+    bundle = ServingBundle.from_model(booster.model_to_string(), np.zeros(n_features), np.ones(n_features),
+                                      ["Column_0"])
+    path = str(tmp_path / "model.bundle")
+    bundle.save(path)
+    loaded = ServingBundle.load(path)
+
+    rows = rng.normal(size=(500, n_features))
+    rows[rng.random(rows.shape) < 0.2] = np.nan
+    rows[rng.random(rows.shape) < 0.05] = -999
+    expected = booster.predict(rows)
+    np.testing.assert_allclose(bundle.predict(rows), expected, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(loaded.predict(rows), expected, rtol=0, atol=1e-12)
+    assert loaded.model_text == booster.model_to_string()
+    assert loaded.features == bundle.features
+    assert loaded.version == bundle.version
+
+
+def test_vector_fills_missing_and_absent():
+    booster, _ = _booster()
+    mean = np.arange(booster.num_feature(), dtype=np.float64)
+    bundle = ServingBundle.from_model(booster.model_to_string(), mean, np.ones_like(mean), [])
+    vector, absent = bundle.vector({"Column_0": 1.5, "Column_1": None, "Column_2": float("nan")})
+    assert vector[0] == 1.5
+    assert vector[1] == -999 and vector[2] == -999
+    assert list(vector[3:]) == list(mean[3:])
+    assert absent == ["Column_3", "Column_4"]
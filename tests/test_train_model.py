@@ -0,0 +1,41 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("lightgbm")
+pytest.importorskip("sklearn")
+
+import train_model
+from artifact_store import save_artifact
+from checkpoints import TrainingCheckpoints
+
+# Small trees that early-stop quickly: the fold processes run with the module defaults
+TUNED = {"num_leaves": 15, "learning_rate": 0.2}
+
+
+@pytest.mark.parametrize("checkpoint_every", [None, 50])
+def test_fold_workers_match_sequential(tmp_path, monkeypatch, checkpoint_every):
+    monkeypatch.chdir(tmp_path)  # artifacts, the .bin cache and the workers all use the working directory
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(3000, 6)), columns=[f"f{i}" for i in range(6)])
+    X[X > 2] = np.nan
+    y = pd.Series((X["f0"].fillna(0) + X["f1"].fillna(0) + rng.normal(size=3000) > 1).astype(int), name="isFraud")
+    save_artifact(X, "X_train")
+    save_artifact(y, "y_train")
+    train_set, bin_path = train_model.binned_training_set(X, y, use_cache=True)
+    folds = [(np.arange(0, 2000), np.arange(2000, 3000)), (np.arange(1000, 3000), np.arange(0, 1000))]
+
+    results = []
+    for workers in (1, 2):
+        checkpoints = (TrainingCheckpoints("run", every=checkpoint_every, directory=f"checkpoints{workers}")
+                       if checkpoint_every else None)
+        if checkpoints is not None:
+            train_model.attach_raw_rows(train_set, X)
+        results.append(train_model.run_folds(folds, train_set, bin_path, X, 1.0, fold_workers=workers,
+                                             threads_per_fold=1, train_eval=False, checkpoints=checkpoints,
+                                             tuned=TUNED))
+
+    (sequential, seq_preds), (parallel, par_preds) = results
+    for fold in range(len(folds)):
+        assert parallel[fold].num_trees() == sequential[fold].num_trees()
+        np.testing.assert_array_equal(par_preds[fold], seq_preds[fold])
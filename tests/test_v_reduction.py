@@ -0,0 +1,34 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from v_reduction import NAN_FILL, VReduction
+
+
+def _reduction():
+    stats = {"V1": (1.0, 2.0, 1.0), "V2": (0.5, 1.0, -1.0), "V3": (0.0, 4.0, 1.0), "V4": (3.0, 1.0, 1.0)}
+    return VReduction("mean", 0.9, [["V1", "V2", "V3"], ["V4"]], stats)
+
+
+def test_transform_matches_apply_on_partially_missing_rows():
+    reduction = _reduction()
+    frame = pd.DataFrame({
+        "V1": [3.0, np.nan, 1.0, np.nan],
+        "V2": [0.0, 2.0, np.nan, np.nan],
+        "V3": [8.0, np.nan, np.nan, np.nan],
+        "V4": [1.0, 2.0, 3.0, 4.0],
+    })
+    out = reduction.transform(frame)
+    assert list(out.columns) == ["V4", "Vmean_V1"]
+
+    for i, row in enumerate(frame.to_dict("records")):
+        # A request sends missing values as None, NaN or the preprocessing fill
+        sent = {k: (NAN_FILL if i % 2 else None) if math.isnan(v) else v for k, v in row.items()}
+        served = reduction.apply(sent)["Vmean_V1"]
+        if served is None:
+            assert np.isnan(out["Vmean_V1"].iloc[i])
+        else:
+            assert out["Vmean_V1"].iloc[i] == pytest.approx(served, rel=1e-6)